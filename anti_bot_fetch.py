@@ -12,6 +12,8 @@ import httpx
 from PIL import Image
 from werkzeug.datastructures import FileStorage
 
+import image_prep
+
 # ---------------------
 # Browser-like defaults
 # ---------------------
@@ -51,20 +53,6 @@ def _filename_from_url(url: str) -> str:
     name = re.sub(r"[^\w.\-]+", "_", name)
     return name
 
-def _fits_pixel_budget(image: Image.Image, max_pixels: int) -> bool:
-    w, h = image.size
-    return (w * h) <= max_pixels
-
-def _resize_to_max_pixels(img: Image.Image, max_pixels: int) -> Image.Image:
-    import math
-    w, h = img.size
-    cur = w * h
-    if cur <= max_pixels:
-        return img
-    scale = math.sqrt(max_pixels / float(cur))
-    nw, nh = max(1, int(w * scale)), max(1, int(h * scale))
-    return img.resize((nw, nh), Image.Resampling.LANCZOS)
-
 # --------------- Core fetch ---------------
 class HostPacer:
     """Simple in-proc per-host pacer to avoid hammering portals."""
@@ -108,6 +96,38 @@ def _pick_format_and_filename(filename: str, pil_img: Image.Image) -> Tuple[str,
         return "PNG", (os.path.splitext(filename)[0] + ".png")
     return "JPEG", (os.path.splitext(filename)[0] + ".jpg")
 
+def _encode_fetched_image(raw: bytes, filename: str, max_pixels: int) -> Tuple[bytes, Tuple[str, str]]:
+    """Decode -> optional resize -> JPEG/PNG bytes; returns (bytes, (filename, content_type))."""
+    # Same reduced decode as uploads (image_prep), so both paths produce the same pixels
+    img, size = image_prep.open_for_max_pixels(raw, max_pixels)
+    img.load()  # force decode to catch errors early
+
+    # Resize if needed
+    if size != img.size:
+        img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=image_prep.RESIZE_REDUCING_GAP)
+
+    # Decide format & filename
+    fmt, out_name = _pick_format_and_filename(filename, img)
+
+    # Convert for JPEG if needed
+    if fmt == "JPEG" and img.mode not in ("L", "RGB"):
+        # flatten alpha on white
+        bg = Image.new("RGB", img.size, (255, 255, 255))
+        if img.mode in ("RGBA", "LA"):
+            alpha = img.split()[-1]
+            bg.paste(img.convert("RGBA"), mask=alpha)
+        else:
+            bg.paste(img.convert("RGB"))
+        img = bg
+
+    # Save to bytes
+    buf = io.BytesIO()
+    save_kwargs = {"format": fmt}
+    if fmt == "JPEG":
+        save_kwargs.update(dict(quality=95, optimize=True))
+    img.save(buf, **save_kwargs)
+    return buf.getvalue(), (out_name, f"image/{fmt.lower()}")
+
 def smart_fetch_image_as_filestorage(
     url: str,
     *,
@@ -122,6 +142,7 @@ def smart_fetch_image_as_filestorage(
     extra_headers: Optional[dict] = None,
     cookie: Optional[str] = None,
     logger=None,
+    prep_runner: Optional[Callable] = None,
 ) -> Tuple[FileStorage, str]:
     """
     Robust, browser-like fetch -> PIL -> optional resize -> FileStorage.
@@ -129,6 +150,8 @@ def smart_fetch_image_as_filestorage(
     - Honors 429 Retry-After
     - Rotates/sets UA and Referer, sends realistic Accept headers
     - Optional allowlist to avoid accidental abuse
+    - prep_runner(fn, raw, *args) runs the decode/resize/encode step (e.g. in a
+      process pool); by default it runs in the calling thread
     """
     parsed = urllib.parse.urlparse(url)
     host = parsed.netloc
@@ -214,37 +237,13 @@ def smart_fetch_image_as_filestorage(
                 # still try to open as image — many serve image/* without CT set, or with octet-stream
             raw = resp.content
 
-            # PIL open
-            img = Image.open(io.BytesIO(raw))
-            img.load()  # force decode to catch errors early
-
-            # Resize if needed
-            if not _fits_pixel_budget(img, max_pixels):
-                img = _resize_to_max_pixels(img, max_pixels)
-
-            # Decide format & filename
-            fmt, out_name = _pick_format_and_filename(filename, img)
-
-            # Convert for JPEG if needed
-            if fmt == "JPEG" and img.mode not in ("L", "RGB"):
-                # flatten alpha on white
-                bg = Image.new("RGB", img.size, (255, 255, 255))
-                if img.mode in ("RGBA", "LA"):
-                    alpha = img.split()[-1]
-                    bg.paste(img.convert("RGBA"), mask=alpha)
-                else:
-                    bg.paste(img.convert("RGB"))
-                img = bg
-
-            # Save to bytes
-            buf = io.BytesIO()
-            save_kwargs = {"format": fmt}
-            if fmt == "JPEG":
-                save_kwargs.update(dict(quality=95, optimize=True))
-            img.save(buf, **save_kwargs)
-            buf.seek(0)
-
-            fs = FileStorage(stream=buf, filename=out_name, content_type=f"image/{fmt.lower()}")
+            # PIL open, resize, encode
+            if prep_runner is None:
+                encoded, (out_name, content_type) = _encode_fetched_image(raw, filename, max_pixels)
+            else:
+                encoded, (out_name, content_type) = prep_runner(_encode_fetched_image, raw, filename, max_pixels)
+
+            fs = FileStorage(stream=io.BytesIO(encoded), filename=out_name, content_type=content_type)
             return fs, out_name
 
         except httpx.HTTPStatusError as e:
@@ -259,6 +258,10 @@ def smart_fetch_image_as_filestorage(
                 logger.warning(f"Attempt {attempt}/{max_retries} network error: {e}")
             _sleep_with_retry_after(None, per_try_base_delay * attempt, per_try_jitter)
 
+        except image_prep.ImagePrepError:
+            # The image crashed or hung the prep process: fetching it again would too
+            raise
+
         except Exception as e:
             last_exc = e
             if logger:
@@ -11,6 +11,11 @@ import base64
 import uuid
 import zipfile
 import warnings
+import queue
+import heapq
+import itertools
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait, TimeoutError as FuturesTimeoutError
 from urllib.parse import urlparse
 from urllib.parse import quote
 warnings.filterwarnings("ignore", category=DeprecationWarning)
@@ -22,7 +27,7 @@ APP_USER_AGENT = "VoucherVisionGO/1.0 (University of Michigan; vouchervision.api
 from io import BytesIO
 from werkzeug.datastructures import FileStorage
 from PIL import Image
-from flask import Flask, request, jsonify, redirect, make_response, render_template
+from flask import Flask, Response, g, request, jsonify, redirect, make_response, render_template
 from flask_cors import CORS
 import logging
 from werkzeug.utils import secure_filename
@@ -31,13 +36,12 @@ from pathlib import Path
 import yaml
 import re
 from functools import wraps
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import textwrap
-from tabulate import tabulate
-import shutil
-import fitz  # PyMuPDF - PDF to image conversion
+# Heavy, rarely used dependencies are imported where they are used so they stay off
+# the cold-start path: fitz (PDF rendering), rasterio (COP90, on first elevation
+# query), openpyxl (PDF job workbooks), tabulate (text prompt listings) and
+# smtplib / email.mime (notification emails).
+# benchmarks/bench_import_time.py checks that they stay lazy.
 from pillow_heif import register_heif_opener
 register_heif_opener()
 
@@ -55,6 +59,12 @@ import google.auth
 from url_name_parser import extract_filename_from_url
 from impact import estimate_impact
 from anti_bot_fetch import smart_fetch_image_as_filestorage
+import image_prep
+from image_prep import ImagePrepPool
+from result_cache import build_cache_key, build_result_cache
+from prompt_registry import PromptRegistry
+from model_limiter import ModelCapacityError, ModelLimiterRegistry, billing_identity, is_rate_limit_error
+import stage_metrics
 
 '''
 ### TO UPDATE FROM MAIN VV REPO
@@ -226,19 +236,26 @@ def get_firebase_config():
 
 
 
-# Initialize Firebase Admin SDK with service account key
-try:
+def _initialize_firebase_app(name=None):
+    """Initialize a Firebase Admin app (the default app unless a name is given)"""
+    kwargs = {"name": name} if name else {}
     # Load service account credentials from Secret Manager
     cred_json = os.environ.get('firebase-admin-key')
     if cred_json:
         cred_dict = json.loads(cred_json)
         creds = credentials.Certificate(cred_dict)
-        firebase_admin.initialize_app(credential=creds)
+        firebase_app = firebase_admin.initialize_app(credential=creds, **kwargs)
         logger.info("Firebase Admin SDK initialized with service account credentials")
     else:
         project_id = os.environ.get("FIREBASE_PROJECT_ID", "vouchervision-387816")
-        firebase_admin.initialize_app(options={"projectId": project_id})
+        firebase_app = firebase_admin.initialize_app(options={"projectId": project_id}, **kwargs)
         logger.info(f"Firebase Admin SDK initialized for project: {project_id}")
+    return firebase_app
+
+
+# Initialize Firebase Admin SDK with service account key
+try:
+    _initialize_firebase_app()
 except ValueError:
     pass  # Already initialized
 except Exception as e:
@@ -321,6 +338,9 @@ def validate_api_key(api_key):
                     logger.warning(f"Expired API key used: {api_key[:8]}...")
                     return False
             
+            # Kept for the rest of the request (e.g. the key's response projection defaults)
+            g.api_key_data = key_data
+
             # Log API key usage (optional)
             db.collection('api_key_usage').add({
                 'api_key_id': api_key,
@@ -644,6 +664,8 @@ def get_payment_auth_context(req):
         auth_method = "user_gemini"
     else:
         auth_method = "server"
+    # Label the rest of this request's stage timings with the billing mode
+    stage_metrics.set_request_label("auth_method", auth_method)
 
     return {
         "gemini_api_key": gemini_api_key,
@@ -653,6 +675,103 @@ def get_payment_auth_context(req):
     }
 
 
+# Response field projection. Paths are dotted, e.g. "collage_info.base64image_text_collage".
+# "filename" is always kept so batch clients can match results to inputs.
+RESPONSE_PROJECTION_ALWAYS_KEEP = ("filename",)
+RESPONSE_INPUT_IMAGE_FIELD = "collage_info.base64image_input_resized"
+
+
+def _parse_field_list(value) -> list[str] | None:
+    """Normalize a fields/exclude value (comma-separated string or list) to a list of dotted paths"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, (list, tuple)):
+        return None
+    paths = []
+    for item in value:
+        for part in str(item).split(","):
+            part = part.strip()
+            if part and part not in paths:
+                paths.append(part)
+    return paths or None
+
+
+def _request_field_list(req, json_body, name):
+    for source in (req.form, req.args):
+        if source and name in source:
+            return _parse_field_list(source.getlist(name))
+    if isinstance(json_body, dict) and name in json_body:
+        return _parse_field_list(json_body.get(name))
+    return None
+
+
+def get_response_projection(req) -> dict:
+    """
+    Resolve the fields/exclude projection for a request.
+
+    Explicit fields=/exclude= (form, JSON or query) win; otherwise the
+    calling API key's response_fields/response_exclude defaults apply. The key's
+    doc is the one validate_api_key loaded for this request, so this reads nothing
+    from Firestore (Firebase-token callers have no key defaults).
+    """
+    json_body = req.get_json(silent=True) if req.is_json else {}
+    fields = _request_field_list(req, json_body, "fields")
+    exclude = _request_field_list(req, json_body, "exclude")
+    if fields is None and exclude is None:
+        key_data = g.get("api_key_data")
+        if key_data:
+            fields = _parse_field_list(key_data.get('response_fields'))
+            exclude = _parse_field_list(key_data.get('response_exclude'))
+    return {"fields": fields, "exclude": exclude}
+
+
+def projection_includes(projection: dict | None, path: str) -> bool:
+    """True if the projection keeps the dotted path (used to skip building unwanted payloads)"""
+    if not projection:
+        return True
+    fields = projection.get("fields")
+    exclude = projection.get("exclude") or []
+    if any(path == p or path.startswith(p + ".") for p in exclude):
+        return False
+    if fields:
+        return any(path == p or path.startswith(p + ".") or p.startswith(path + ".") for p in fields)
+    return True
+
+
+def project_response(results, projection: dict | None):
+    """Return results restricted to projection["fields"] and without projection["exclude"]"""
+    if not projection or not isinstance(results, dict) or "error" in results:
+        return results
+    fields = projection.get("fields")
+    exclude = projection.get("exclude")
+    if not fields and not exclude:
+        return results
+
+    if fields:
+        projected = OrderedDict()
+        for key, value in results.items():
+            if key in RESPONSE_PROJECTION_ALWAYS_KEEP or key in fields:
+                projected[key] = value
+                continue
+            nested = [p[len(key) + 1:] for p in fields if p.startswith(key + ".")]
+            if nested and isinstance(value, dict):
+                projected[key] = project_response(value, {"fields": nested})
+    else:
+        projected = OrderedDict(results)
+
+    for path in exclude or []:
+        key, _, rest = path.partition(".")
+        if key in RESPONSE_PROJECTION_ALWAYS_KEEP or key not in projected:
+            continue
+        if not rest:
+            del projected[key]
+        elif isinstance(projected[key], dict):
+            projected[key] = project_response(projected[key], {"exclude": [rest]})
+    return projected
+
+
 def build_request_analytics_context(
     req,
     *,
@@ -705,6 +824,7 @@ def rate_limited_keys_in_request(
     return keys
 
 
+@stage_metrics.timed_stage("quota_reserve")
 def check_and_reserve_quotas(
     user_email: str, model_keys: list[str]
 ) -> tuple[bool, dict[str, tuple[int, int]], str | None]:
@@ -765,6 +885,7 @@ def check_and_reserve_quotas(
         return (True, state, None)
 
 
+@stage_metrics.timed_stage("quota_release")
 def release_quotas(user_email: str, model_keys: list[str]) -> None:
     """Decrement each model_key's usage counter by 1 (e.g. after request failure).
 
@@ -1521,6 +1642,7 @@ def _extract_parsing_analytics(parsing_info_raw) -> tuple[dict, dict]:
     cost_in = _coerce_float(parsing_info_raw.get("cost_in"))
     cost_out = _coerce_float(parsing_info_raw.get("cost_out"))
     total_cost = cost_in + cost_out
+    memo = parsing_info_raw.get("memo") if isinstance(parsing_info_raw.get("memo"), dict) else {}
     sanitized = {
         "model": model_name,
         "input": tokens_in,
@@ -1529,6 +1651,8 @@ def _extract_parsing_analytics(parsing_info_raw) -> tuple[dict, dict]:
         "cost_in": cost_in,
         "cost_out": cost_out,
         "total_cost": total_cost,
+        "memo_hit": bool(memo.get("hit")),
+        "memo_avoided_cost_usd": _coerce_float(memo.get("avoided_cost_usd")),
     }
     convenience = {
         "parsing_model": model_name or None,
@@ -1618,6 +1742,7 @@ def build_usage_event(
         "notebook_mode": bool(analytics_ctx.get("notebook_mode")),
         "include_wfo": bool(analytics_ctx.get("include_wfo")),
         "include_cop90": bool(analytics_ctx.get("include_cop90")),
+        "cache_hit": bool((result.get("cache") or {}).get("hit")) if isinstance(result.get("cache"), dict) else False,
         "success": success,
         "status_code": int(status_code),
         "error_type": derived_error_type,
@@ -1670,6 +1795,7 @@ def record_usage_events(events: list[dict]) -> list[dict]:
     return recorded
 
 
+@stage_metrics.timed_stage("usage_persist")
 def persist_usage_events_and_rollups(events: list[dict], *, route_label: str) -> list[dict]:
     """Write events first, then project them into usage_statistics."""
     recorded = record_usage_events(events)
@@ -2063,6 +2189,61 @@ def update_usage_statistics(
     except Exception as e:
         logger.error(f"Error updating usage statistics: {str(e)}")
 
+# gunicorn worker processes serving this instance (see gunicorn.conf.py). Admission slots,
+# model limits, engine pools and metrics are per process, so instance-wide budgets below
+# are divided between the workers.
+GUNICORN_WORKERS = max(1, int(os.environ.get("GUNICORN_WORKERS", "1")))
+# Set by gunicorn.conf.py when the app is imported once in the master and forked into
+# GUNICORN_WORKERS workers (see reinitialize_after_fork)
+SERVE_PRELOADED = os.environ.get("GUNICORN_PRELOAD", "false").lower() == "true"
+
+
+def _worker_share(total, minimum=1):
+    """This worker's share of an instance-wide budget (never below minimum)"""
+    share = total // GUNICORN_WORKERS if isinstance(total, int) else total / GUNICORN_WORKERS
+    return max(minimum, share)
+
+
+# Decode / resize / re-encode of uploads, URL images and PDF pages runs in a process pool
+# so it does not hold the GIL on request threads (see image_prep). IMAGE_PREP_PROCESSES=0
+# keeps it in-thread; the default splits the vCPUs between the gunicorn workers.
+IMAGE_PREP_PROCESSES = int(os.environ.get(
+    "IMAGE_PREP_PROCESSES", max(1, (os.cpu_count() or 1) // GUNICORN_WORKERS)
+))
+# Jobs queued for the pool at once; beyond that callers wait, then get a 503 (never run in-thread)
+IMAGE_PREP_MAX_QUEUE = int(os.environ.get("IMAGE_PREP_MAX_QUEUE", 4 * max(1, IMAGE_PREP_PROCESSES)))
+IMAGE_PREP_MAX_WAIT_SECONDS = float(os.environ.get("IMAGE_PREP_MAX_WAIT_SECONDS", 30))
+# Inputs below this size are prepared in-thread (the process round trip costs more)
+IMAGE_PREP_INLINE_MAX_BYTES = int(os.environ.get("IMAGE_PREP_INLINE_MAX_BYTES", 256 * 1024))
+# A pool job running longer than this fails its request (a hung decode never pins a thread)
+IMAGE_PREP_JOB_TIMEOUT_SECONDS = float(os.environ.get("IMAGE_PREP_JOB_TIMEOUT_SECONDS", 120))
+# PDF helper processes (one per PDF being rendered) alive at once; further PDFs wait, then get a 503
+IMAGE_PREP_MAX_PDF_HELPERS = int(os.environ.get("IMAGE_PREP_MAX_PDF_HELPERS", max(1, IMAGE_PREP_PROCESSES)))
+
+
+def _build_image_prep_pool():
+    return ImagePrepPool(
+        IMAGE_PREP_PROCESSES,
+        max_pending=IMAGE_PREP_MAX_QUEUE,
+        inline_max_bytes=IMAGE_PREP_INLINE_MAX_BYTES,
+        max_wait_seconds=IMAGE_PREP_MAX_WAIT_SECONDS,
+        job_timeout_seconds=IMAGE_PREP_JOB_TIMEOUT_SECONDS,
+        max_pdf_helpers=IMAGE_PREP_MAX_PDF_HELPERS,
+    )
+
+
+# Processes are started on first use, so importing the app (and the gunicorn master) stays cheap
+IMAGE_PREP_POOL = _build_image_prep_pool()
+
+
+def image_prep_busy_response(error):
+    """503 for a request whose image prep found the pool queue full (the client should retry)"""
+    response = make_response(jsonify({'error': f'Server is busy preparing images. Please try again later. ({error})'}), 503)
+    response.headers['Retry-After'] = str(max(1, int(IMAGE_PREP_MAX_WAIT_SECONDS)))
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response
+
+
 def resize_image_to_max_pixels(image, max_pixels=5200000):
     """
     Resize an image to have no more than max_pixels while maintaining aspect ratio.
@@ -2074,28 +2255,13 @@ def resize_image_to_max_pixels(image, max_pixels=5200000):
     Returns:
         PIL.Image: Resized image or original image if no resize needed
     """
-    # Get current dimensions
     width, height = image.size
-    current_pixels = width * height
-    
+    new_width, new_height = image_prep.fit_to_max_pixels(image, max_pixels)
+
     # If image is already within limits, return as-is
-    if current_pixels <= max_pixels:
+    if (new_width, new_height) == (width, height):
         return image
-    
-    # Calculate the scale factor needed
-    scale_factor = math.sqrt(max_pixels / current_pixels)
-    
-    # Calculate new dimensions
-    new_width = int(width * scale_factor)
-    new_height = int(height * scale_factor)
-    
-    # Ensure we don't exceed the pixel limit due to rounding
-    while new_width * new_height > max_pixels:
-        if new_width > new_height:
-            new_width -= 1
-        else:
-            new_height -= 1
-    
+
     # Resize the image using high-quality resampling
     resized_image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
     
@@ -2104,39 +2270,61 @@ def resize_image_to_max_pixels(image, max_pixels=5200000):
     return resized_image
 
 MAX_PDF_PAGES = 200
+# Pages of one synchronous PDF request processed concurrently, and rendered pages kept
+# ready behind them; a request holds roughly (workers + prefetch) page images at once
+PDF_PAGE_WORKERS = max(1, int(os.environ.get("PDF_PAGE_WORKERS", 4)))
+PDF_PAGE_PREFETCH = max(1, int(os.environ.get("PDF_PAGE_PREFETCH", 2)))
+# With pdf_text_layer=true, a page whose text layer has at least this many characters,
+# at most this share of them garbage, is parsed from that text without rendering or OCR
+PDF_TEXT_LAYER_MIN_CHARS = int(os.environ.get("PDF_TEXT_LAYER_MIN_CHARS", 80))
+PDF_TEXT_LAYER_MAX_GARBAGE_RATIO = float(os.environ.get("PDF_TEXT_LAYER_MAX_GARBAGE_RATIO", 0.02))
+PDF_TEXT_LAYER_ENGINE = "pdf_text_layer"
 
-def convert_pdf_to_page_images(pdf_bytes, pdf_filename, dpi=150):
+
+def pdf_page_filename(pdf_filename, page_num):
+    """Name of the JPEG for 0-based page_num, e.g. {pdf_stem}__page_0001.jpg"""
+    return f"{os.path.splitext(pdf_filename)[0]}__page_{page_num + 1:04d}.jpg"
+
+
+def iter_pdf_page_images(pdf_bytes, pdf_filename, dpi=150, batch_pages=1, max_pixels=5200000,
+                         text_layer=False):
     """
-    Convert each page of a PDF to an in-memory JPEG FileStorage object.
+    Yield (page_file, page_text) for each page of a PDF, in order.
+
+    page_file is an in-memory JPEG FileStorage object. The PDF is parsed once and
+    pages are rendered batch_pages at a time, one batch ahead of the caller, so only
+    two batches are held however long the PDF is (see ImagePrepPool.iter_pdf_pages). Pages
+    larger than max_pixels at dpi are rendered directly at max_pixels, so they never
+    need a resize afterwards.
+
+    page_text is None unless text_layer is set and the page has a usable text
+    layer (see PDF_TEXT_LAYER_MIN_CHARS); such a page is not rendered and its
+    page_file is None.
 
     Args:
         pdf_bytes: Raw bytes of the PDF file.
         pdf_filename: Original filename (e.g., "specimen.pdf").
         dpi: Rendering resolution. 150 balances OCR quality vs size.
-
-    Returns:
-        List of FileStorage objects, one per page, named like
-        {pdf_stem}__page_0001.jpg, {pdf_stem}__page_0002.jpg, etc.
+        batch_pages: Pages rendered per batch.
+        max_pixels: Pixel budget per page image.
+        text_layer: Take born-digital pages from their text layer.
     """
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    page_files = []
-    base_name = os.path.splitext(pdf_filename)[0]
-
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        pix = page.get_pixmap(dpi=dpi)
-        img_bytes = pix.tobytes("jpeg")
-        page_filename = f"{base_name}__page_{page_num + 1:04d}.jpg"
-        file_obj = FileStorage(
+    text_check = (PDF_TEXT_LAYER_MIN_CHARS, PDF_TEXT_LAYER_MAX_GARBAGE_RATIO) if text_layer else None
+    pages = IMAGE_PREP_POOL.iter_pdf_pages(
+        pdf_bytes, dpi, max_pixels=max_pixels, text_layer=text_check, batch_pages=max(1, batch_pages)
+    )
+    for page_num, (img_bytes, page_text) in enumerate(pages):
+        if page_text is not None:
+            yield None, page_text
+            continue
+        yield FileStorage(
             stream=io.BytesIO(img_bytes),
-            filename=page_filename,
+            filename=pdf_page_filename(pdf_filename, page_num),
             content_type='image/jpeg'
-        )
-        page_files.append(file_obj)
+        ), None
 
-    doc.close()
-    return page_files
 
+@stage_metrics.timed_stage("resize")
 def process_uploaded_file_with_resize(file, max_pixels=5200000):
     """
     Process an uploaded file, resize if necessary, and return a new file-like object.
@@ -2149,80 +2337,32 @@ def process_uploaded_file_with_resize(file, max_pixels=5200000):
         FileStorage: New file object with resized image, or original if no resize needed
     """
     try:
-        # Open the image
-        image = Image.open(file.stream)
         original_filename = file.filename
-        
-        # Check if resize is needed
-        width, height = image.size
-        current_pixels = width * height
-
-        is_heic = original_filename and original_filename.lower().endswith(('.heic', '.heif'))
-        if current_pixels <= max_pixels and not is_heic:
+        image_bytes = file.stream.read()
+        if not image_prep.needs_resize(image_bytes, original_filename, max_pixels):
             file.stream.seek(0)
             return file
 
-        
-        # if current_pixels <= max_pixels:
-        #     # No resize needed, reset stream position and return original
-        #     file.stream.seek(0)
-        #     return file
-        
-        # Resize the image
-        resized_image = resize_image_to_max_pixels(image, max_pixels)
-        
-        # Save resized image to bytes
-        img_byte_array = io.BytesIO()
-        
-        # Determine format - default to JPEG for compatibility
-        image_format = 'JPEG'
-        if original_filename and original_filename.lower().endswith('.png'):
-            image_format = 'PNG'
-        elif original_filename and original_filename.lower().endswith(('.jpg', '.jpeg')):
-            image_format = 'JPEG'
-        
-        # Convert to RGB if necessary for JPEG
-        if image_format == 'JPEG':
-            if resized_image.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', resized_image.size, (255, 255, 255))
-                if resized_image.mode == 'P':
-                    resized_image = resized_image.convert('RGBA')
-                background.paste(resized_image, mask=resized_image.split()[-1] if resized_image.mode == 'RGBA' else None)
-                resized_image = background
-            elif resized_image.mode != 'RGB':
-                resized_image = resized_image.convert('RGB')
-        
-        # Save with high quality
-        save_kwargs = {'format': image_format}
-        if image_format == 'JPEG':
-            save_kwargs['quality'] = 95
-            save_kwargs['optimize'] = True
-        
-        resized_image.save(img_byte_array, **save_kwargs)
-        img_byte_array.seek(0)
-        
-        # Create new FileStorage object
-        from werkzeug.datastructures import FileStorage
-        
-        # Update filename if format changed
-        if image_format == 'JPEG' and original_filename and not original_filename.lower().endswith(('.jpg', '.jpeg')):
-            name_without_ext = os.path.splitext(original_filename)[0]
-            original_filename = f"{name_without_ext}.jpg"
-        
-        resized_file = FileStorage(
-            stream=img_byte_array,
-            filename=original_filename,
-            content_type=f'image/{image_format.lower()}'
+        # Resize and re-encode off the request thread
+        resized_bytes, (filename, content_type) = IMAGE_PREP_POOL.run(
+            image_prep.resize_for_upload, image_bytes, original_filename, max_pixels
         )
-        
-        return resized_file
-        
+        return FileStorage(
+            stream=io.BytesIO(resized_bytes),
+            filename=filename,
+            content_type=content_type
+        )
+
+    except image_prep.ImagePrepError:
+        # The image crashed or hung the prep process: it must not be decoded in this one
+        raise
     except Exception as e:
         logger.error(f"Error processing image for resize: {e}")
         # If there's an error, return the original file
         file.stream.seek(0)
         return file
     
+@stage_metrics.timed_stage("fetch")
 def process_url_image_with_resize(image_url, max_pixels=5000000):
     """
     Download and resize an image from URL if necessary.
@@ -2249,15 +2389,7 @@ def process_url_image_with_resize(image_url, max_pixels=5000000):
         # Get filename from URL
         filename = extract_filename_from_url(image_url)
         
-        # Open image from response content
-        image = Image.open(io.BytesIO(response.content))
-        
-        # Check if resize is needed
-        width, height = image.size
-        current_pixels = width * height
-        is_heic = filename and filename.lower().endswith(('.heic', '.heif'))
-
-        if current_pixels <= max_pixels and not is_heic:
+        if not image_prep.needs_resize(response.content, filename, max_pixels):
             # No resize needed, create FileStorage from original content
             file_obj = FileStorage(
                 stream=io.BytesIO(response.content),
@@ -2265,53 +2397,18 @@ def process_url_image_with_resize(image_url, max_pixels=5000000):
                 content_type=response.headers.get('Content-Type', 'image/jpeg')
             )
             return file_obj, filename
-        
-        # Resize the image (returns original if already within pixel limit)
-        resized_image = resize_image_to_max_pixels(image, max_pixels)
-        
-        # Save resized image to bytes
-        img_byte_array = io.BytesIO()
-        
-        # Determine format - HEIC always converts to JPEG
-        image_format = 'JPEG'
-        if filename and filename.lower().endswith('.png'):
-            image_format = 'PNG'
-        
-        # Convert to RGB if necessary for JPEG
-        if image_format == 'JPEG':
-            if resized_image.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', resized_image.size, (255, 255, 255))
-                if resized_image.mode == 'P':
-                    resized_image = resized_image.convert('RGBA')
-                background.paste(resized_image, mask=resized_image.split()[-1] if resized_image.mode == 'RGBA' else None)
-                resized_image = background
-            elif resized_image.mode != 'RGB':
-                # Catches YCbCr, CMYK, etc. (common in HEIC)
-                resized_image = resized_image.convert('RGB')
-        
-        # Save with high quality
-        save_kwargs = {'format': image_format}
-        if image_format == 'JPEG':
-            save_kwargs['quality'] = 95
-            save_kwargs['optimize'] = True
-        
-        resized_image.save(img_byte_array, **save_kwargs)
-        img_byte_array.seek(0)
-        
-        # Update filename if format changed (covers HEIC -> JPEG rename)
-        if image_format == 'JPEG' and filename and not filename.lower().endswith(('.jpg', '.jpeg')):
-            name_without_ext = os.path.splitext(filename)[0]
-            filename = f"{name_without_ext}.jpg"
-        
-        # Create FileStorage object
+
+        # Resize and re-encode off the request thread (HEIC always converts to JPEG)
+        resized_bytes, (filename, content_type) = IMAGE_PREP_POOL.run(
+            image_prep.resize_for_upload, response.content, filename, max_pixels
+        )
         file_obj = FileStorage(
-            stream=img_byte_array,
+            stream=io.BytesIO(resized_bytes),
             filename=filename,
-            content_type=f'image/{image_format.lower()}'
+            content_type=content_type
         )
-        
         return file_obj, filename
-        
+
     except Exception as e:
         logger.error(f"Error processing URL image for resize: {e}")
         raise
@@ -2366,6 +2463,10 @@ class SimpleEmailSender:
             return False
         
         try:
+            import smtplib
+            from email.mime.multipart import MIMEMultipart
+            from email.mime.text import MIMEText
+
             # Create a multipart message
             msg = MIMEMultipart()
             msg['From'] = f"{self.from_name} <{self.from_email}>" if self.from_name else self.from_email
@@ -2698,6 +2799,10 @@ USER_PROMPTS_PREFIX = os.environ.get("USER_PROMPTS_PREFIX", "user-generated-prom
 USER_PROMPTS_MAX_BYTES = int(os.environ.get("USER_PROMPTS_MAX_BYTES", str(256 * 1024)))
 USER_PROMPTS_LOCAL_CACHE_DIR = os.environ.get("USER_PROMPTS_CACHE_DIR", "/tmp/vvgo_user_prompts")
 
+# Compiled prompt versions shared by the processor and the /prompts routes (see prompt_registry.py)
+PROMPT_REGISTRY_MAX_ENTRIES = int(os.environ.get("PROMPT_REGISTRY_MAX_ENTRIES", "256"))
+PROMPT_REGISTRY = PromptRegistry(max_entries=PROMPT_REGISTRY_MAX_ENTRIES)
+
 
 def _user_prompt_error_category(exc: Exception) -> str:
     """Return a sanitized error category safe for logs and responses."""
@@ -2840,6 +2945,28 @@ def _validate_user_prompt_yaml(raw_bytes: bytes) -> dict:
     return parsed
 
 
+def _user_prompt_version_key(data: dict) -> str:
+    """Version of a user prompt record: its updated_at in epoch milliseconds ('' if unknown)."""
+    updated_at = (data or {}).get("updated_at")
+    try:
+        if updated_at is not None and hasattr(updated_at, "timestamp"):
+            return str(int(updated_at.timestamp() * 1000))
+        if isinstance(updated_at, (int, float)):
+            return str(int(updated_at))
+    except Exception:
+        pass
+    return ""
+
+
+def _compiled_user_prompt(prompt_id: str, data: dict):
+    """Compiled prompt for a user_prompts record; GCS is only read for a new version."""
+    return PROMPT_REGISTRY.get_version(
+        prompt_id,
+        _user_prompt_version_key(data),
+        lambda: _download_user_prompt_bytes(data.get('gcs_path')),
+    )
+
+
 def _resolve_user_prompt_local_path(filename: str, caller_email: str | None) -> str:
     """Materialize a user-generated prompt (looked up by filename) to a local path.
 
@@ -2873,15 +3000,7 @@ def _resolve_user_prompt_local_path(filename: str, caller_email: str | None) ->
     if not gcs_path:
         raise FileNotFoundError(f"user prompt {safe_filename} has no storage path")
 
-    updated_at = data.get("updated_at")
-    updated_key = ""
-    try:
-        if updated_at is not None and hasattr(updated_at, "timestamp"):
-            updated_key = str(int(updated_at.timestamp() * 1000))
-        elif isinstance(updated_at, (int, float)):
-            updated_key = str(int(updated_at))
-    except Exception:
-        updated_key = ""
+    updated_key = _user_prompt_version_key(data)
 
     os.makedirs(USER_PROMPTS_LOCAL_CACHE_DIR, exist_ok=True)
     cache_name = f"{updated_key}__{safe_filename}"
@@ -3279,6 +3398,11 @@ def _build_pdf_job_analytics_context(job_data: dict) -> dict:
     return analytics_ctx
 
 
+def _pdf_job_uses_text_layer(job_data: dict) -> bool:
+    """Whether born-digital pages of this job are parsed from their text layer (see iter_pdf_page_images)"""
+    return bool(job_data.get("pdf_text_layer")) and not (job_data.get("ocr_only") or job_data.get("notebook_mode"))
+
+
 def _build_pdf_job_process_kwargs(job_data: dict) -> dict:
     return {
         "engine_options": list(job_data.get("engine_options") or []),
@@ -3294,6 +3418,7 @@ def _build_pdf_job_process_kwargs(job_data: dict) -> dict:
         "user_vertex_project": job_data.get("user_vertex_project"),
         "user_vertex_region": job_data.get("user_vertex_region"),
         "caller_email": _normalize_email_identity(job_data.get("user_email")),
+        "include_input_image": projection_includes(job_data.get("response_projection"), RESPONSE_INPUT_IMAGE_FIELD),
     }
 
 
@@ -3357,34 +3482,66 @@ def _mark_pdf_job_failed(job_id: str, error_message: str, *, phase: str) -> dict
     return _get_pdf_job_or_404(job_id)
 
 
-def _maybe_enqueue_pdf_finalize(job_data: dict) -> bool:
-    job_id = job_data["job_id"]
+# Job counter moved by a page in each terminal status; completed_pages counts both
+_PDF_PAGE_STATUS_COUNTERS = {"completed": "successful_pages", "failed": "failed_pages"}
+
+
+def _pdf_page_counter_deltas(counted_status: str | None, page_status: str) -> dict[str, int]:
+    """Job counter changes when a page counted as counted_status (None: not yet counted) ends as page_status"""
+    if counted_status == page_status:
+        return {}
+    deltas = {_PDF_PAGE_STATUS_COUNTERS[page_status]: 1}
+    if counted_status in _PDF_PAGE_STATUS_COUNTERS:
+        deltas[_PDF_PAGE_STATUS_COUNTERS[counted_status]] = -1
+    else:
+        deltas["completed_pages"] = 1
+    return deltas
+
+
+def _record_pdf_page_result(job_id: str, page_index: int, page_update: dict) -> bool:
+    """
+    Store a finished page and move the job's progress counters in one transaction.
+
+    The page's counted_status is the status already included in the job's
+    successful / failed / completed_pages. A redelivered page task therefore moves
+    its page between counters and never counts it twice. The counters change by
+    Increment. Only the page doc and the job doc are read, however many pages the
+    job has. The update that brings completed_pages up to page_count also marks
+    the job finalizing, so the finalize task is enqueued exactly once; finalize
+    recounts the pages. Returns whether this call enqueued it.
+    """
     job_ref = db.collection("pdf_jobs").document(job_id)
+    page_ref = job_ref.collection("pages").document(f"{page_index:04d}")
 
     @_gc_firestore.transactional
     def _txn(transaction):
-        current_doc = job_ref.get(transaction=transaction)
-        if not current_doc.exists:
-            return False
-        current_data = current_doc.to_dict() or {}
-        if current_data.get("finalize_enqueued_at"):
-            return False
-        if current_data.get("status") not in {"running", "finalizing"}:
+        page_doc = page_ref.get(transaction=transaction)
+        job_doc = job_ref.get(transaction=transaction)
+        counted_status = (page_doc.to_dict() or {}).get("counted_status") if page_doc.exists else None
+        deltas = _pdf_page_counter_deltas(counted_status, page_update["status"])
+        transaction.set(page_ref, {**page_update, "counted_status": page_update["status"]}, merge=True)
+        if not job_doc.exists:
             return False
-        page_count = _coerce_int(current_data.get("page_count"))
-        terminal_count = _coerce_int(current_data.get("successful_pages")) + _coerce_int(current_data.get("failed_pages"))
-        if page_count <= 0 or terminal_count < page_count:
-            return False
-        transaction.update(
-            job_ref,
-            {
+
+        job_data = job_doc.to_dict() or {}
+        job_update = {field: firestore.Increment(delta) for field, delta in deltas.items()}
+        job_update["updated_at"] = firestore.SERVER_TIMESTAMP
+        page_count = _coerce_int(job_data.get("page_count"))
+        completed_pages = _coerce_int(job_data.get("completed_pages")) + deltas.get("completed_pages", 0)
+        should_finalize = (
+            page_count > 0
+            and completed_pages >= page_count
+            and not job_data.get("finalize_enqueued_at")
+            and job_data.get("status") in {"running", "finalizing"}
+        )
+        if should_finalize:
+            job_update.update({
                 "status": "finalizing",
                 "phase": "finalizing",
-                "updated_at": firestore.SERVER_TIMESTAMP,
                 "finalize_enqueued_at": firestore.SERVER_TIMESTAMP,
-            },
-        )
-        return True
+            })
+        transaction.update(job_ref, job_update)
+        return should_finalize
 
     should_enqueue = _txn(db.transaction())
     if should_enqueue:
@@ -3394,36 +3551,6 @@ def _maybe_enqueue_pdf_finalize(job_data: dict) -> bool:
     return should_enqueue
 
 
-def _refresh_pdf_job_counters(job_id: str) -> dict | None:
-    pages = _load_pdf_job_pages(job_id)
-    page_count = len(pages)
-    successful_pages = sum(1 for page in pages if page.get("status") == "completed")
-    failed_pages = sum(1 for page in pages if page.get("status") == "failed")
-    completed_pages = successful_pages + failed_pages
-    job_ref = db.collection("pdf_jobs").document(job_id)
-    status = "running"
-    phase = "processing_pages"
-    if page_count and completed_pages >= page_count:
-        status = "finalizing"
-        phase = "finalizing"
-    job_ref.set(
-        {
-            "page_count": page_count,
-            "successful_pages": successful_pages,
-            "failed_pages": failed_pages,
-            "completed_pages": completed_pages,
-            "status": status,
-            "phase": phase,
-            "updated_at": firestore.SERVER_TIMESTAMP,
-        },
-        merge=True,
-    )
-    job_data = _get_pdf_job_or_404(job_id)
-    if job_data:
-        _maybe_enqueue_pdf_finalize(job_data)
-    return job_data
-
-
 def _reserve_pdf_page_pro_quota_if_needed(
     job_data: dict,
 ) -> tuple[bool, list[str], str | None, int, int]:
@@ -3773,30 +3900,275 @@ def authenticated_route(f):
     return decorated_function
 
 
+def _request_flag(req, name) -> bool:
+    """Read a boolean option from form, query string or JSON body"""
+    value = req.form.get(name) or req.args.get(name)
+    if value is None and req.is_json:
+        value = (req.get_json(silent=True) or {}).get(name)
+    return str(value).lower() == 'true' if value is not None else False
+
+
+def timed_route(route_label):
+    """Collect stage timings for a route (see stage_metrics); include_timings=true returns them"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method == 'OPTIONS':
+                return f(*args, **kwargs)
+            _, token = stage_metrics.start_request(
+                route_label, include_in_response=_request_flag(request, 'include_timings')
+            )
+            try:
+                with stage_metrics.span("request"):
+                    return f(*args, **kwargs)
+            finally:
+                stage_metrics.end_request(token)
+        return decorated_function
+    return decorator
+
+
+# Hand images to CollageEngine / OCR as in-memory streams instead of temp files. Off until the
+# engines are verified with streams: one that fails on a stream with anything but TypeError /
+# AttributeError (cv2.error, OSError, ValueError) fails the request instead of falling back.
+IMAGE_PIPELINE_IN_MEMORY = os.environ.get("IMAGE_PIPELINE_IN_MEMORY", "false").lower() == "true"
+# Engine keys (collage_run, ocr_gemini) always given a temp file path
+IMAGE_PIPELINE_PATH_ONLY_ENGINES = frozenset(
+    key.strip() for key in os.environ.get("IMAGE_PIPELINE_PATH_ONLY_ENGINES", "").split(",") if key.strip()
+)
+
+
+class _EngineImageStream(io.BytesIO):
+    """Named in-memory image for the engines; remembers whether the engine read any of it"""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+        self.was_read = False
+
+    def read(self, *args):
+        self.was_read = True
+        return super().read(*args)
+
+    def read1(self, *args):
+        self.was_read = True
+        return super().read1(*args)
+
+    def readinto(self, buffer):
+        self.was_read = True
+        return super().readinto(buffer)
+
+    def readline(self, *args):
+        self.was_read = True
+        return super().readline(*args)
+
+    def getvalue(self):
+        self.was_read = True
+        return super().getvalue()
+
+    def getbuffer(self):
+        self.was_read = True
+        return super().getbuffer()
+
+# Number of independent CollageEngine (OpenVINO) instances per worker; each serves one
+# request at a time. The default splits min(4, vCPUs) between the gunicorn workers.
+COLLAGE_ENGINE_POOL_SIZE = int(os.environ.get(
+    "COLLAGE_ENGINE_POOL_SIZE", str(_worker_share(min(4, os.cpu_count() or 1)))
+))
+
+# Content-addressed result cache (see result_cache.py). Backend: none | memory | disk | gcs.
+# Bump RESULT_CACHE_VERSION when a code change alters results for identical inputs.
+RESULT_CACHE_VERSION = 1
+RESULT_CACHE_BACKEND = os.environ.get("RESULT_CACHE_BACKEND", "none")
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", "/tmp/vvgo_result_cache")
+RESULT_CACHE_GCS_BUCKET = os.environ.get("RESULT_CACHE_GCS_BUCKET", "")
+RESULT_CACHE_GCS_PREFIX = os.environ.get("RESULT_CACHE_GCS_PREFIX", "result-cache")
+
+# OCR-stage cache keyed by (collage image, OCR model, ocr_prompt_option), independent of
+# the LLM stage so re-parsing with another prompt / llm_model skips OCR. Same backends.
+OCR_CACHE_BACKEND = os.environ.get("OCR_CACHE_BACKEND", "none")
+OCR_CACHE_TTL_SECONDS = float(os.environ.get("OCR_CACHE_TTL_SECONDS", str(30 * 24 * 60 * 60)))
+OCR_CACHE_MAX_BYTES = int(os.environ.get("OCR_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+OCR_CACHE_DIR = os.environ.get("OCR_CACHE_DIR", "/tmp/vvgo_ocr_cache")
+OCR_CACHE_GCS_PREFIX = os.environ.get("OCR_CACHE_GCS_PREFIX", "ocr-cache")
+
+# LLM parse memo keyed by (rendered prompt text, llm model, generation config), so
+# duplicate labels, client retries and repeated PDF cover sheets skip the LLM call.
+LLM_CACHE_BACKEND = os.environ.get("LLM_CACHE_BACKEND", "none")
+LLM_CACHE_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 60 * 60)))
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LLM_CACHE_DIR = os.environ.get("LLM_CACHE_DIR", "/tmp/vvgo_llm_cache")
+LLM_CACHE_GCS_PREFIX = os.environ.get("LLM_CACHE_GCS_PREFIX", "llm-cache")
+
+# Streaming /process responses (Accept: text/event-stream or application/x-ndjson).
+# The pipeline runs on a small persistent worker pool; at most STREAM_MAX_PENDING
+# more streams wait for a worker, further ones are rejected with 429.
+STREAM_MAX_WORKERS = int(os.environ.get("STREAM_MAX_WORKERS", "8"))
+STREAM_MAX_PENDING = int(os.environ.get("STREAM_MAX_PENDING", "8"))
+STREAM_HEARTBEAT_SECONDS = float(os.environ.get("STREAM_HEARTBEAT_SECONDS", "15"))
+
+# Idle (VoucherVision, GoogleGeminiHandler) pairs kept across requests, over all
+# prompt / model / billing-identity keys (see LLMHandlerPool)
+LLM_HANDLER_POOL_SIZE = int(os.environ.get("LLM_HANDLER_POOL_SIZE", "32"))
+
+# Multi-engine OCR fan-out (see VoucherVisionProcessor.perform_ocr)
+OCR_ENGINE_MAX_WORKERS = int(os.environ.get("OCR_ENGINE_MAX_WORKERS", "16"))
+OCR_ENGINE_TIMEOUT_SECONDS = float(os.environ.get("OCR_ENGINE_TIMEOUT_SECONDS", "240"))
+
+# Adaptive concurrency limit per (Gemini model, billing identity) around every OCR and
+# LLM call (see model_limiter.py). A call waits up to MODEL_LIMIT_MAX_WAIT_SECONDS for
+# a slot before the request is answered with a 429. The limits are for the whole instance;
+# each gunicorn worker runs its own limiter with its share (at least one call).
+MODEL_LIMIT_INITIAL = _worker_share(float(os.environ.get("MODEL_LIMIT_INITIAL", "8")), minimum=1.0)
+MODEL_LIMIT_MIN = _worker_share(float(os.environ.get("MODEL_LIMIT_MIN", "1")), minimum=1.0)
+MODEL_LIMIT_MAX = _worker_share(float(os.environ.get("MODEL_LIMIT_MAX", "64")), minimum=1.0)
+MODEL_LIMIT_LATENCY_TOLERANCE = float(os.environ.get("MODEL_LIMIT_LATENCY_TOLERANCE", "2.0"))
+MODEL_LIMIT_MAX_WAIT_SECONDS = float(os.environ.get("MODEL_LIMIT_MAX_WAIT_SECONDS", "60"))
+# Limiters kept per process; least recently used (model, billing identity) pairs go first
+MODEL_LIMIT_MAX_ENTRIES = int(os.environ.get("MODEL_LIMIT_MAX_ENTRIES", "1024"))
+
+# Direct mapping from API model names to api_cost.yaml constants; these are also the
+# model label values of the stage metrics (other names are recorded as "other")
+LLM_COST_NAMES = {
+    "gemini-2.0-flash": "GEMINI_2_0_FLASH",
+    "gemini-1.5-flash": "GEMINI_1_5_FLASH",
+    "gemini-1.5-pro": "GEMINI_1_5_PRO",
+    "gemini-2.5-flash": "GEMINI_2_5_FLASH",
+    "gemini-2.5-pro": "GEMINI_2_5_PRO",
+    "gemini-3-pro-preview": "GEMINI_3_PRO",
+    "gemini-3-flash-preview": "GEMINI_3_FLASH",
+    "gemini-3-flash": "GEMINI_3_FLASH",
+
+    "gemini-3.1-pro-preview": "GEMINI_3_1_PRO",
+    "gemini-3.1-pro": "GEMINI_3_1_PRO",
+
+    "gemini-3.1-flash-lite-preview": "GEMINI_3_1_FLASH_LITE",
+    "gemini-3.1-flash-lite": "GEMINI_3_1_FLASH_LITE",
+
+    "gemini-3.5-flash": "GEMINI_3_5_FLASH",
+}
+stage_metrics.register_models(LLM_COST_NAMES)
+
+
+def _parse_throttle_weights(raw):
+    """THROTTLE_USER_WEIGHTS is a JSON object of email -> admission weight (default 1.0)"""
+    try:
+        weights = json.loads(raw) if raw else {}
+        return {str(k).strip().lower(): float(v) for k, v in weights.items() if float(v) > 0}
+    except (ValueError, TypeError, AttributeError):
+        logger.warning("Ignoring malformed THROTTLE_USER_WEIGHTS")
+        return {}
+
+
+# Processing slots and admission queue in front of them (see RequestThrottler). Both are
+# set for the whole instance; each gunicorn worker enforces its share.
+THROTTLE_MAX_CONCURRENT = _worker_share(int(os.environ.get("THROTTLE_MAX_CONCURRENT", "32")))
+THROTTLE_MAX_QUEUE = _worker_share(int(os.environ.get("THROTTLE_MAX_QUEUE", "64")), minimum=0)
+THROTTLE_MAX_WAIT_SECONDS = float(os.environ.get("THROTTLE_MAX_WAIT_SECONDS", "30"))
+THROTTLE_USER_WEIGHTS = _parse_throttle_weights(os.environ.get("THROTTLE_USER_WEIGHTS", ""))
+
+
+class _ThrottleWaiter:
+    __slots__ = ("user", "event", "granted", "cancelled")
+
+    def __init__(self, user):
+        self.user = user
+        self.event = threading.Event()
+        self.granted = False
+        self.cancelled = False
+
+
 class RequestThrottler:
     """
     Class to handle throttling of concurrent requests
+
+    When every slot is busy, acquire() waits in a bounded admission queue for
+    up to max_wait_seconds instead of failing immediately. Waiters are admitted
+    with start-time fair queuing per user: each user's queued requests get
+    increasing virtual start tags (spaced 1/weight apart), and a freed slot goes
+    to the waiter with the smallest tag, so one user's large batch cannot starve
+    another user's interactive requests.
     """
-    def __init__(self, max_concurrent=32): 
-        self.semaphore = threading.Semaphore(max_concurrent)
+    def __init__(self, max_concurrent=32, max_queue=THROTTLE_MAX_QUEUE,
+                 max_wait_seconds=THROTTLE_MAX_WAIT_SECONDS, user_weights=None):
         self.active_count = 0
         self.lock = threading.Lock()
         self.max_concurrent = max_concurrent
-        
-    def acquire(self):
-        """Acquire a slot for processing"""
-        acquired = self.semaphore.acquire(blocking=False)
-        if acquired:
-            with self.lock:
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.user_weights = THROTTLE_USER_WEIGHTS if user_weights is None else user_weights
+        self._waiters = []  # heap of (start_tag, seq, waiter)
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._user_finish = {}
+        self.queued = 0
+        self.admitted = 0
+        self.admitted_after_wait = 0
+        self.rejected_queue_full = 0
+        self.timed_out = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seen = 0.0
+        self.max_queue_seen = 0
+
+    def _weight(self, user):
+        return self.user_weights.get((user or "").strip().lower(), 1.0)
+
+    def acquire(self, user=None):
+        """Acquire a slot for processing, waiting in the fair queue if all slots are busy"""
+        with self.lock:
+            if self.active_count < self.max_concurrent and self.queued == 0:
                 self.active_count += 1
+                self.admitted += 1
                 logger.debug(f"Request acquired. Active: {self.active_count}/{self.max_concurrent}")
-        return acquired
+                return True
+            if self.queued >= self.max_queue or self.max_wait_seconds <= 0:
+                self.rejected_queue_full += 1
+                return False
+            key = (user or "").strip().lower()
+            start_tag = max(self._virtual_time, self._user_finish.get(key, 0.0))
+            self._user_finish[key] = start_tag + 1.0 / self._weight(user)
+            waiter = _ThrottleWaiter(key)
+            heapq.heappush(self._waiters, (start_tag, next(self._seq), waiter))
+            self.queued += 1
+            self.max_queue_seen = max(self.max_queue_seen, self.queued)
+
+        started = time.monotonic()
+        waiter.event.wait(self.max_wait_seconds)
+        waited = time.monotonic() - started
+
+        with self.lock:
+            if not waiter.granted:
+                # Timed out; a grant racing with the timeout is still honoured above
+                waiter.cancelled = True
+                self.queued -= 1
+                self.timed_out += 1
+                return False
+            self.admitted += 1
+            self.admitted_after_wait += 1
+            self.total_wait_seconds += waited
+            self.max_wait_seen = max(self.max_wait_seen, waited)
+        stage_metrics.record("queue_wait", waited)
+        logger.debug(f"Request acquired after {waited:.3f}s in queue")
+        return True
 
     def release(self):
-        """Release a processing slot"""
-        self.semaphore.release()
+        """Release a processing slot, handing it straight to the next fair-queued waiter"""
         with self.lock:
+            while self._waiters:
+                start_tag, _, waiter = heapq.heappop(self._waiters)
+                if waiter.cancelled:
+                    continue
+                self._virtual_time = max(self._virtual_time, start_tag)
+                self.queued -= 1
+                waiter.granted = True
+                waiter.event.set()
+                logger.debug(f"Slot handed to a queued request. Queued: {self.queued}")
+                return
             self.active_count -= 1
+            if not self.queued:
+                # Idle: forget per-user tags so the map does not grow without bound
+                self._user_finish.clear()
             logger.debug(f"Request released. Active: {self.active_count}/{self.max_concurrent}")
     
     def get_active_count(self):
@@ -3804,6 +4176,159 @@ class RequestThrottler:
         with self.lock:
             return self.active_count
 
+    def get_queue_depth(self):
+        """Number of requests currently waiting for a slot"""
+        with self.lock:
+            return self.queued
+
+    def get_stats(self):
+        """Admission-queue counters for /health and /metrics"""
+        with self.lock:
+            return {
+                "active": self.active_count,
+                "max_concurrent": self.max_concurrent,
+                "queued": self.queued,
+                "queued_users": len({w.user for _, _, w in self._waiters if not w.cancelled}),
+                "max_queue": self.max_queue,
+                "max_wait_seconds": self.max_wait_seconds,
+                "admitted": self.admitted,
+                "admitted_after_wait": self.admitted_after_wait,
+                "rejected_queue_full": self.rejected_queue_full,
+                "timed_out": self.timed_out,
+                "avg_wait_ms": round(self.total_wait_seconds / self.admitted_after_wait * 1000.0, 2)
+                if self.admitted_after_wait else 0.0,
+                "max_wait_ms": round(self.max_wait_seen * 1000.0, 2),
+                "max_queue_seen": self.max_queue_seen,
+            }
+
+class CollageEnginePool:
+    """
+    Fixed-size pool of CollageEngine instances with checkout/return semantics.
+
+    Each engine owns its own OpenVINO compiled model and is used by one request
+    at a time, so label detection runs on up to `size` requests concurrently
+    instead of queueing behind a single global lock.
+    """
+    def __init__(self, engines):
+        if not engines:
+            raise ValueError("CollageEnginePool needs at least one engine")
+        self.size = len(engines)
+        self._idle = queue.LifoQueue()
+        for engine in engines:
+            self._idle.put(engine)
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.checkouts = 0
+        self.waited_checkouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    @contextmanager
+    def checkout(self):
+        """Borrow an engine for the duration of the with-block, waiting if all are busy"""
+        t0 = time.monotonic()
+        engine = self._idle.get()
+        waited = time.monotonic() - t0
+        with self.lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.total_wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            if waited > 0.001:
+                self.waited_checkouts += 1
+        try:
+            yield engine
+        finally:
+            with self.lock:
+                self.in_use -= 1
+            self._idle.put(engine)
+
+    def get_stats(self):
+        """Snapshot of pool utilisation and checkout wait times"""
+        with self.lock:
+            return {
+                'size': self.size,
+                'in_use': self.in_use,
+                'checkouts': self.checkouts,
+                'waited_checkouts': self.waited_checkouts,
+                'avg_wait_ms': round(1000.0 * self.total_wait_seconds / self.checkouts, 2) if self.checkouts else 0.0,
+                'max_wait_ms': round(1000.0 * self.max_wait_seconds, 2),
+            }
+
+
+class LLMHandlerPool:
+    """
+    Process-wide pool of (VoucherVision, GoogleGeminiHandler) pairs keyed by
+    everything that changes a handler's identity (billing identity, prompt,
+    resolved prompt path, model).
+
+    A checkout takes an idle pair for its key or builds one with `factory`
+    outside the lock; the pair is returned to the pool afterwards, so any
+    request thread can reuse a handler built by another and only the first use
+    of a key pays for construction. Concurrent checkouts of the same key get
+    distinct pairs. At most `max_idle` idle pairs are kept; past that the least
+    recently used ones are dropped.
+    """
+    def __init__(self, factory, max_idle=32):
+        self.factory = factory
+        self.max_idle = max(0, max_idle)
+        self._idle = OrderedDict()  # key -> idle pairs; least recently returned key first
+        self._idle_count = 0
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @contextmanager
+    def checkout(self, key):
+        """Borrow a handler pair for key for the duration of the with-block"""
+        with self.lock:
+            stack = self._idle.get(key)
+            handlers = stack.pop() if stack else None
+            if handlers is not None:
+                self._idle_count -= 1
+                if not stack:
+                    del self._idle[key]
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.in_use += 1
+        try:
+            if handlers is None:
+                handlers = self.factory(key)
+            yield handlers
+        finally:
+            with self.lock:
+                self.in_use -= 1
+                if handlers is not None and self.max_idle:
+                    self._idle.setdefault(key, []).append(handlers)
+                    self._idle.move_to_end(key)
+                    self._idle_count += 1
+                    while self._idle_count > self.max_idle:
+                        oldest_key, oldest = next(iter(self._idle.items()))
+                        oldest.pop(0)
+                        if not oldest:
+                            del self._idle[oldest_key]
+                        self._idle_count -= 1
+                        self.evictions += 1
+
+    def get_stats(self):
+        """Idle/in-use counts and hit rate"""
+        with self.lock:
+            checkouts = self.hits + self.misses
+            return {
+                'max_idle': self.max_idle,
+                'idle': self._idle_count,
+                'keys': len(self._idle),
+                'in_use': self.in_use,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / checkouts, 4) if checkouts else 0.0,
+            }
+
+
 class VoucherVisionProcessor:
     """
     Class to handle VoucherVision processing with initialization done once.
@@ -3825,7 +4350,10 @@ class VoucherVisionProcessor:
         
         # Initialize request throttler
         self.throttler = RequestThrottler(max_concurrent)
-        self.collage_engine_lock = threading.Lock()
+        # Engines that did / did not accept in-memory image streams (see _call_image_engine)
+        self._in_memory_engines = set()
+        self._path_only_engines = set(IMAGE_PIPELINE_PATH_ONLY_ENGINES)
+        self._engine_mode_lock = threading.Lock()
         
         # Get API key for Gemini
         try:
@@ -3838,25 +4366,74 @@ class VoucherVisionProcessor:
         # OCR engines are lazily initialized on first use (see ocr_engines_lock below)
         self.ocr_engines = {}
         self.ocr_engines_lock = threading.Lock()
+        # Shared, bounded pool used to fan out multi-engine OCR requests
+        self.ocr_executor = ThreadPoolExecutor(
+            max_workers=OCR_ENGINE_MAX_WORKERS, thread_name_prefix="ocr-engine"
+        )
+        # Adaptive per-model / per-billing-identity limits around Gemini calls
+        self.model_limiter = ModelLimiterRegistry(
+            max_wait_seconds=MODEL_LIMIT_MAX_WAIT_SECONDS,
+            max_entries=MODEL_LIMIT_MAX_ENTRIES,
+            initial_limit=MODEL_LIMIT_INITIAL,
+            min_limit=MODEL_LIMIT_MIN,
+            max_limit=MODEL_LIMIT_MAX,
+            latency_tolerance=MODEL_LIMIT_LATENCY_TOLERANCE,
+        )
 
-        # Initialize CollageEngine
-        self.collage_engine = None
+        # Optional content-addressed result cache (RESULT_CACHE_BACKEND)
+        self.result_cache = None
         try:
-            model_path = os.path.join(project_root, "TextCollage", "models", "openvino", "best.xml")
-            if not os.path.exists(model_path):
-                raise FileNotFoundError(f"CollageEngine model not found at {model_path}")
+            self.result_cache = build_result_cache(
+                RESULT_CACHE_BACKEND,
+                ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+                max_bytes=RESULT_CACHE_MAX_BYTES,
+                directory=RESULT_CACHE_DIR,
+                gcs_bucket=RESULT_CACHE_GCS_BUCKET,
+                gcs_prefix=RESULT_CACHE_GCS_PREFIX,
+                gcs_client_factory=_get_storage_client,
+            )
+            if self.result_cache:
+                self._log(f"Result cache enabled ({RESULT_CACHE_BACKEND})", "info")
+        except Exception as e:
+            self._log(f"Failed to initialize result cache: {e}", "error")
 
-            self.collage_engine = CollageEngine(
-                model_xml_path=model_path,
-                collage_classes=['barcode', 'label', 'map'], # Classes to RENDER in the collage
-                engine="gemini", # No resizing, use original resolution
-                output_path=None, # Force return in-memory
-                hide_long_objects=False, # Sensible default for clean OCR input
-                draw_overlay=False
+        # Optional OCR-stage cache (OCR_CACHE_BACKEND); also backs ocr_id re-parsing
+        self.ocr_cache = None
+        try:
+            self.ocr_cache = build_result_cache(
+                OCR_CACHE_BACKEND,
+                ttl_seconds=OCR_CACHE_TTL_SECONDS,
+                max_bytes=OCR_CACHE_MAX_BYTES,
+                directory=OCR_CACHE_DIR,
+                gcs_bucket=RESULT_CACHE_GCS_BUCKET,
+                gcs_prefix=OCR_CACHE_GCS_PREFIX,
+                gcs_client_factory=_get_storage_client,
             )
-            self._log("CollageEngine initialized", "info")
+            if self.ocr_cache:
+                self._log(f"OCR cache enabled ({OCR_CACHE_BACKEND})", "info")
         except Exception as e:
-            self._log(f"Failed to initialize CollageEngine: {e}", "error")
+            self._log(f"Failed to initialize OCR cache: {e}", "error")
+
+        # Optional LLM parse memo (LLM_CACHE_BACKEND)
+        self.llm_cache = None
+        try:
+            self.llm_cache = build_result_cache(
+                LLM_CACHE_BACKEND,
+                ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                max_bytes=LLM_CACHE_MAX_BYTES,
+                directory=LLM_CACHE_DIR,
+                gcs_bucket=RESULT_CACHE_GCS_BUCKET,
+                gcs_prefix=LLM_CACHE_GCS_PREFIX,
+                gcs_client_factory=_get_storage_client,
+            )
+            if self.llm_cache:
+                self._log(f"LLM parse memo enabled ({LLM_CACHE_BACKEND})", "info")
+        except Exception as e:
+            self._log(f"Failed to initialize LLM parse memo: {e}", "error")
+
+        # Initialize the CollageEngine pool. A preloaded master leaves it to the workers:
+        # OpenVINO's compiled models own runtime threads that do not survive fork().
+        self.collage_engine_pool = None if SERVE_PRELOADED else self._build_collage_engine_pool()
 
         # Load VoucherVision config
         self.config_file = os.path.join(os.path.dirname(__file__), 'VoucherVision.yaml')
@@ -3880,18 +4457,63 @@ class VoucherVisionProcessor:
             self.dir_home, 'custom_prompts', self.default_prompt
         )
 
-        # Initialize LLM models
+        # Fail at startup if the default prompt does not load. The Gemini handlers are built
+        # per worker, on demand, by the LLM handler pool (see _build_llm_handlers).
         self.Voucher_Vision.setup_JSON_dict_structure()
-        self.llm_models = {}
-        for model_name in ["gemini-1.5-pro", "gemini-2.0-flash", "gemini-2.5-flash", "gemini-2.5-pro", "gemini-3-pro-preview", "gemini-3.5-flash"]:
-            self.llm_models[model_name] = GoogleGeminiHandler(
-                self.cfg, self.logger, model_name, self.Voucher_Vision.JSON_dict_structure,
-                config_vals_for_permutation=None, exit_early_for_JSON=True
-            )
-        self._log(f"Initialized {len(self.ocr_engines)} OCR engines, {len(self.llm_models)} LLM models", "info")
+        self._log(f"Initialized {len(self.ocr_engines)} OCR engines", "info")
 
-        self.thread_local = threading.local()
+        self.llm_handler_pool = LLMHandlerPool(self._build_llm_handlers, max_idle=LLM_HANDLER_POOL_SIZE)
         self._log("VoucherVisionProcessor ready", "info")
+
+    def _build_collage_engine_pool(self):
+        """COLLAGE_ENGINE_POOL_SIZE CollageEngines, or None if the model cannot be loaded"""
+        try:
+            model_path = os.path.join(project_root, "TextCollage", "models", "openvino", "best.xml")
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(f"CollageEngine model not found at {model_path}")
+
+            collage_engines = []
+            for _ in range(max(1, COLLAGE_ENGINE_POOL_SIZE)):
+                try:
+                    collage_engines.append(CollageEngine(
+                        model_xml_path=model_path,
+                        collage_classes=['barcode', 'label', 'map'], # Classes to RENDER in the collage
+                        engine="gemini", # No resizing, use original resolution
+                        output_path=None, # Force return in-memory
+                        hide_long_objects=False, # Sensible default for clean OCR input
+                        draw_overlay=False
+                    ))
+                except Exception as e:
+                    if not collage_engines:
+                        raise
+                    self._log(f"Stopped CollageEngine pool at {len(collage_engines)} instances: {e}", "warning")
+                    break
+            pool = CollageEnginePool(collage_engines)
+            self._log(f"CollageEngine pool initialized with {pool.size} instances", "info")
+            return pool
+        except Exception as e:
+            self._log(f"Failed to initialize CollageEngine: {e}", "error")
+            return None
+
+    def reinitialize_after_fork(self):
+        """
+        Rebuild the per-process parts of the processor in a forked gunicorn worker.
+
+        Executor threads do not survive fork() and Gemini clients must not share
+        connections with the master, so they are recreated. The CollageEngine pool is
+        built here, in the worker, because a preloaded master never loads it (see
+        __init__). The VoucherVision config and caches are kept and stay shared with
+        the master copy-on-write.
+        """
+        self.ocr_executor = ThreadPoolExecutor(
+            max_workers=OCR_ENGINE_MAX_WORKERS, thread_name_prefix="ocr-engine"
+        )
+        if self.collage_engine_pool is None:
+            self.collage_engine_pool = self._build_collage_engine_pool()
+        self.ocr_engines = {}
+        self.ocr_engines_lock = threading.Lock()
+        self._engine_mode_lock = threading.Lock()
+        self.llm_handler_pool = LLMHandlerPool(self._build_llm_handlers, max_idle=LLM_HANDLER_POOL_SIZE)
     
     def _log(self, message, level="info"):
         """Log a message at the given level"""
@@ -3995,147 +4617,607 @@ class VoucherVisionProcessor:
         """Check if file has allowed extension"""
         return '.' in filename and filename.rsplit('.', 1)[1].lower() in self.ALLOWED_EXTENSIONS
     
-    def perform_ocr(self, file_path, engine_options, ocr_prompt_option, user_api_key=None,
-                    user_vertex_project=None, user_vertex_region=None):
-        """Perform OCR on the provided image"""
-        ocr_packet = {}
-        ocr_all = ""
-        ocr_tokens_total = 0
-
-        for i, ocr_opt in enumerate(engine_options):
-            ocr_packet[ocr_opt] = {}
-            self._log(f"ocr_opt {ocr_opt}", "info")
-
-            if user_vertex_project:
-                # Per-request throwaway engine billed to the user's GCP project
-                OCR_Engine = OCRGeminiProVision(
-                    None,
-                    model_name=ocr_opt,
-                    max_output_tokens=32768,
-                    temperature=1.0,
-                    top_p=0.95,
-                    seed=123456,
-                    do_resize_img=False,
-                    vertex_project=user_vertex_project,
-                    vertex_region=user_vertex_region,
-                )
-            elif user_api_key:
-                # Per-request throwaway engine - never touches the shared pool
-                OCR_Engine = OCRGeminiProVision(
-                    user_api_key,
-                    model_name=ocr_opt,
-                    max_output_tokens=32768,
-                    temperature=1.0,
-                    top_p=0.95,
-                    seed=123456,
-                    do_resize_img=False
-                )
+    def _call_image_engine(self, engine_key, fn, image_bytes, filename, **kwargs):
+        """
+        Call fn(image, **kwargs) with an in-memory stream of image_bytes.
+
+        The collage and OCR engines come from the submodules and historically
+        took a file path. When IMAGE_PIPELINE_IN_MEMORY is on they get a named
+        BytesIO instead. An engine that raises TypeError/AttributeError without
+        having read a byte of the stream rejected the argument itself, before
+        any model or API work: it is remembered in self._path_only_engines and
+        served from a short-lived temp file. Errors after the stream was read
+        are raised as they are, so an API call is never repeated. Engines listed
+        in IMAGE_PIPELINE_PATH_ONLY_ENGINES always get a temp file.
+        """
+        with self._engine_mode_lock:
+            use_stream = IMAGE_PIPELINE_IN_MEMORY and engine_key not in self._path_only_engines
+        if use_stream:
+            stream = _EngineImageStream(image_bytes, filename)
+            try:
+                result = fn(stream, **kwargs)
+            except (TypeError, AttributeError) as e:
+                with self._engine_mode_lock:
+                    if stream.was_read or engine_key in self._in_memory_engines:
+                        raise
+                    self._path_only_engines.add(engine_key)
+                self._log(f"{engine_key} does not accept in-memory images ({e}); using temp files", "warning")
             else:
-                # Use the shared, pre-warmed server engine
-                if ocr_opt not in self.ocr_engines:
-                    with self.ocr_engines_lock:
-                        if ocr_opt not in self.ocr_engines:
-                            self.ocr_engines[ocr_opt] = OCRGeminiProVision(
-                                self.api_key,
-                                model_name=ocr_opt,
-                                max_output_tokens=32768,
-                                temperature=1,
-                                top_p=0.95,
-                                seed=123456,
-                                do_resize_img=False
-                            )
-                OCR_Engine = self.ocr_engines[ocr_opt]
-            
-            # Execute OCR (this API call can run concurrently)
-            response, cost_in, cost_out, total_cost, rates_in, rates_out, tokens_in, tokens_out = OCR_Engine.ocr_gemini(file_path, prompt=ocr_prompt_option)
-            
-            ocr_packet[ocr_opt]["ocr_text"] = response
-            ocr_packet[ocr_opt]["cost_in"] = cost_in
-            ocr_packet[ocr_opt]["cost_out"] = cost_out
-            ocr_packet[ocr_opt]["total_cost"] = total_cost
-            ocr_packet[ocr_opt]["rates_in"] = rates_in
-            ocr_packet[ocr_opt]["rates_out"] = rates_out
-            ocr_packet[ocr_opt]["tokens_in"] = tokens_in
-            ocr_packet[ocr_opt]["tokens_out"] = tokens_out
+                with self._engine_mode_lock:
+                    self._in_memory_engines.add(engine_key)
+                return result
 
-            # ocr_all += f"{ocr_opt} OCR: {response} "
-            # ocr_all += f"OCR Version {i}: {response} "
-            ocr_all += f"{response} "
-            ocr_tokens_total += self._add_tokens(tokens_in, tokens_out, 0)
+        suffix = os.path.splitext(filename)[1] or ".jpg"
+        fd, temp_path = tempfile.mkstemp(prefix=f"vvgo_{engine_key}_", suffix=suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(image_bytes)
+            return fn(temp_path, **kwargs)
+        finally:
+            try:
+                os.remove(temp_path)
+            except OSError as cleanup_error:
+                self._log(f"Error during cleanup: {cleanup_error}", "warning")
+
+    def _llm_cost_name(self, llm_model_name):
+        """Map an API model name to its api_cost.yaml constant"""
+        return LLM_COST_NAMES.get(llm_model_name, "GEMINI_2_0_FLASH")
+
+    def _parse_ocr_text(self, ocr, ocr_info, ocr_tokens_total, *, current_prompt, llm_model_name,
+                        LLM_name_cost, include_wfo, original_filename, url_source,
+                        collage_json_data, success, user_api_key=None, user_vertex_project=None,
+                        user_vertex_region=None, caller_email=None, on_stage=None):
+        """Run the LLM parsing stage (plus WFO) on OCR text and build the response body"""
+        # Process with VoucherVision
+        vv_results, tokens_in, tokens_out, cost_in, cost_out, llm_memo = self.process_voucher_vision(ocr,
+                                                                                           current_prompt,
+                                                                                           llm_model_name,
+                                                                                           LLM_name_cost,
+                                                                                           user_api_key=user_api_key,
+                                                                                           user_vertex_project=user_vertex_project,
+                                                                                           user_vertex_region=user_vertex_region,
+                                                                                           caller_email=caller_email)
+        vv_results_sanitized = self._sanitize_formatted_json(vv_results)
+        parsing_info = OrderedDict([
+            ("model", llm_model_name),
+            ("input", tokens_in),
+            ("output", tokens_out),
+            ("cost_in", cost_in),
+            ("cost_out", cost_out),
+        ])
+        if llm_memo:
+            parsing_info["memo"] = llm_memo
+        self._emit_stage(on_stage, "formatted_json", OrderedDict([
+            ("formatted_json", vv_results_sanitized),
+            ("parsing_info", parsing_info),
+        ]))
+
+        # WFO taxonomy lookup (local SQLite database)
+        WFO = ""
+        if include_wfo and _wfo_lookup and isinstance(vv_results, dict):
+            try:
+                with stage_metrics.span("wfo"):
+                    WFO = _wfo_lookup.check_wfo(vv_results, replace_if_success_wfo=False)
+                self._log(f"WFO Record: {WFO}", "info")
+            except Exception as e:
+                self._log(f"WFO lookup failed: {e}", "error")
+                WFO = _wfo_lookup.NULL_DICT
+            self._emit_stage(on_stage, "WFO_info", OrderedDict([("WFO_info", WFO)]))
 
-        return ocr_packet, ocr_all, ocr_tokens_total
-    
-    def get_thread_local_vv(self, prompt, llm_model_name, user_api_key=None,
-                            user_vertex_project=None, user_vertex_region=None,
-                            caller_email=None):
-        """Get or create a thread-local VoucherVision instance with the specified prompt"""
-        # Resolve the prompt path: built-ins on disk take priority; otherwise
-        # the filename is looked up in Firestore and the GCS-stored YAML is
-        # materialized into a local cache.
-        resolved_prompt_path = _resolve_prompt_path(prompt, self.custom_prompts_dir, caller_email)
+        ocr_info_sanitized = sanitize_excel_record(ocr_info)
+        ocr_sanitized = sanitize_for_storage(ocr)
 
-        # Cache key includes every input that changes the LLM handler's identity,
-        # plus the resolved path so a re-uploaded user prompt (same ref, different
-        # content via updated_at) invalidates the cache.
-        incoming_key = (
-            user_api_key,
-            user_vertex_project,
-            user_vertex_region,
-            prompt,
-            resolved_prompt_path,
-            llm_model_name,
-        )
-        needs_new = (
-            not hasattr(self.thread_local, 'vv')
-            or getattr(self.thread_local, 'cache_key', None) != incoming_key
-        )
+        llm_tokens_total = self._add_tokens(tokens_in, tokens_out, ocr_tokens_total)    
+        self._log(f"Tokens: OCR={ocr_tokens_total}, LLM_in={tokens_in}, LLM_out={tokens_out}, total={llm_tokens_total}", "info")
 
-        if needs_new:
-            self.thread_local.vv = VoucherVision(
-                self.cfg, self.logger, self.dir_home, None, None, None,
-                is_hf=False, skip_API_keys=True
-            )
-            self.thread_local.vv.initialize_token_counters()
-            self.thread_local.vv.path_custom_prompts = resolved_prompt_path
-            self.thread_local.vv.setup_JSON_dict_structure()
-
-            self.thread_local.llm_model = GoogleGeminiHandler(
-                self.cfg, self.logger, llm_model_name,
-                self.thread_local.vv.JSON_dict_structure,
-                config_vals_for_permutation=None,
-                exit_early_for_JSON=True,
-                api_key=user_api_key,  # None = use env, key = use theirs
-                vertex_project=user_vertex_project,
+        est_impact = estimate_impact(llm_tokens_total)
+
+        return OrderedDict([
+            ("filename", original_filename),
+            ("url_source", url_source),
+            ("prompt", current_prompt),
+            ("ocr_info", ocr_info_sanitized),
+            ("WFO_info", WFO),
+            ("COP90_elevation_m", ""),
+            ("ocr", ocr_sanitized),
+            ("formatted_json", vv_results_sanitized),
+            ("formatted_md", ""),
+            ("parsing_info", parsing_info),
+            ("impact", est_impact),
+            ("collage_info", collage_json_data),
+            ("collage_image_format", 'jpeg' if collage_json_data else ''),
+            ("success", success),
+        ])
+
+    def _finalize_results(self, results, include_cop90, on_stage=None):
+        """Add the COP90 elevation (if requested) and the total request cost"""
+        if include_cop90:
+            try:
+                fj = results.get("formatted_json")
+                if isinstance(fj, dict):
+                    lat_val = fj.get("decimalLatitude") or fj.get("decimal_latitude")
+                    lon_val = fj.get("decimalLongitude") or fj.get("decimal_longitude")
+                    with stage_metrics.span("cop90"):
+                        elev = _elevation_lookup.query(float(lat_val), float(lon_val))
+                    results["COP90_elevation_m"] = elev if elev is not None else ""
+            except Exception:
+                pass
+            self._emit_stage(on_stage, "COP90_elevation_m", OrderedDict([
+                ("COP90_elevation_m", results.get("COP90_elevation_m", "")),
+            ]))
+
+        # Aggregate the per-request estimated cost so the route handler
+        # can persist it on the user's usage doc. OCR costs come from
+        # each engine in ocr_info; LLM cost comes from parsing_info.
+        # Token-derived estimate, not authoritative billing.
+        try:
+            ocr_cost_sum = 0.0
+            for v in (results.get("ocr_info") or {}).values():
+                if isinstance(v, dict):
+                    ocr_cost_sum += float(v.get("total_cost", 0.0) or 0.0)
+            parsing = results.get("parsing_info") or {}
+            parsing_cost = float(parsing.get("cost_in", 0.0) or 0.0) + float(parsing.get("cost_out", 0.0) or 0.0)
+            results["total_request_cost_usd"] = ocr_cost_sum + parsing_cost
+        except Exception as cost_err:
+            self._log(f"Could not compute total_request_cost_usd: {cost_err}", "warning")
+            results["total_request_cost_usd"] = 0.0
+        self._emit_stage(on_stage, "cost", OrderedDict([
+            ("total_request_cost_usd", results["total_request_cost_usd"]),
+            ("impact", results.get("impact", {})),
+        ]))
+
+    def _emit_stage(self, on_stage, stage, payload):
+        """Forward a finished stage to an on_stage callback; callback errors never fail the request"""
+        if on_stage is None:
+            return
+        try:
+            on_stage(stage, payload)
+        except Exception as e:
+            self._log(f"Stage callback failed for {stage}: {e}", "warning")
+
+    def _result_cache_key(self, image_bytes, *, engine_options, ocr_prompt_option, prompt,
+                          ocr_only, include_wfo, include_cop90, llm_model_name,
+                          notebook_mode, skip_label_collage, caller_email=None):
+        """Build the result-cache key, or None if the prompt version cannot be resolved"""
+        params = {
+            "version": RESULT_CACHE_VERSION,
+            "engines": list(engine_options),
+            "ocr_prompt_option": ocr_prompt_option,
+            "ocr_only": bool(ocr_only),
+            "notebook_mode": bool(notebook_mode),
+            "skip_label_collage": bool(skip_label_collage),
+            "include_wfo": bool(include_wfo),
+            "include_cop90": bool(include_cop90),
+        }
+        if not ocr_only:
+            try:
+                prompt_path = _resolve_prompt_path(prompt, self.custom_prompts_dir, caller_email)
+                params["prompt"] = prompt
+                params["prompt_sha256"] = PROMPT_REGISTRY.get_file(prompt_path, name=prompt).digest
+            except Exception as e:
+                self._log(f"Result cache disabled for this request (prompt version unavailable): {e}", "warning")
+                return None
+            params["llm_model"] = llm_model_name
+        return build_cache_key(image_bytes, params)
+
+    def _store_cached_result(self, cache_key, results):
+        """Store a successful result without the echoed input image (rebuilt on a hit)"""
+        success = results.get("success") or {}
+        if str(success.get("ocr", "")).lower() != "true":
+            return
+        entry = OrderedDict(results)
+        collage_info = entry.get("collage_info")
+        if isinstance(collage_info, dict):
+            collage_info = OrderedDict(collage_info)
+            collage_info.pop("base64image_input_resized", None)
+            entry["collage_info"] = collage_info
+        self.result_cache.put(cache_key, entry)
+
+    def _cached_result_response(self, cached, cache_key, image_bytes, original_filename, url_source,
+                                include_input_image=True):
+        """Turn a cache entry into this request's response; no model was called, so nothing is billed"""
+        cached["filename"] = original_filename
+        cached["url_source"] = url_source
+        if include_input_image and isinstance(cached.get("collage_info"), dict):
+            cached["collage_info"]["base64image_input_resized"] = base64.b64encode(image_bytes).decode('utf-8')
+        avoided_cost = cached.get("total_request_cost_usd", 0.0)
+        cached["impact"] = estimate_impact(0)
+        cached["total_request_cost_usd"] = 0.0
+        cached["cache"] = {"hit": True, "key": cache_key, "avoided_cost_usd": avoided_cost}
+        return cached
+
+    def _run_collage(self, image_bytes, image_name, fake=False):
+        """Run label detection (or the pass-through run_fake) on a pooled CollageEngine"""
+        with self.collage_engine_pool.checkout() as collage_engine:
+            if fake:
+                return self._call_image_engine("collage_run_fake", collage_engine.run_fake, image_bytes, image_name)
+            return self._call_image_engine("collage_run", collage_engine.run, image_bytes, image_name)
+
+    def _get_ocr_engine(self, ocr_opt, user_api_key=None,
+                        user_vertex_project=None, user_vertex_region=None):
+        """Return the OCR engine to use for one model and billing identity"""
+        if user_vertex_project:
+            # Per-request throwaway engine billed to the user's GCP project
+            return OCRGeminiProVision(
+                None,
+                model_name=ocr_opt,
+                max_output_tokens=32768,
+                temperature=1.0,
+                top_p=0.95,
+                seed=123456,
+                do_resize_img=False,
+                vertex_project=user_vertex_project,
                 vertex_region=user_vertex_region,
             )
-            self.thread_local.cache_key = incoming_key
-            self._log(f"Created new thread-local VV instance with prompt: {prompt}", "info")
+        if user_api_key:
+            # Per-request throwaway engine - never touches the shared pool
+            return OCRGeminiProVision(
+                user_api_key,
+                model_name=ocr_opt,
+                max_output_tokens=32768,
+                temperature=1.0,
+                top_p=0.95,
+                seed=123456,
+                do_resize_img=False
+            )
+        # Use the shared, pre-warmed server engine
+        if ocr_opt not in self.ocr_engines:
+            with self.ocr_engines_lock:
+                if ocr_opt not in self.ocr_engines:
+                    self.ocr_engines[ocr_opt] = OCRGeminiProVision(
+                        self.api_key,
+                        model_name=ocr_opt,
+                        max_output_tokens=32768,
+                        temperature=1,
+                        top_p=0.95,
+                        seed=123456,
+                        do_resize_img=False
+                    )
+        return self.ocr_engines[ocr_opt]
+
+    def _run_ocr_engine(self, image, ocr_opt, ocr_prompt_option, user_api_key=None,
+                        user_vertex_project=None, user_vertex_region=None):
+        """Run a single OCR engine on image bytes (or a path) and return its ocr_packet entry"""
+        self._log(f"ocr_opt {ocr_opt}", "info")
+        ocr_cache_key = None
+        if self.ocr_cache and isinstance(image, (bytes, bytearray)):
+            ocr_cache_key = build_cache_key(image, {
+                "stage": "ocr",
+                "version": RESULT_CACHE_VERSION,
+                "model": ocr_opt,
+                "ocr_prompt_option": ocr_prompt_option,
+            })
+            cached_packet = self.ocr_cache.get(ocr_cache_key)
+            if cached_packet is not None:
+                self._log(f"OCR cache hit for {ocr_opt}", "info")
+                return self._reused_ocr_packet(cached_packet)
+
+        OCR_Engine = self._get_ocr_engine(
+            ocr_opt,
+            user_api_key=user_api_key,
+            user_vertex_project=user_vertex_project,
+            user_vertex_region=user_vertex_region,
+        )
+        identity = billing_identity(user_api_key, user_vertex_project)
+        with self.model_limiter.slot(ocr_opt, identity), stage_metrics.span("ocr", model=ocr_opt):
+            if isinstance(image, (bytes, bytearray)):
+                ocr_output = self._call_image_engine(
+                    "ocr_gemini", OCR_Engine.ocr_gemini, image, "collage.jpg", prompt=ocr_prompt_option
+                )
+            else:
+                ocr_output = OCR_Engine.ocr_gemini(image, prompt=ocr_prompt_option)
+        response, cost_in, cost_out, total_cost, rates_in, rates_out, tokens_in, tokens_out = ocr_output
+        packet = {
+            "ocr_text": response,
+            "cost_in": cost_in,
+            "cost_out": cost_out,
+            "total_cost": total_cost,
+            "rates_in": rates_in,
+            "rates_out": rates_out,
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+        }
+        if ocr_cache_key:
+            self.ocr_cache.put(ocr_cache_key, packet)
+        return packet
+
+    @staticmethod
+    def _reused_ocr_packet(packet):
+        """An ocr_packet entry served from cache: same text, nothing billed"""
+        reused = dict(packet)
+        for field in ("cost_in", "cost_out", "total_cost", "tokens_in", "tokens_out"):
+            reused[field] = 0
+        reused["cache_hit"] = True
+        return reused
+
+    def _remember_ocr_text(self, collage_image_bytes, engine_options, ocr_prompt_option, ocr, ocr_info):
+        """Store the merged OCR text under an ocr_id that /parse-ocr can re-parse later"""
+        if not self.ocr_cache:
+            return None
+        ocr_id = build_cache_key(collage_image_bytes, {
+            "stage": "ocr_text",
+            "version": RESULT_CACHE_VERSION,
+            "engines": list(engine_options),
+            "ocr_prompt_option": ocr_prompt_option,
+        })
+        self.ocr_cache.put(ocr_id, OrderedDict([
+            ("ocr", ocr),
+            ("ocr_info", ocr_info),
+            ("engines", list(engine_options)),
+            ("ocr_prompt_option", ocr_prompt_option),
+        ]))
+        return ocr_id
+
+    def load_ocr_text(self, ocr_id):
+        """Return the stored OCR entry for an ocr_id, or None if unknown/expired"""
+        if not self.ocr_cache or not ocr_id or not re.fullmatch(r"[0-9a-f]{64}", ocr_id):
+            return None
+        return self.ocr_cache.get(ocr_id)
 
-        return self.thread_local.vv, self.thread_local.llm_model
+    def perform_ocr(self, image, engine_options, ocr_prompt_option, user_api_key=None,
+                    user_vertex_project=None, user_vertex_region=None):
+        """
+        Perform OCR on the provided image (encoded bytes or a file path).
+
+        A single engine runs inline on the request thread. Multiple engines are
+        fanned out on the shared OCR executor and merged back in the order they
+        were requested, so a two-engine request costs about as much wall time as
+        the slowest engine. An engine that fails or exceeds
+        OCR_ENGINE_TIMEOUT_SECONDS is reported under ocr_packet[engine]["error"]
+        and left out of ocr_all; the request only fails if every engine fails.
+        """
+        ocr_packet = {}
+        ocr_all = ""
+        ocr_tokens_total = 0
+
+        engine_kwargs = dict(
+            user_api_key=user_api_key,
+            user_vertex_project=user_vertex_project,
+            user_vertex_region=user_vertex_region,
+        )
+
+        if len(engine_options) <= 1:
+            outcomes = [
+                (ocr_opt, self._run_ocr_engine(image, ocr_opt, ocr_prompt_option, **engine_kwargs), None)
+                for ocr_opt in engine_options
+            ]
+        else:
+            futures = [
+                (ocr_opt, stage_metrics.submit_in_context(
+                    self.ocr_executor, self._run_ocr_engine, image, ocr_opt, ocr_prompt_option, **engine_kwargs
+                ))
+                for ocr_opt in engine_options
+            ]
+            deadline = time.monotonic() + OCR_ENGINE_TIMEOUT_SECONDS
+            outcomes = []
+            for ocr_opt, future in futures:
+                try:
+                    outcomes.append((ocr_opt, future.result(timeout=max(0.0, deadline - time.monotonic())), None))
+                except FuturesTimeoutError:
+                    future.cancel()
+                    outcomes.append((ocr_opt, None, TimeoutError(
+                        f"OCR engine {ocr_opt} timed out after {OCR_ENGINE_TIMEOUT_SECONDS:g}s"
+                    )))
+                except Exception as e:
+                    outcomes.append((ocr_opt, None, e))
+
+        failures = [err for _, _, err in outcomes if err is not None]
+        if failures and len(failures) == len(outcomes):
+            # Nothing to merge; surface the first error so the caller can map it
+            # (Vertex permission / model-not-found) exactly as before.
+            raise failures[0]
+
+        for ocr_opt, packet, err in outcomes:
+            if err is not None:
+                self._log(f"OCR engine {ocr_opt} failed: {err}", "error")
+                ocr_packet[ocr_opt] = {
+                    "ocr_text": "",
+                    "cost_in": 0,
+                    "cost_out": 0,
+                    "total_cost": 0,
+                    "rates_in": 0,
+                    "rates_out": 0,
+                    "tokens_in": 0,
+                    "tokens_out": 0,
+                    "error": _sanitize_error_message(str(err)) or "OCR engine failed",
+                }
+                continue
+
+            ocr_packet[ocr_opt] = packet
+            # ocr_all += f"{ocr_opt} OCR: {response} "
+            # ocr_all += f"OCR Version {i}: {response} "
+            ocr_all += f"{packet['ocr_text']} "
+            ocr_tokens_total += self._add_tokens(packet["tokens_in"], packet["tokens_out"], 0)
+
+        return ocr_packet, ocr_all, ocr_tokens_total
     
+    @contextmanager
+    def checkout_vv(self, prompt, llm_model_name, user_api_key=None,
+                    user_vertex_project=None, user_vertex_region=None,
+                    caller_email=None):
+        """Borrow a pooled (VoucherVision, GoogleGeminiHandler) pair for the specified prompt"""
+        # Resolve the prompt path: built-ins on disk take priority; otherwise
+        # the filename is looked up in Firestore and the GCS-stored YAML is
+        # materialized into a local cache.
+        resolved_prompt_path = _resolve_prompt_path(prompt, self.custom_prompts_dir, caller_email)
+        compiled = (
+            PROMPT_REGISTRY.get_file(resolved_prompt_path, name=prompt)
+            if os.path.isfile(resolved_prompt_path) else None
+        )
+
+        # Pool key includes every input that changes the LLM handler's identity,
+        # plus the resolved path and compiled content digest so a re-uploaded or
+        # edited prompt (same ref, different content) gets fresh handlers.
+        incoming_key = (
+            user_api_key,
+            user_vertex_project,
+            user_vertex_region,
+            prompt,
+            resolved_prompt_path,
+            compiled.digest if compiled else None,
+            llm_model_name,
+        )
+        with self.llm_handler_pool.checkout(incoming_key) as handlers:
+            yield handlers
+
+    def _build_llm_handlers(self, key):
+        """LLMHandlerPool factory: a VoucherVision / GoogleGeminiHandler pair for a pool key"""
+        user_api_key, user_vertex_project, user_vertex_region, prompt, resolved_prompt_path, _, llm_model_name = key
+        vv = VoucherVision(
+            self.cfg, self.logger, self.dir_home, None, None, None,
+            is_hf=False, skip_API_keys=True
+        )
+        vv.initialize_token_counters()
+        vv.path_custom_prompts = resolved_prompt_path
+        vv.setup_JSON_dict_structure()
+
+        llm_model = GoogleGeminiHandler(
+            self.cfg, self.logger, llm_model_name,
+            vv.JSON_dict_structure,
+            config_vals_for_permutation=None,
+            exit_early_for_JSON=True,
+            api_key=user_api_key,  # None = use env, key = use theirs
+            vertex_project=user_vertex_project,
+            vertex_region=user_vertex_region,
+        )
+        self._log(f"Created new pooled VV instance with prompt: {prompt}", "info")
+        return vv, llm_model
+
     def process_voucher_vision(self, ocr_text, prompt, llm_model_name, LLM_name_cost, user_api_key=None,
                                user_vertex_project=None, user_vertex_region=None, caller_email=None):
-        """Process the OCR text with VoucherVision using a thread-local instance"""
-        # Get thread-local VoucherVision instance with the correct prompt
-        vv, llm_model = self.get_thread_local_vv(
+        """Process the OCR text with VoucherVision using a pooled handler pair"""
+        # Borrow a VoucherVision / Gemini handler pair built for this prompt and model
+        with self.checkout_vv(
             prompt, llm_model_name,
             user_api_key=user_api_key,
             user_vertex_project=user_vertex_project,
             user_vertex_region=user_vertex_region,
             caller_email=caller_email,
-        )
-
-        # Update OCR text for processing
-        prompt_text = vv.setup_prompt(ocr_text)
+        ) as (vv, llm_model):
+            # Update OCR text for processing
+            prompt_text = vv.setup_prompt(ocr_text)
+
+            memo_key = None
+            if self.llm_cache:
+                memo_key = build_cache_key(str(prompt_text).encode("utf-8"), {
+                    "stage": "llm",
+                    "version": RESULT_CACHE_VERSION,
+                    "model": llm_model_name,
+                    "generation_config": self._llm_generation_config(llm_model),
+                })
+                cached = self.llm_cache.get(memo_key)
+                if cached is not None:
+                    self._log(f"LLM parse memo hit for {llm_model_name}", "info")
+                    memo = OrderedDict([
+                        ("hit", True),
+                        ("input", cached.get("tokens_in", 0)),
+                        ("output", cached.get("tokens_out", 0)),
+                        ("avoided_cost_usd", cached.get("cost_in", 0.0) + cached.get("cost_out", 0.0)),
+                    ])
+                    return cached["response_candidate"], 0, 0, 0.0, 0.0, memo
 
-        # Call the LLM to process the OCR text
-        response_candidate, nt_in, nt_out, _, _, _ = llm_model.call_llm_api_GoogleGemini(
-            prompt_text, json_report=None, paths=None
-        )
+            # Call the LLM to process the OCR text
+            identity = billing_identity(user_api_key, user_vertex_project)
+            with self.model_limiter.slot(llm_model_name, identity), stage_metrics.span("llm", model=llm_model_name):
+                response_candidate, nt_in, nt_out, _, _, _ = llm_model.call_llm_api_GoogleGemini(
+                    prompt_text, json_report=None, paths=None
+                )
         self._log(f"response_candidate\n{response_candidate}", "info")
         cost_in, cost_out, parsing_cost, rate_in, rate_out = calculate_cost(LLM_name_cost, os.path.join(self.dir_home, 'api_cost', 'api_cost.yaml'), nt_in, nt_out)
 
-        return response_candidate, nt_in, nt_out, cost_in, cost_out
+        # Only well-formed parses are memoized; failures should be retried
+        if memo_key and isinstance(response_candidate, dict) and response_candidate:
+            self.llm_cache.put(memo_key, OrderedDict([
+                ("response_candidate", response_candidate),
+                ("tokens_in", nt_in),
+                ("tokens_out", nt_out),
+                ("cost_in", cost_in),
+                ("cost_out", cost_out),
+            ]))
+
+        return response_candidate, nt_in, nt_out, cost_in, cost_out, None
+
+    @staticmethod
+    def _llm_generation_config(llm_model):
+        """Plain-data generation settings of an LLM handler, for the parse memo key"""
+        config = {}
+        for attr in ("generation_config", "config", "temperature", "top_p", "top_k",
+                     "max_output_tokens", "thinking_budget", "thinking_level"):
+            value = getattr(llm_model, attr, None)
+            if isinstance(value, (str, int, float, bool, dict, list, tuple)):
+                config[attr] = value
+        return config
+
+    def process_ocr_text_request(self, ocr_text,
+                                 ocr_info=None,
+                                 prompt=None,
+                                 include_wfo=False,
+                                 include_cop90=False,
+                                 llm_model_name=None,
+                                 filename="",
+                                 user_api_key=None,
+                                 user_vertex_project=None,
+                                 user_vertex_region=None,
+                                 caller_email=None):
+        """
+        Re-parse previously returned OCR text with a (possibly different) prompt
+        and LLM. No image is uploaded and no OCR engine runs; ocr_info, when
+        supplied from a stored ocr_id, is echoed back with its costs zeroed.
+        """
+        if not self.throttler.acquire(user=caller_email):
+            return {'error': 'Server is at maximum capacity. Please try again later.'}, 429
+
+        try:
+            if not isinstance(ocr_text, str) or not ocr_text.strip():
+                return {'error': 'ocr_text is empty'}, 400
+
+            if llm_model_name is None:
+                llm_model_name = "gemini-2.5-flash"
+            current_prompt = prompt if prompt else self.default_prompt
+            LLM_name_cost = self._llm_cost_name(llm_model_name)
+            reused_ocr_info = OrderedDict(
+                (engine, self._reused_ocr_packet(packet)) if isinstance(packet, dict) else (engine, packet)
+                for engine, packet in (ocr_info or {}).items()
+            )
+
+            results = self._parse_ocr_text(
+                ocr_text, reused_ocr_info, 0,
+                current_prompt=current_prompt,
+                llm_model_name=llm_model_name,
+                LLM_name_cost=LLM_name_cost,
+                include_wfo=include_wfo,
+                original_filename=filename,
+                url_source="",
+                collage_json_data={},
+                success={
+                    "image_available": "True",
+                    "text_collage": "False",
+                    "text_collage_resize": "False",
+                    "ocr": "True",
+                    "llm": "True",
+                },
+                user_api_key=user_api_key,
+                user_vertex_project=user_vertex_project,
+                user_vertex_region=user_vertex_region,
+                caller_email=caller_email,
+            )
+            self._finalize_results(results, include_cop90)
+            return results, 200
+        except Exception as e:
+            self._log(f"Error re-parsing OCR text: {e}", "error")
+            if user_vertex_project and _is_vertex_permission_error(e):
+                return {'error': _vertex_permission_error_message(user_vertex_project)}, 403
+            if user_vertex_project and _is_vertex_model_not_found_error(e):
+                return {
+                    'error': _vertex_model_not_found_message(
+                        user_vertex_project, user_vertex_region, llm_model_name
+                    )
+                }, 404
+            if isinstance(e, ModelCapacityError) or is_rate_limit_error(e):
+                return {'error': f'Model capacity exceeded: {e}'}, 429
+            return {'error': str(e)}, 500
+        finally:
+            self.throttler.release()
 
     def process_pdf_request(self, file, **kwargs):
         """
@@ -4144,47 +5226,80 @@ class VoucherVisionProcessor:
 
         Returns (result_dict, status_code) where result_dict contains
         a 'pages' list with per-page results.
+
+        pdf_text_layer=True sends pages with a usable text layer straight to the
+        LLM (process_pdf_text_page) and runs vision OCR only on the others; each
+        page result then records the path in 'ocr_source' ('text_layer' or
+        'vision'). It does not apply to ocr_only / notebook_mode requests.
         """
+        text_layer = bool(kwargs.pop('pdf_text_layer', False)) and not (
+            kwargs.get('ocr_only') or kwargs.get('notebook_mode'))
         pdf_bytes = file.read()
         pdf_filename = file.filename
 
         try:
-            page_files = convert_pdf_to_page_images(pdf_bytes, pdf_filename, dpi=150)
+            page_count = image_prep.pdf_page_count(pdf_bytes)
         except Exception as e:
             self._log(f"PDF conversion failed for {pdf_filename}: {e}", "error")
             return {'error': f'Failed to convert PDF: {str(e)}'}, 400
 
-        if not page_files:
+        if not page_count:
             return {'error': 'PDF contains no pages'}, 400
-        if len(page_files) > MAX_PDF_PAGES:
-            return {'error': f'PDF has {len(page_files)} pages, maximum allowed is {MAX_PDF_PAGES}'}, 400
-
-        self._log(f"PDF '{pdf_filename}' has {len(page_files)} pages, processing each as a separate image", "info")
-
-        page_results = []
-        for page_file in page_files:
-            # Resize each page-image just like a normal upload
+        if page_count > MAX_PDF_PAGES:
+            return {'error': f'PDF has {page_count} pages, maximum allowed is {MAX_PDF_PAGES}'}, 400
+
+        self._log(f"PDF '{pdf_filename}' has {page_count} pages, processing up to {PDF_PAGE_WORKERS} at a time", "info")
+
+        # Pages are rendered only when a worker is about to need them and at most
+        # workers + prefetch are in flight; results are slotted back by page index.
+        page_results = [None] * page_count
+        pages = iter_pdf_page_images(pdf_bytes, pdf_filename, dpi=150, batch_pages=PDF_PAGE_PREFETCH,
+                                     text_layer=text_layer)
+        in_flight = {}
+
+        def collect(return_when):
+            done, _ = wait(in_flight, return_when=return_when)
+            for future in done:
+                page_index = in_flight.pop(future)
+                try:
+                    page_results[page_index] = future.result()
+                except Exception as e:
+                    self._log(f"PDF page {page_index + 1} of {pdf_filename} failed: {e}", "error")
+                    page_results[page_index] = {
+                        'filename': pdf_page_filename(pdf_filename, page_index),
+                        'error': str(e),
+                        'status_code': 500
+                    }
+
+        with ThreadPoolExecutor(max_workers=PDF_PAGE_WORKERS, thread_name_prefix="pdf-page") as executor:
             try:
-                page_file = process_uploaded_file_with_resize(page_file, max_pixels=5200000)
+                for page_index, (page_file, page_text) in enumerate(pages):
+                    if len(in_flight) >= PDF_PAGE_WORKERS + PDF_PAGE_PREFETCH:
+                        collect(FIRST_COMPLETED)
+                    if page_text is not None:
+                        future = stage_metrics.submit_in_context(
+                            executor, self._process_pdf_text_page,
+                            pdf_page_filename(pdf_filename, page_index), page_text, kwargs)
+                    else:
+                        future = stage_metrics.submit_in_context(
+                            executor, self._process_pdf_page, page_file, kwargs,
+                            'vision' if text_layer else None)
+                    in_flight[future] = page_index
+            except image_prep.ImagePrepBusyError as e:
+                # Raised before the first page, so nothing has run: the client can retry the PDF
+                self._log(f"No PDF helper free for {pdf_filename}: {e}", "warning")
+                return {'error': f'Server is busy preparing images. Please try again later. ({e})'}, 503
             except Exception as e:
-                self._log(f"Resize failed for {page_file.filename}: {e}", "error")
-                page_results.append({
-                    'filename': page_file.filename,
-                    'error': f'Image resize failed: {str(e)}',
-                    'status_code': 500
-                })
-                continue
-
-            result, status_code = self.process_image_request(file=page_file, **kwargs)
-            if status_code != 200:
-                page_results.append({
-                    'filename': page_file.filename,
-                    'error': result.get('error', 'Unknown error'),
-                    'status_code': status_code
-                })
-            else:
-                result['filename'] = page_file.filename
-                page_results.append(result)
+                self._log(f"PDF rendering failed part-way through {pdf_filename}: {e}", "error")
+                for page_index, page_result in enumerate(page_results):
+                    if page_result is None and page_index not in in_flight.values():
+                        page_results[page_index] = {
+                            'filename': pdf_page_filename(pdf_filename, page_index),
+                            'error': f'Failed to render PDF page: {str(e)}',
+                            'status_code': 500
+                        }
+            if in_flight:
+                collect(ALL_COMPLETED)
 
         # Sum estimated cost across all successful pages so the route handler
         # can persist a single total for the request (not just the last page).
@@ -4197,11 +5312,68 @@ class VoucherVisionProcessor:
 
         return OrderedDict([
             ('source_pdf', pdf_filename),
-            ('page_count', len(page_files)),
+            ('page_count', page_count),
             ('pages', page_results),
             ('total_request_cost_usd', pdf_cost_total_usd),
         ]), 200
 
+    def _process_pdf_page(self, page_file, kwargs, ocr_source=None):
+        """Run the image pipeline on one rendered PDF page (already within the pixel budget)"""
+        result, status_code = self.process_image_request(file=page_file, **kwargs)
+        return self._pdf_page_result(page_file.filename, result, status_code, ocr_source)
+
+    def _process_pdf_text_page(self, filename, text, kwargs):
+        result, status_code = self.process_pdf_text_page(filename, text, **kwargs)
+        return self._pdf_page_result(filename, result, status_code, 'text_layer')
+
+    @staticmethod
+    def _pdf_page_result(filename, result, status_code, ocr_source=None):
+        if status_code != 200:
+            result = {
+                'filename': filename,
+                'error': result.get('error', 'Unknown error'),
+                'status_code': status_code
+            }
+        else:
+            result['filename'] = filename
+        if ocr_source:
+            result['ocr_source'] = ocr_source
+        return result
+
+    def process_pdf_text_page(self, filename, text, prompt=None, include_wfo=False, include_cop90=False,
+                              llm_model_name=None, user_api_key=None, user_vertex_project=None,
+                              user_vertex_region=None, caller_email=None, **image_options):
+        """
+        Parse a born-digital PDF page from its text layer, which stands in for the
+        OCR text: no rendering, collage or vision OCR. Takes the same options as
+        process_image_request; the image-only ones (image_options) do not apply.
+        """
+        result, status_code = self.process_ocr_text_request(
+            text,
+            prompt=prompt,
+            include_wfo=include_wfo,
+            include_cop90=include_cop90,
+            llm_model_name=llm_model_name,
+            filename=filename,
+            user_api_key=user_api_key,
+            user_vertex_project=user_vertex_project,
+            user_vertex_region=user_vertex_region,
+            caller_email=caller_email,
+        )
+        if status_code == 200:
+            chars, garbage_ratio = image_prep.text_layer_quality(text)
+            result["ocr_info"] = OrderedDict([(PDF_TEXT_LAYER_ENGINE, OrderedDict([
+                ("ocr_text", sanitize_for_storage(text)),
+                ("cost_in", 0),
+                ("cost_out", 0),
+                ("total_cost", 0),
+                ("tokens_in", 0),
+                ("tokens_out", 0),
+                ("chars", chars),
+                ("garbage_ratio", round(garbage_ratio, 4)),
+            ]))])
+        return result, status_code
+
     def process_image_request(self, file,
                               engine_options=None,
                               ocr_prompt_option=None,
@@ -4216,18 +5388,26 @@ class VoucherVisionProcessor:
                               user_api_key=None,
                               user_vertex_project=None,
                               user_vertex_region=None,
-                              caller_email=None):
+                              caller_email=None,
+                              on_stage=None,
+                              include_input_image=True):
         """
         Process an image from a request file
         ocr_prompt_option=["verbatim_with_annotations", None]
         None will use the default LLM ocr, *anything* else will use the "verbatim"
+
+        on_stage, if given, is called as on_stage(stage, payload) as each stage
+        finishes (collage_info, ocr, formatted_json, WFO_info, COP90_elevation_m,
+        cost) so a streaming response can forward partial results. Each payload
+        holds the top-level response keys that stage produced.
+
+        include_input_image=False skips base64-encoding the uploaded image into
+        collage_info.base64image_input_resized (for responses that exclude it).
         """
         # Check if we can accept this request based on throttling
-        if not self.throttler.acquire():
+        if not self.throttler.acquire(user=caller_email):
             return {'error': 'Server is at maximum capacity. Please try again later.'}, 429
         
-        original_temp_path = None
-        collage_temp_path = None
         try:
             if notebook_mode:
                 ocr_only = True
@@ -4240,99 +5420,91 @@ class VoucherVisionProcessor:
                 return {'error': f'File type not allowed. Supported types: {", ".join(self.ALLOWED_EXTENSIONS)}'}, 400
             
             # --- STAGE 1: COLLAGE ENGINE PRE-PROCESSING ---
-            if not self.collage_engine:
+            if not self.collage_engine_pool:
                 return {'error': 'Collage Engine is not available on the server.'}, 503
             
-            # Save uploaded file to a temporary location
-            temp_dir = tempfile.mkdtemp()
-            original_temp_path = os.path.join(temp_dir, f"original_{secure_filename(file.filename)}")
-            file.save(original_temp_path)
+            # Hold the (possibly resized) upload in memory; it is handed to the
+            # collage engine as a stream and only base64-encoded for the response.
+            file.stream.seek(0)
+            image_bytes = file.read()
+            image_name = secure_filename(file.filename)
 
-            # Encode the (possibly resized) original image as base64 for the response
-            with open(original_temp_path, 'rb') as f_orig:
-                base64image_input_resized = base64.b64encode(f_orig.read()).decode('utf-8')
+            # Get engine options (default to gemini models if not specified)
+            if engine_options is None:
+                if ocr_only:
+                    engine_options = ["gemini-2.5-flash"]
+                else:
+                    engine_options = ["gemini-2.5-flash"]
 
-            if not self.collage_engine:
-                return {'error': 'Collage Engine is not available on the server.'}, 503
+            if ocr_prompt_option is None:
+                if notebook_mode:
+                    ocr_prompt_option = "verbatim_notebook"
+                elif ocr_only:
+                    ocr_prompt_option = "verbatim_with_annotations"
+                else:
+                    ocr_prompt_option = None
+
+            # Simpler alternative approach
+            if llm_model_name is None:
+                llm_model_name = "gemini-2.5-flash"
+
+            # Use default prompt if none specified
+            current_prompt = prompt if prompt else self.default_prompt
+
+            # Content-addressed result cache: an identical image with identical
+            # output-affecting parameters skips collage, OCR and LLM entirely.
+            cache_key = None
+            if self.result_cache:
+                cache_key = self._result_cache_key(
+                    image_bytes,
+                    engine_options=engine_options,
+                    ocr_prompt_option=ocr_prompt_option,
+                    prompt=current_prompt,
+                    ocr_only=ocr_only,
+                    include_wfo=include_wfo,
+                    include_cop90=include_cop90,
+                    llm_model_name=llm_model_name,
+                    notebook_mode=notebook_mode,
+                    skip_label_collage=skip_label_collage,
+                    caller_email=caller_email,
+                )
+                with stage_metrics.span("result_cache"):
+                    cached = self.result_cache.get(cache_key) if cache_key else None
+                if cached is not None:
+                    self._log(f"Result cache hit {cache_key[:12]} for {image_name}", "info")
+                    return self._cached_result_response(
+                        cached, cache_key, image_bytes, os.path.basename(file.filename), url_source,
+                        include_input_image=include_input_image,
+                    ), 200
 
             collage_resize_method = "gemini"
 
-            with self.collage_engine_lock:
+            with stage_metrics.span("collage"):
                 if notebook_mode:
                     self._log("[notebook_mode] NOT Running CollageEngine for pre-processing... Using original image...", "info")
-                    collage_json_data = self.collage_engine.run_fake(original_temp_path)
+                    collage_json_data = self._run_collage(image_bytes, image_name, fake=True)
                 elif skip_label_collage:
                     self._log("[skip_label_collage] NOT Running CollageEngine for pre-processing... Using original image...", "info")
-                    collage_json_data = self.collage_engine.run_fake(original_temp_path)
+                    collage_json_data = self._run_collage(image_bytes, image_name, fake=True)
                 else:
                     self._log("Running CollageEngine for pre-processing...", "info")
-                    collage_json_data = self.collage_engine.run(original_temp_path)
+                    collage_json_data = self._run_collage(image_bytes, image_name)
 
-            collage_json_data['base64image_input_resized'] = base64image_input_resized
-
-            if collage_json_data['base64image_text_collage'] is None:
-                raise RuntimeError("CollageEngine failed to produce an image.")
-            
-            # Save the resulting collage image to a *new* temporary file for the OCR step
-            # Decode the base64 string to bytes
-            collage_image_bytes = base64.b64decode(collage_json_data['base64image_text_collage'])
-            
-            # Save the resulting collage image to a *new* temporary file for the OCR step
-            collage_temp_path = os.path.join(temp_dir, f"collage_{secure_filename(file.filename)}")
-            with open(collage_temp_path, 'wb') as f:
-                f.write(collage_image_bytes)
-            self._log(f"Collage created at {collage_temp_path}, proceeding to OCR.", "info")
-            
-           
-            
-            try:
-                # Get engine options (default to gemini models if not specified)
-                if engine_options is None:
-                    if ocr_only:
-                        engine_options = ["gemini-2.5-flash"]
-                    else:
-                        engine_options = ["gemini-2.5-flash"]
+                if collage_json_data['base64image_text_collage'] is None:
+                    raise RuntimeError("CollageEngine failed to produce an image.")
 
-                if ocr_prompt_option is None:
-                    if notebook_mode:
-                        ocr_prompt_option = "verbatim_notebook"
-                    elif ocr_only:
-                        ocr_prompt_option = "verbatim_with_annotations"
-                    else:
-                        ocr_prompt_option = None
-
-                # Simpler alternative approach
-                if llm_model_name is None:
-                    llm_model_name = "gemini-2.5-flash"
-
-                # Direct mapping from API model names to cost constants
-                api_to_cost_mapping = {
-                    "gemini-2.0-flash": "GEMINI_2_0_FLASH",
-                    "gemini-1.5-flash": "GEMINI_1_5_FLASH",
-                    "gemini-1.5-pro": "GEMINI_1_5_PRO",
-                    "gemini-2.5-flash": "GEMINI_2_5_FLASH",
-                    "gemini-2.5-pro": "GEMINI_2_5_PRO",
-                    "gemini-3-pro-preview": "GEMINI_3_PRO",
-                    "gemini-3-flash-preview": "GEMINI_3_FLASH",
-                    "gemini-3-flash": "GEMINI_3_FLASH",
-
-                    "gemini-3.1-pro-preview": "GEMINI_3_1_PRO",
-                    "gemini-3.1-pro": "GEMINI_3_1_PRO",
-
-                    "gemini-3.1-flash-lite-preview": "GEMINI_3_1_FLASH_LITE",
-                    "gemini-3.1-flash-lite": "GEMINI_3_1_FLASH_LITE",
-
-                    "gemini-3.5-flash": "GEMINI_3_5_FLASH",
-                }
+                # Decode the collage once; the OCR engines read these bytes directly
+                collage_image_bytes = base64.b64decode(collage_json_data['base64image_text_collage'])
+            self._log(f"Collage created ({len(collage_image_bytes)} bytes), proceeding to OCR.", "info")
+            self._emit_stage(on_stage, "collage_info", OrderedDict([("collage_info", collage_json_data)]))
 
+            try:
                 self._log(f"Received llm_model_name: '{llm_model_name}' (type: {type(llm_model_name)})", "info")
-                LLM_name_cost = api_to_cost_mapping.get(llm_model_name, "GEMINI_2_0_FLASH")
+                LLM_name_cost = self._llm_cost_name(llm_model_name)
                 self._log(f"Mapped to cost constant: {LLM_name_cost}", "info")
 
-                # Use default prompt if none specified
-                current_prompt = prompt if prompt else self.default_prompt
                 self._log(f"Using prompt file: {current_prompt}", "info")
-                self._log(f"file_path: {collage_temp_path}", "info")
+                self._log(f"image: {image_name}", "info")
                 self._log(f"engine_options: {engine_options}", "info")
                 self._log(f"llm_model_name: {llm_model_name}", "info")
                 self._log(f"LLM_name_cost {LLM_name_cost}", "info")
@@ -4341,12 +5513,18 @@ class VoucherVisionProcessor:
                 original_filename = os.path.basename(file.filename)
                 
                 # Perform OCR
-                ocr_info, ocr, ocr_tokens_total = self.perform_ocr(collage_temp_path,
+                ocr_info, ocr, ocr_tokens_total = self.perform_ocr(collage_image_bytes,
                                                                    engine_options,
                                                                    ocr_prompt_option,
                                                                    user_api_key=user_api_key,
                                                                    user_vertex_project=user_vertex_project,
                                                                    user_vertex_region=user_vertex_region)
+                self._emit_stage(on_stage, "ocr", OrderedDict([("ocr_info", ocr_info), ("ocr", ocr)]))
+
+                # Encode the (possibly resized) original image as base64 for the response
+                if include_input_image:
+                    with stage_metrics.span("base64"):
+                        collage_json_data['base64image_input_resized'] = base64.b64encode(image_bytes).decode('utf-8')
 
                 # If ocr_only is True, skip VoucherVision processing
                 if notebook_mode:
@@ -4422,90 +5600,40 @@ class VoucherVisionProcessor:
                         }),
                     ])
                 else:
-                    # Process with VoucherVision
-                    vv_results, tokens_in, tokens_out, cost_in, cost_out = self.process_voucher_vision(ocr,
-                                                                                                       current_prompt,
-                                                                                                       llm_model_name,
-                                                                                                       LLM_name_cost,
-                                                                                                       user_api_key=user_api_key,
-                                                                                                       user_vertex_project=user_vertex_project,
-                                                                                                       user_vertex_region=user_vertex_region,
-                                                                                                       caller_email=caller_email)
-
-                    # WFO taxonomy lookup (local SQLite database)
-                    WFO = ""
-                    if include_wfo and _wfo_lookup and isinstance(vv_results, dict):
-                        try:
-                            WFO = _wfo_lookup.check_wfo(vv_results, replace_if_success_wfo=False)
-                            self._log(f"WFO Record: {WFO}", "info")
-                        except Exception as e:
-                            self._log(f"WFO lookup failed: {e}", "error")
-                            WFO = _wfo_lookup.NULL_DICT
-
-                    ocr_info_sanitized = sanitize_excel_record(ocr_info)
-                    ocr_sanitized = sanitize_for_storage(ocr)
-                    vv_results_sanitized = self._sanitize_formatted_json(vv_results)   
-
-                    llm_tokens_total = self._add_tokens(tokens_in, tokens_out, ocr_tokens_total)    
-                    self._log(f"Tokens: OCR={ocr_tokens_total}, LLM_in={tokens_in}, LLM_out={tokens_out}, total={llm_tokens_total}", "info")
-
-                    est_impact = estimate_impact(llm_tokens_total)
-
-                    results = OrderedDict([
-                        ("filename", original_filename),
-                        ("url_source", url_source),
-                        ("prompt", current_prompt),
-                        ("ocr_info", ocr_info_sanitized),
-                        ("WFO_info", WFO),
-                        ("COP90_elevation_m", ""),
-                        ("ocr", ocr_sanitized),
-                        ("formatted_json", vv_results_sanitized),
-                        ("formatted_md", ""),
-                        ("parsing_info", OrderedDict([
-                            ("model", llm_model_name),
-                            ("input", tokens_in),
-                            ("output", tokens_out),
-                            ("cost_in", cost_in),
-                            ("cost_out", cost_out),
-                        ])),
-                        ("impact", est_impact),
-                        ("collage_info", collage_json_data),
-                        ("collage_image_format", 'jpeg'),
-                        ("success", {
+                    results = self._parse_ocr_text(
+                        ocr, ocr_info, ocr_tokens_total,
+                        current_prompt=current_prompt,
+                        llm_model_name=llm_model_name,
+                        LLM_name_cost=LLM_name_cost,
+                        include_wfo=include_wfo,
+                        original_filename=original_filename,
+                        url_source=url_source,
+                        collage_json_data=collage_json_data,
+                        success={
                             "image_available": "True",
                             "text_collage": "True",
                             "text_collage_resize": f'{collage_resize_method}',
                             "ocr": "True",
                             "llm": "True",
-                        }),
-                    ])
-                
-                if include_cop90:
-                    try:
-                        fj = results.get("formatted_json")
-                        if isinstance(fj, dict):
-                            lat_val = fj.get("decimalLatitude") or fj.get("decimal_latitude")
-                            lon_val = fj.get("decimalLongitude") or fj.get("decimal_longitude")
-                            elev = _elevation_lookup.query(float(lat_val), float(lon_val))
-                            results["COP90_elevation_m"] = elev if elev is not None else ""
-                    except Exception:
-                        pass
+                        },
+                        user_api_key=user_api_key,
+                        user_vertex_project=user_vertex_project,
+                        user_vertex_region=user_vertex_region,
+                        caller_email=caller_email,
+                        on_stage=on_stage,
+                    )
 
-                # Aggregate the per-request estimated cost so the route handler
-                # can persist it on the user's usage doc. OCR costs come from
-                # each engine in ocr_info; LLM cost comes from parsing_info.
-                # Token-derived estimate, not authoritative billing.
-                try:
-                    ocr_cost_sum = 0.0
-                    for v in (results.get("ocr_info") or {}).values():
-                        if isinstance(v, dict):
-                            ocr_cost_sum += float(v.get("total_cost", 0.0) or 0.0)
-                    parsing = results.get("parsing_info") or {}
-                    parsing_cost = float(parsing.get("cost_in", 0.0) or 0.0) + float(parsing.get("cost_out", 0.0) or 0.0)
-                    results["total_request_cost_usd"] = ocr_cost_sum + parsing_cost
-                except Exception as cost_err:
-                    self._log(f"Could not compute total_request_cost_usd: {cost_err}", "warning")
-                    results["total_request_cost_usd"] = 0.0
+                # Plain OCR text can be re-parsed later via /parse-ocr without re-uploading
+                if not notebook_mode:
+                    ocr_id = self._remember_ocr_text(collage_image_bytes, engine_options, ocr_prompt_option, ocr, ocr_info)
+                    if ocr_id:
+                        results["ocr_id"] = ocr_id
+
+                self._finalize_results(results, include_cop90, on_stage=on_stage)
+
+                if cache_key:
+                    self._store_cached_result(cache_key, results)
+                    results["cache"] = {"hit": False, "key": cache_key}
 
                 self._log(f"Processing completed successfully", "info")
                 return results, 200
@@ -4522,59 +5650,225 @@ class VoucherVisionProcessor:
                             user_vertex_project, user_vertex_region, llm_model_name
                         )
                     }, 404
+                if isinstance(e, ModelCapacityError) or is_rate_limit_error(e):
+                    return {'error': f'Model capacity exceeded: {e}'}, 429
                 return {'error': str(e)}, 500
-            
-            finally:
-                # Clean up the temporary file
-                try:
-                    if original_temp_path and os.path.exists(original_temp_path):
-                        os.remove(original_temp_path)
-                    if collage_temp_path and os.path.exists(collage_temp_path):
-                        os.remove(collage_temp_path)
-                    if 'temp_dir' in locals() and os.path.exists(temp_dir):
-                        shutil.rmtree(temp_dir, ignore_errors=True)
-                except Exception as cleanup_error:
-                    self._log(f"Error during cleanup: {cleanup_error}", "warning")
         finally:
             # Release the throttling semaphore
             self.throttler.release()
 
-def create_multipart_response(json_data, image_bytes):
-    """Creates a multipart/form-data response containing both JSON and an image."""
+STREAM_MIMETYPES = OrderedDict([
+    ("sse", "text/event-stream"),
+    ("ndjson", "application/x-ndjson"),
+])
+
+_stream_executor = None
+_stream_executor_lock = threading.Lock()
+_stream_slots = threading.BoundedSemaphore(max(1, STREAM_MAX_WORKERS + STREAM_MAX_PENDING))
+
+
+class StreamCapacityError(RuntimeError):
+    """Every streaming worker is busy and the backlog is full"""
+
+
+def requested_stream_format(req):
+    """Return 'sse' or 'ndjson' when the Accept header asks for a streaming response, else None"""
+    accept = (req.headers.get('Accept') or '').lower()
+    for stream_format, mimetype in STREAM_MIMETYPES.items():
+        if mimetype in accept:
+            return stream_format
+    return None
+
+
+def _format_stream_event(stream_format, event, payload):
+    data = json.dumps(payload, cls=OrderedJsonEncoder)
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {data}\n\n"
+    return json.dumps(OrderedDict([("event", event), ("data", payload)]), cls=OrderedJsonEncoder) + "\n"
+
+
+def stream_pipeline_events(run_pipeline, stream_format, on_complete=None, projection=None):
+    """
+    Run a pipeline on the streaming pool and yield its stage results as SSE or NDJSON chunks.
+
+    run_pipeline(on_stage) must return (results, status_code). Every
+    on_stage(stage, payload) call is serialized immediately and forwarded.
+    The last event is "result" (the same body the non-streaming endpoint
+    returns, plus status_code) or "error". on_complete(results, status_code)
+    runs on the worker inside an app context, so usage accounting still
+    happens if the client disconnects early. projection (see
+    project_response) is applied to stage payloads and the final body, but
+    on_complete always sees the full results.
+
+    Raises StreamCapacityError, before anything runs, when STREAM_MAX_WORKERS
+    pipelines are running and STREAM_MAX_PENDING more are waiting.
+    """
+    global _stream_executor
+    if not _stream_slots.acquire(blocking=False):
+        raise StreamCapacityError("Server is at maximum capacity. Please try again later.")
+    with _stream_executor_lock:
+        if _stream_executor is None:
+            _stream_executor = ThreadPoolExecutor(max_workers=STREAM_MAX_WORKERS, thread_name_prefix="stream")
+
+    events = queue.Queue()
+
+    def on_stage(stage, payload):
+        payload = project_response(payload, projection)
+        if payload:
+            events.put(_format_stream_event(stream_format, stage, payload))
+
+    def worker():
+        try:
+            results, status_code = run_pipeline(on_stage)
+        except Exception as e:
+            logger.exception("Streaming pipeline failed")
+            results, status_code = {'error': str(e)}, 500
+        finally:
+            _stream_slots.release()
+        if on_complete is not None:
+            try:
+                with app.app_context():
+                    on_complete(results, status_code)
+            except Exception:
+                logger.exception("Streaming completion hook failed")
+        final_event = "result" if status_code == 200 else "error"
+        body = OrderedDict([("status_code", status_code)])
+        body.update(project_response(results, projection) if isinstance(results, dict) else {})
+        timings = stage_metrics.current_timings()
+        if timings is not None and timings.include_in_response:
+            body["timings"] = timings.as_dict()
+        events.put(_format_stream_event(stream_format, final_event, body))
+        events.put(None)
+
+    try:
+        stage_metrics.submit_in_context(_stream_executor, worker)
+    except Exception:
+        _stream_slots.release()
+        raise
+
+    def generate():
+        while True:
+            try:
+                chunk = events.get(timeout=STREAM_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                # Keep proxies and load balancers from closing an idle connection
+                if stream_format == "sse":
+                    yield ": keep-alive\n\n"
+                continue
+            if chunk is None:
+                return
+            yield chunk
+
+    return generate()
+
+
+def create_streaming_response(run_pipeline, stream_format, on_complete=None, projection=None):
+    """Wrap stream_pipeline_events in a streaming Flask response (429 when the streaming pool is full)"""
+    try:
+        events = stream_pipeline_events(run_pipeline, stream_format, on_complete=on_complete, projection=projection)
+    except StreamCapacityError as e:
+        response = make_response(jsonify({'error': str(e)}), 429)
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response
+    response = Response(events, mimetype=STREAM_MIMETYPES[stream_format])
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response
+
+
+def build_multipart_body(json_data, image_bytes, extra_images=None):
+    """
+    Return (body, boundary) for a multipart/form-data payload of JSON and raw JPEG parts.
+
+    The collage goes in the "image" part (what client.py reads); extra_images
+    is a list of (part_name, filename, bytes) for additional JPEGs.
+    """
     boundary = f"boundary--{uuid.uuid4()}"
-    
-    # Start the multipart body
-    body = []
-    
+    delimiter = f'--{boundary}\r\n'.encode('utf-8')
+
     # Part 1: JSON data
-    body.append(f'--{boundary}')
-    body.append('Content-Disposition: form-data; name="json_data"')
-    body.append('Content-Type: application/json')
-    body.append('')
-    body.append(json.dumps(json_data, cls=OrderedJsonEncoder))
-    
-    # Part 2: Image data
-    body.append(f'--{boundary}')
-    body.append('Content-Disposition: form-data; name="image"; filename="collage.jpg"')
-    body.append('Content-Type: image/jpeg')
-    body.append('')
-    # The image bytes need to be appended as raw bytes, not strings
-    # So we join the text parts first, then append the bytes
-    
+    body = [
+        delimiter,
+        b'Content-Disposition: form-data; name="json_data"\r\n',
+        b'Content-Type: application/json\r\n\r\n',
+        json.dumps(json_data, cls=OrderedJsonEncoder).encode('utf-8'),
+        b'\r\n',
+    ]
+
+    # Image parts are appended as raw bytes, not base64
+    image_parts = [("image", "collage.jpg", image_bytes)] if image_bytes else []
+    image_parts.extend(extra_images or [])
+    for part_name, filename, part_bytes in image_parts:
+        body.extend([
+            delimiter,
+            f'Content-Disposition: form-data; name="{part_name}"; filename="{filename}"\r\n'.encode('utf-8'),
+            b'Content-Type: image/jpeg\r\n\r\n',
+            part_bytes,
+            b'\r\n',
+        ])
+
     # Final boundary
-    end_boundary = f'\r\n--{boundary}--\r\n'
-    
-    # Combine text parts
-    text_parts = "\r\n".join(body) + "\r\n"
-    
-    # Create the full response body
-    full_body = text_parts.encode('utf-8') + image_bytes + end_boundary.encode('utf-8')
+    body.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return b''.join(body), boundary
+
 
-    # Create and return the Flask response
-    response = make_response(full_body)
+def create_multipart_response(json_data, image_bytes, extra_images=None, status_code=200):
+    """Creates a multipart/form-data response containing JSON and raw JPEG parts."""
+    body, boundary = build_multipart_body(json_data, image_bytes, extra_images=extra_images)
+    response = make_response(body, status_code)
     response.headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
     return response
 
+
+def wants_multipart_response(req):
+    """True when the Accept header asks for JSON plus raw image parts"""
+    return 'multipart/form-data' in (req.headers.get('Accept') or '').lower()
+
+
+def split_image_parts(results, projection=None, input_image_bytes=None):
+    """
+    Move the response images out of (already projected) results for a multipart reply.
+
+    Returns (results, collage_bytes, extra_images); collage_info.image_parts
+    maps each removed base64 field to the part that now carries it.
+    """
+    collage_info = OrderedDict(results["collage_info"])
+    collage_b64 = collage_info.pop("base64image_text_collage", None)
+    collage_info.pop("base64image_input_resized", None)
+    image_parts = OrderedDict()
+    extra_images = []
+    if collage_b64:
+        image_parts["base64image_text_collage"] = "image"
+    if input_image_bytes and projection_includes(projection, RESPONSE_INPUT_IMAGE_FIELD):
+        image_parts["base64image_input_resized"] = "input_image"
+        extra_images.append(("input_image", "input_resized.jpg", input_image_bytes))
+    collage_info["image_parts"] = image_parts
+    results = OrderedDict(results)
+    results["collage_info"] = collage_info
+    return results, (base64.b64decode(collage_b64) if collage_b64 else None), extra_images
+
+
+def create_results_response(results, status_code, projection=None, input_image_bytes=None, multipart=False):
+    """
+    Build the /process-style response: projected JSON, or (multipart) the
+    JSON without base64 images plus the collage and resized input as raw
+    JPEG parts named "image" and "input_image".
+    """
+    results = project_response(results, projection)
+    timings = stage_metrics.current_timings()
+    if timings is not None and timings.include_in_response and isinstance(results, dict):
+        results = OrderedDict(results)
+        results["timings"] = timings.as_dict()
+    if multipart and status_code == 200 and isinstance(results.get("collage_info"), dict):
+        results, collage_bytes, extra_images = split_image_parts(results, projection, input_image_bytes)
+        response = create_multipart_response(results, collage_bytes, extra_images=extra_images, status_code=status_code)
+    else:
+        response = make_response(json.dumps(results, cls=OrderedJsonEncoder), status_code)
+        response.headers['Content-Type'] = 'application/json'
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response
+
 # Initialize Flask app
 app = Flask(__name__, static_folder='static', static_url_path='/static')
 CORS(app, 
@@ -4605,7 +5899,7 @@ except Exception as e:
 
 # Initialize processor once at startup
 try:
-    processor = VoucherVisionProcessor(app.logger)
+    processor = VoucherVisionProcessor(app.logger, max_concurrent=THROTTLE_MAX_CONCURRENT)
     app.config['processor'] = processor
     # Initialize email sender
     email_sender = SimpleEmailSender()
@@ -4631,18 +5925,27 @@ class GCSElevationLookup:
         self._cache = OrderedDict()
         self._cache_size = cache_size
         self._lock = threading.Lock()
+        # rasterio / GDAL are only loaded on the first query (see _ensure_env)
+        self._gdal_cred_file = None
+        self._rasterio_env = None
+        import atexit
+        atexit.register(self.close)
+
+    def _ensure_env(self):
+        """Enter the rasterio/GDAL environment once. Caller holds self._lock."""
+        if self._rasterio_env is not None:
+            return
+        import rasterio
         self._gdal_cred_file = self._prepare_gdal_credentials()
 
         # Configure GDAL via rasterio to use our temp file and suppress
         # GDAL's error logging (which would leak raw credentials)
-        import rasterio
         gdal_opts = {"CPL_LOG": os.devnull}
         if self._gdal_cred_file:
             gdal_opts["GOOGLE_APPLICATION_CREDENTIALS"] = self._gdal_cred_file
-        self._rasterio_env = rasterio.Env(**gdal_opts)
-        self._rasterio_env.__enter__()
-        import atexit
-        atexit.register(self.close)
+        env = rasterio.Env(**gdal_opts)
+        env.__enter__()
+        self._rasterio_env = env
 
     def close(self):
         """Clean up rasterio env, cached datasets, and temp credential file."""
@@ -4653,8 +5956,11 @@ class GCSElevationLookup:
                 except Exception:
                     pass
             self._cache.clear()
+            env, self._rasterio_env = self._rasterio_env, None
+        if env is None:
+            return
         try:
-            self._rasterio_env.__exit__(None, None, None)
+            env.__exit__(None, None, None)
         except Exception:
             pass
         if self._gdal_cred_file and self._gdal_cred_file.startswith(tempfile.gettempdir()):
@@ -4709,6 +6015,7 @@ class GCSElevationLookup:
             if path in self._cache:
                 self._cache.move_to_end(path)
                 return self._cache[path]
+            self._ensure_env()
             ds = rasterio.open(path)
             self._cache[path] = ds
             self._cache.move_to_end(path)
@@ -4736,20 +6043,202 @@ class GCSElevationLookup:
             return None
 
 
-GCS_ELEVATION_BUCKET = os.environ.get("COP90_GCS_BUCKET", "vouchervision-cop90-rasters")
-_elevation_lookup = GCSElevationLookup(gcs_bucket=GCS_ELEVATION_BUCKET, gcs_prefix="COP90")
+GCS_ELEVATION_BUCKET = os.environ.get("COP90_GCS_BUCKET", "vouchervision-cop90-rasters")
+_elevation_lookup = GCSElevationLookup(gcs_bucket=GCS_ELEVATION_BUCKET, gcs_prefix="COP90")
+
+# WFO local taxonomy lookup
+WFO_DB_PATH = os.path.join(os.path.dirname(__file__), "wfo_backbone.db")
+_wfo_lookup = None
+if os.path.exists(WFO_DB_PATH):
+    try:
+        _wfo_lookup = WFOLocalLookup(WFO_DB_PATH)
+        logger.info(f"WFO local database loaded from {WFO_DB_PATH}")
+    except Exception as e:
+        logger.error(f"Failed to load WFO database: {e}")
+else:
+    logger.warning(f"WFO database not found at {WFO_DB_PATH} — WFO lookups will be disabled")
+
+
+# Startup warm-up (see run_warmup). Runs on a background thread after the processor is
+# created; /ready answers 503 until it has finished so traffic only reaches hot instances.
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_MODELS = [m.strip() for m in os.environ.get("WARMUP_MODELS", "gemini-2.5-flash,gemini-2.5-pro").split(",") if m.strip()]
+# Optional "lat,lon;lat,lon" points whose COP90 tiles are opened during warm-up
+WARMUP_COP90_POINTS = os.environ.get("WARMUP_COP90_POINTS", "")
+
+
+def _parse_warmup_points(raw):
+    points = []
+    for item in (raw or "").split(";"):
+        try:
+            lat, lon = (float(v) for v in item.split(","))
+        except ValueError:
+            continue
+        if -90 <= lat <= 90 and -180 <= lon <= 180:
+            points.append((lat, lon))
+    return points
+
+
+class WarmupState:
+    """Thread-safe record of the warm-up steps, reported by /ready and /health"""
+    def __init__(self, enabled):
+        self.lock = threading.Lock()
+        self.status = "pending" if enabled else "disabled"
+        self.started_at = None
+        self.finished_at = None
+        self.steps = OrderedDict()
+
+    def begin(self):
+        with self.lock:
+            self.status = "warming"
+            self.started_at = time.monotonic()
+
+    def record(self, step, seconds, error=None):
+        with self.lock:
+            self.steps[step] = {"ms": round(seconds * 1000.0, 1), "ok": error is None}
+            if error is not None:
+                self.steps[step]["error"] = _sanitize_error_message(str(error)) or error.__class__.__name__
+
+    def finish(self):
+        with self.lock:
+            self.status = "ready"
+            self.finished_at = time.monotonic()
+
+    @property
+    def is_ready(self):
+        with self.lock:
+            return self.status in ("ready", "disabled")
+
+    def get_stats(self):
+        with self.lock:
+            elapsed = None
+            if self.started_at is not None:
+                elapsed = round(((self.finished_at or time.monotonic()) - self.started_at) * 1000.0, 1)
+            return {
+                "status": self.status,
+                "elapsed_ms": elapsed,
+                "failed_steps": [name for name, step in self.steps.items() if not step["ok"]],
+                "steps": OrderedDict((name, dict(step)) for name, step in self.steps.items()),
+            }
+
+
+_warmup_state = WarmupState(WARMUP_ENABLED)
+
+
+def _warmup_step(name, fn, *args):
+    started = time.monotonic()
+    try:
+        fn(*args)
+        _warmup_state.record(name, time.monotonic() - started)
+    except Exception as e:
+        _warmup_state.record(name, time.monotonic() - started, e)
+        logger.warning(f"Warm-up step {name} failed: {e}")
+
+
+def _warm_collage_engines(processor):
+    """
+    One dummy inference per pooled CollageEngine (first OpenVINO inference is slow).
+
+    The engines get a temp file path, the form every engine accepts, and are called
+    directly: a blank image must not decide whether real requests use in-memory
+    streams (see _call_image_engine).
+    """
+    pool = processor.collage_engine_pool
+    if not pool:
+        return
+    fd, temp_path = tempfile.mkstemp(prefix="vvgo_warmup_", suffix=".jpg")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            Image.new("RGB", (640, 480), "white").save(f, format="JPEG")
+        with ExitStack() as stack:
+            engines = [stack.enter_context(pool.checkout()) for _ in range(pool.size)]
+            for engine in engines:
+                engine.run(temp_path)
+    finally:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def run_warmup(processor):
+    """
+    Pay the cold-start costs before the first request does: shared OCR engines and
+    pooled LLM handlers for WARMUP_MODELS, one collage inference per engine, a WFO
+    lookup and the COP90 tiles for WARMUP_COP90_POINTS. A failed step is recorded
+    and skipped; that stage just stays lazy.
+    """
+    _warmup_state.begin()
+    for model in WARMUP_MODELS:
+        _warmup_step(f"ocr_engine:{model}", processor._get_ocr_engine, model)
+
+    def build_handlers(model):
+        with processor.checkout_vv(processor.default_prompt, model):
+            pass
+
+    for model in WARMUP_MODELS:
+        _warmup_step(f"llm_handlers:{model}", build_handlers, model)
+    _warmup_step("collage", _warm_collage_engines, processor)
+    if _wfo_lookup:
+        _warmup_step("wfo", _wfo_lookup.check_wfo, {"scientificName": "Quercus alba"})
+    for lat, lon in _parse_warmup_points(WARMUP_COP90_POINTS):
+        _warmup_step(f"cop90:{lat:g},{lon:g}", _elevation_lookup.query, lat, lon)
+    _warmup_state.finish()
+    logger.info(f"Warm-up finished: {_warmup_state.get_stats()}")
+
+
+def _compile_builtin_prompts(processor):
+    for filename in sorted(_builtin_prompt_filenames()):
+        PROMPT_REGISTRY.get_file(os.path.join(processor.custom_prompts_dir, filename), name=filename)
 
-# WFO local taxonomy lookup
-WFO_DB_PATH = os.path.join(os.path.dirname(__file__), "wfo_backbone.db")
-_wfo_lookup = None
-if os.path.exists(WFO_DB_PATH):
+
+def warm_shared_state(processor):
+    """
+    Fork-safe part of the warm-up, run in the gunicorn master before it forks.
+
+    Everything built here (compiled prompts, the WFO hierarchy cache and page cache)
+    is inherited by every worker and shared copy-on-write. Nothing here may start
+    a thread or open a network client: OpenVINO inference, Gemini clients and
+    COP90 tiles are warmed per worker by run_warmup.
+    """
+    _warmup_step("prompts", _compile_builtin_prompts, processor)
+    if _wfo_lookup:
+        _warmup_step("wfo", _wfo_lookup.check_wfo, {"scientificName": "Quercus alba"})
+
+
+def reinitialize_after_fork():
+    """
+    Called by gunicorn's post_fork hook in each worker of a preloaded server.
+
+    Threads and network clients created by the master are not usable in the child:
+    the Firestore client (gRPC), the storage client, thread pools and the SQLite
+    connection are replaced, then the per-worker warm-up starts.
+    """
+    global db, _PDF_JOB_STORAGE_CLIENT, _stream_executor, _stream_executor_lock, _stream_slots, IMAGE_PREP_POOL
     try:
-        _wfo_lookup = WFOLocalLookup(WFO_DB_PATH)
-        logger.info(f"WFO local database loaded from {WFO_DB_PATH}")
+        db = firestore.client(app=_initialize_firebase_app(name=f"worker-{os.getpid()}"))
     except Exception as e:
-        logger.error(f"Failed to load WFO database: {e}")
-else:
-    logger.warning(f"WFO database not found at {WFO_DB_PATH} — WFO lookups will be disabled")
+        logger.error(f"Failed to re-create the Firestore client after fork: {e}")
+    _PDF_JOB_STORAGE_CLIENT = None
+    _stream_executor = None
+    IMAGE_PREP_POOL = _build_image_prep_pool()
+    _stream_executor_lock = threading.Lock()
+    _stream_slots = threading.BoundedSemaphore(max(1, STREAM_MAX_WORKERS + STREAM_MAX_PENDING))
+    if _wfo_lookup:
+        _wfo_lookup.reopen()
+    worker_processor = app.config.get('processor')
+    if worker_processor:
+        worker_processor.reinitialize_after_fork()
+        if WARMUP_ENABLED:
+            threading.Thread(target=run_warmup, args=(worker_processor,), name="warmup", daemon=True).start()
+    logger.info(f"Worker {os.getpid()} re-initialized after fork")
+
+
+if WARMUP_ENABLED:
+    if SERVE_PRELOADED:
+        warm_shared_state(processor)
+    else:
+        threading.Thread(target=run_warmup, args=(processor,), name="warmup", daemon=True).start()
 
 
 @app.before_request
@@ -4776,6 +6265,7 @@ def auth_check():
     }), 200
     
 @app.route('/process', methods=['POST', 'OPTIONS'])
+@timed_route('/process')
 @authenticated_route
 def process_image():
     """API endpoint to process an image with explicit CORS headers and automatic resizing"""
@@ -4803,6 +6293,7 @@ def process_image():
     user_gemini_key = payment_auth["gemini_api_key"]
     user_vertex_project = payment_auth["vertex_project"]
     user_vertex_region = payment_auth["vertex_region"]
+    projection = get_response_projection(request)
 
     err, err_status = _validate_vertex_params(user_gemini_key, user_vertex_project, user_vertex_region)
     if err:
@@ -4866,6 +6357,7 @@ def process_image():
         user_vertex_project=user_vertex_project,
         user_vertex_region=user_vertex_region,
         caller_email=user_email,
+        include_input_image=projection_includes(projection, RESPONSE_INPUT_IMAGE_FIELD),
     )
 
     # Detect PDF by extension
@@ -4879,7 +6371,9 @@ def process_image():
         # For PDFs, quota is checked per-page inside process_image_request
         # so we skip the single-slot reservation here.
         results, status_code = app.config['processor'].process_pdf_request(
-            file=file, **process_kwargs
+            file=file,
+            pdf_text_layer=request.form.get('pdf_text_layer', 'false').lower() == 'true',
+            **process_kwargs
         )
 
         if status_code == 200:
@@ -4914,6 +6408,9 @@ def process_image():
         try:
             file = process_uploaded_file_with_resize(file, max_pixels=5200000)
             logger.info(f"Image processed and resized if necessary for user: {user_email}")
+        except image_prep.ImagePrepBusyError as e:
+            logger.warning(f"Image prep queue full for user {user_email}: {e}")
+            return image_prep_busy_response(e)
         except Exception as e:
             logger.error(f"Error processing image for resize: {e}")
             response = make_response(jsonify({'error': f'Error processing image: {str(e)}'}), 500)
@@ -4952,54 +6449,84 @@ def process_image():
                     return resp
                 reserved_keys = request_keys
 
+        def record_upload_outcome(results, status_code):
+            event = build_usage_event(
+                analytics_ctx=analytics_ctx,
+                result=results,
+                status_code=status_code,
+                source_type="upload",
+                filename=getattr(file, "filename", None),
+                include_in_rollup=True,
+            )
+
+            if status_code == 200:
+                try:
+                    persist_usage_events_and_rollups([event], route_label="/process:upload")
+                except Exception:
+                    logger.exception(
+                        "usage_events write failed route=/process request_id=%s; skipped rollup mutation",
+                        request_id,
+                    )
+                # Advisory email: nudge pro users toward flash-lite / own API key (max 1/day).
+                # Only fires for pro variants, not for other rate-limited models.
+                pro_reserved = [k for k in reserved_keys if _rate_limit_field_prefix(k) == "gemini_pro"]
+                if pro_reserved:
+                    pro_state = read_rate_limit_state(user_email).get(pro_reserved[0])
+                    if pro_state:
+                        _send_pro_migration_advisory(user_email, pro_state[0], pro_state[1])
+            else:
+                # Release the reserved per-model quotas on failure
+                if reserved_keys:
+                    release_quotas(user_email, reserved_keys)
+                try:
+                    persist_usage_events_and_rollups([event], route_label="/process:upload")
+                except Exception:
+                    logger.exception(
+                        "usage_events write failed route=/process request_id=%s; skipped rollup mutation",
+                        request_id,
+                    )
+
+        # Opt-in streaming: emit each stage as soon as it is ready
+        stream_format = requested_stream_format(request)
+        # Opt-in multipart: images travel as raw JPEG parts, so skip base64-encoding the input
+        multipart = not stream_format and wants_multipart_response(request)
+        if multipart:
+            process_kwargs["include_input_image"] = False
+        if stream_format:
+            processor = app.config['processor']
+            # The pipeline outlives this request, whose teardown closes the upload stream
+            file.stream.seek(0)
+            stream_file = FileStorage(stream=io.BytesIO(file.read()), filename=file.filename,
+                                      content_type=file.content_type)
+            return create_streaming_response(
+                lambda on_stage: processor.process_image_request(file=stream_file, on_stage=on_stage, **process_kwargs),
+                stream_format,
+                on_complete=record_upload_outcome,
+                projection=projection,
+            )
+
         results, status_code = app.config['processor'].process_image_request(
             file=file, **process_kwargs
         )
+        record_upload_outcome(results, status_code)
 
-        event = build_usage_event(
-            analytics_ctx=analytics_ctx,
-            result=results,
-            status_code=status_code,
-            source_type="upload",
-            filename=getattr(file, "filename", None),
-            include_in_rollup=True,
-        )
-
-        if status_code == 200:
-            try:
-                persist_usage_events_and_rollups([event], route_label="/process:upload")
-            except Exception:
-                logger.exception(
-                    "usage_events write failed route=/process request_id=%s; skipped rollup mutation",
-                    request_id,
-                )
-            # Advisory email: nudge pro users toward flash-lite / own API key (max 1/day).
-            # Only fires for pro variants, not for other rate-limited models.
-            pro_reserved = [k for k in reserved_keys if _rate_limit_field_prefix(k) == "gemini_pro"]
-            if pro_reserved:
-                pro_state = read_rate_limit_state(user_email).get(pro_reserved[0])
-                if pro_state:
-                    _send_pro_migration_advisory(user_email, pro_state[0], pro_state[1])
-        else:
-            # Release the reserved per-model quotas on failure
-            if reserved_keys:
-                release_quotas(user_email, reserved_keys)
-            try:
-                persist_usage_events_and_rollups([event], route_label="/process:upload")
-            except Exception:
-                logger.exception(
-                    "usage_events write failed route=/process request_id=%s; skipped rollup mutation",
-                    request_id,
-                )
+    # Apply fields=/exclude= after usage accounting, which needs the full results
+    if is_pdf:
+        if isinstance(results.get('pages'), list):
+            results['pages'] = [project_response(page, projection) for page in results['pages']]
+        return create_results_response(results, status_code)
 
-    # Always return JSON
-    response = make_response(json.dumps(results, cls=OrderedJsonEncoder), status_code)
-    response.headers['Content-Type'] = 'application/json'
-    response.headers.add('Access-Control-Allow-Origin', '*')
-    return response
+    input_image_bytes = None
+    if multipart:
+        file.stream.seek(0)
+        input_image_bytes = file.read()
+    return create_results_response(
+        results, status_code, projection, input_image_bytes=input_image_bytes, multipart=multipart
+    )
 
 
 @app.route('/process-url', methods=['POST', 'OPTIONS'])
+@timed_route('/process-url')
 @authenticated_route
 def process_image_by_url():
     """API endpoint to process an image from a URL with FormData, matching /process behavior and automatic resizing"""
@@ -5053,6 +6580,9 @@ def process_image_by_url():
         user_vertex_project = payment_auth["vertex_project"]
         user_vertex_region = payment_auth["vertex_region"]
 
+    projection = get_response_projection(request)
+    multipart = wants_multipart_response(request)
+
     err, err_status = _validate_vertex_params(user_gemini_key, user_vertex_project, user_vertex_region)
     if err:
         resp = make_response(jsonify({'error': err}), err_status)
@@ -5144,22 +6674,27 @@ def process_image_by_url():
                 cookie  = os.environ.get("PORTAL_COOKIE")  # optional: e.g., "sessionid=abc123; other=xyz"
                 extra   = {}  # optionally: {"X-Requested-With": "XMLHttpRequest"}
 
-                file_obj, filename_from_url = smart_fetch_image_as_filestorage(
-                    image_url,
-                    max_pixels=5_200_000,
-                    max_retries=3,
-                    connect_timeout=15.0,
-                    read_timeout=90.0,
-                    per_try_base_delay=0.75,
-                    per_try_jitter=0.75,
-                    allowed_domains=allowed,
-                    user_agent=APP_USER_AGENT,
-                    extra_headers=extra,    # if the site expects specific headers
-                    cookie=cookie,          # if you have an approved session
-                    logger=logger,
-                )
+                with stage_metrics.span("fetch"):
+                    file_obj, filename_from_url = smart_fetch_image_as_filestorage(
+                        image_url,
+                        max_pixels=5_200_000,
+                        max_retries=3,
+                        connect_timeout=15.0,
+                        read_timeout=90.0,
+                        per_try_base_delay=0.75,
+                        per_try_jitter=0.75,
+                        allowed_domains=allowed,
+                        user_agent=APP_USER_AGENT,
+                        extra_headers=extra,    # if the site expects specific headers
+                        cookie=cookie,          # if you have an approved session
+                        logger=logger,
+                        prep_runner=IMAGE_PREP_POOL.run,
+                    )
                 filename = filename_from_url
                 logger.info(f"URL fetched filenam: {filename_from_url}")
+            except image_prep.ImagePrepError:
+                # A busy, crashed or hung prep must not be repeated by the fallback fetch
+                raise
             except:
                 file_obj, filename = process_url_image_with_resize(image_url, max_pixels=5200000)
 
@@ -5176,6 +6711,11 @@ def process_image_by_url():
                 wait_time = 2 ** attempt
                 logger.info(f"Waiting for {wait_time} second(s) before retrying...")
                 time.sleep(wait_time)
+        except image_prep.ImagePrepBusyError as e:
+            logger.warning(f"Image prep queue full for URL '{image_url}': {e}")
+            if reserved_keys:
+                release_quotas(user_email, reserved_keys)
+            return image_prep_busy_response(e)
         except Exception as e:
             # Catch other unexpected errors during download/resize
             logger.exception(f"An unexpected error occurred during URL processing on attempt {attempt + 1}: {e}")
@@ -5234,7 +6774,7 @@ def process_image_by_url():
                 "usage_events write failed route=/process-url request_id=%s; skipped rollup mutation",
                 request_id,
             )
-        response = make_response(json.dumps(error_response_data, cls=OrderedJsonEncoder), 200)
+        response = make_response(json.dumps(project_response(error_response_data, projection), cls=OrderedJsonEncoder), 200)
         response.headers['Content-Type'] = 'application/json'
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response
@@ -5256,6 +6796,7 @@ def process_image_by_url():
             user_vertex_project=user_vertex_project,
             user_vertex_region=user_vertex_region,
             caller_email=user_email,
+            include_input_image=projection_includes(projection, RESPONSE_INPUT_IMAGE_FIELD) and not multipart,
         )
 
         event = build_usage_event(
@@ -5294,11 +6835,13 @@ def process_image_by_url():
                     request_id,
                 )
 
-        response = make_response(json.dumps(results, cls=OrderedJsonEncoder), status_code)
-        response.headers['Content-Type'] = 'application/json'
-
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        return response
+        input_image_bytes = None
+        if multipart:
+            file_obj.stream.seek(0)
+            input_image_bytes = file_obj.read()
+        return create_results_response(
+            results, status_code, projection, input_image_bytes=input_image_bytes, multipart=multipart
+        )
 
     except Exception as e:
         logger.exception(f"Error during main processing after successful download from URL: {e}")
@@ -5308,7 +6851,153 @@ def process_image_by_url():
         return jsonify({'error': str(e)}), 500
     
 
+@app.route('/parse-ocr', methods=['POST', 'OPTIONS'])
+@timed_route('/parse-ocr')
+@authenticated_route
+def parse_ocr_text():
+    """API endpoint to re-parse OCR text with a different prompt / llm_model, without re-uploading the image.
+
+    JSON body: either "ocr_id" (returned by /process or /process-url when the OCR
+    cache is enabled) or "ocr_text", plus the usual "prompt", "llm_model",
+    "include_wfo" and "include_cop90".
+    """
+    user_email = get_user_email_from_request(request)
+
+    content_type = request.headers.get('Content-Type', '').lower()
+    if 'application/json' in content_type:
+        data = request.get_json(silent=True) or {}
+    else:
+        data = request.form
+    # Same 'true' comparison as the form fields; str() also covers JSON booleans
+    include_wfo = str(data.get('include_wfo', 'true')).lower() == 'true'
+    include_cop90 = str(data.get('include_cop90', 'true')).lower() == 'true'
+    ocr_id = data.get('ocr_id')
+    ocr_text = data.get('ocr_text')
+    prompt = data.get('prompt')
+    llm_model_name = data.get('llm_model')
+    filename = data.get('filename') or ""
+
+    ocr_info = None
+    if ocr_id:
+        stored = app.config['processor'].load_ocr_text(ocr_id)
+        if stored is None:
+            resp = make_response(jsonify({'error': 'Unknown or expired ocr_id. Submit ocr_text or re-process the image.'}), 404)
+            resp.headers.add('Access-Control-Allow-Origin', '*')
+            return resp
+        ocr_text = stored.get('ocr')
+        ocr_info = stored.get('ocr_info')
+    if not isinstance(ocr_text, str) or not ocr_text.strip():
+        resp = make_response(jsonify({'error': 'Provide ocr_id or a non-empty ocr_text'}), 400)
+        resp.headers.add('Access-Control-Allow-Origin', '*')
+        return resp
+
+    payment_auth = get_payment_auth_context(request)
+    user_gemini_key = payment_auth["gemini_api_key"]
+    user_vertex_project = payment_auth["vertex_project"]
+    user_vertex_region = payment_auth["vertex_region"]
+
+    err, err_status = _validate_vertex_params(user_gemini_key, user_vertex_project, user_vertex_region)
+    if err:
+        resp = make_response(jsonify({'error': err}), err_status)
+        resp.headers.add('Access-Control-Allow-Origin', '*')
+        return resp
+    if user_vertex_project:
+        user_vertex_project, project_error = _validate_vertex_project_id(user_vertex_project)
+        if project_error:
+            resp = make_response(jsonify({'error': project_error}), 400)
+            resp.headers.add('Access-Control-Allow-Origin', '*')
+            return resp
+        binding_error = _validate_vertex_project_binding(user_vertex_project, user_email)
+        if binding_error:
+            resp = make_response(jsonify({'error': binding_error}), 403)
+            resp.headers.add('Access-Control-Allow-Origin', '*')
+            return resp
+
+    request_id = str(uuid.uuid4())
+    analytics_ctx = build_request_analytics_context(
+        request,
+        user_email=user_email,
+        endpoint="/parse-ocr",
+        auth_ctx=payment_auth,
+        request_id=request_id,
+        prompt=prompt,
+        ocr_only=False,
+        notebook_mode=False,
+        include_wfo=include_wfo,
+        include_cop90=include_cop90,
+        llm_model_name=llm_model_name,
+    )
+
+    preflight_error, preflight_code = _preflight_user_prompt(prompt, user_email)
+    if preflight_error:
+        resp = make_response(jsonify(preflight_error), preflight_code)
+        resp.headers.add('Access-Control-Allow-Origin', '*')
+        return resp
+
+    # ── Per-model rate-limit gate: only the LLM runs here ──
+    reserved_keys: list[str] = []
+    user_pays = bool(user_gemini_key) or bool(user_vertex_project)
+    if not user_pays:
+        request_keys = rate_limited_keys_in_request(None, llm_model_name)
+        if request_keys:
+            allowed, state, exhausted = check_and_reserve_quotas(user_email, request_keys)
+            if not allowed:
+                ex_count, ex_limit = state[exhausted]
+                _send_rate_limit_hit_alert(user_email, ex_count, ex_limit, model_name=exhausted)
+                resp = make_response(jsonify({
+                    "error": "Rate limit exceeded",
+                    "message": (
+                        f"You have used all {ex_limit} of your {exhausted} requests. "
+                        "Contact an administrator to request additional quota."
+                    ),
+                    "model": exhausted,
+                    "count": ex_count,
+                    "limit": ex_limit,
+                }), 503)
+                resp.headers.add('Access-Control-Allow-Origin', '*')
+                return resp
+            reserved_keys = request_keys
+
+    results, status_code = app.config['processor'].process_ocr_text_request(
+        ocr_text,
+        ocr_info=ocr_info,
+        prompt=prompt,
+        include_wfo=include_wfo,
+        include_cop90=include_cop90,
+        llm_model_name=llm_model_name,
+        filename=filename,
+        user_api_key=user_gemini_key,
+        user_vertex_project=user_vertex_project,
+        user_vertex_region=user_vertex_region,
+        caller_email=user_email,
+    )
+    if status_code == 200 and ocr_id:
+        results["ocr_id"] = ocr_id
+
+    if status_code != 200 and reserved_keys:
+        release_quotas(user_email, reserved_keys)
+
+    event = build_usage_event(
+        analytics_ctx=analytics_ctx,
+        result=results,
+        status_code=status_code,
+        source_type="ocr_text",
+        filename=filename or None,
+        include_in_rollup=True,
+    )
+    try:
+        persist_usage_events_and_rollups([event], route_label="/parse-ocr")
+    except Exception:
+        logger.exception(
+            "usage_events write failed route=/parse-ocr request_id=%s; skipped rollup mutation",
+            request_id,
+        )
+
+    return create_results_response(results, status_code)
+
+
 @app.route('/process-pdf-async', methods=['POST', 'OPTIONS'])
+@timed_route('/process-pdf-async')
 @authenticated_route
 def process_pdf_async():
     user_email = _normalize_email_identity(get_user_email_from_request(request))
@@ -5442,9 +7131,11 @@ def process_pdf_async():
         "ocr_only": bool(ocr_only),
         "notebook_mode": bool(notebook_mode),
         "skip_label_collage": bool(skip_label_collage),
+        "pdf_text_layer": request.form.get('pdf_text_layer', 'false').lower() == 'true',
         "include_wfo": bool(include_wfo),
         "include_cop90": bool(include_cop90),
         "llm_model_name": llm_model_name,
+        "response_projection": get_response_projection(request),
         "auth_method": payment_auth["auth_method"],
         "user_vertex_project": user_vertex_project,
         "user_vertex_region": user_vertex_region,
@@ -5599,6 +7290,67 @@ def download_pdf_job_bundle(job_id):
     return response
 
 
+def _store_split_pdf_pages(job_id: str, job_data: dict, pdf_bytes: bytes, page_count: int):
+    """
+    Upload the page images of a PDF job and write its page docs, queued and
+    uncounted, in one batch with the job's page_count and reset progress counters.
+    """
+    expires_at = job_data.get("expires_at") or _pdf_job_expiration_time()
+    batch = db.batch()
+    # Each page is uploaded as soon as it is rendered, so only a few are held at once.
+    # Pages parsed from their text layer keep that text on the page doc instead.
+    page_files = iter_pdf_page_images(
+        pdf_bytes, job_data["source_pdf_filename"], batch_pages=PDF_PAGE_PREFETCH,
+        text_layer=_pdf_job_uses_text_layer(job_data),
+    )
+    for page_index, (page_file, page_text) in enumerate(page_files, start=1):
+        page_filename = pdf_page_filename(job_data["source_pdf_filename"], page_index - 1)
+        page_blob_path = None
+        if page_file is not None:
+            page_file.stream.seek(0)
+            page_bytes = page_file.read()
+            page_blob_path = _pdf_job_blob_path(job_id, "pages", page_file.filename)
+            _upload_pdf_job_bytes(page_blob_path, page_bytes, content_type="image/jpeg")
+        page_ref = db.collection("pdf_jobs").document(job_id).collection("pages").document(f"{page_index:04d}")
+        batch.set(
+            page_ref,
+            {
+                "page_index": page_index,
+                "status": "queued",
+                "attempt_count": 0,
+                "filename": page_filename,
+                "page_image_blob_path": page_blob_path,
+                "text_layer": page_text,
+                "result_blob_path": None,
+                "counted_status": None,
+                "status_code": 0,
+                "error_message": None,
+                "total_request_cost_usd": 0.0,
+                "total_tokens_all": 0,
+                "created_at": firestore.SERVER_TIMESTAMP,
+                "updated_at": firestore.SERVER_TIMESTAMP,
+                "expires_at": expires_at,
+            },
+        )
+    # The page docs above start uncounted, so the job's counters restart with them. A
+    # redelivered split then never counts a page on top of its first delivery's count.
+    batch.set(
+        db.collection("pdf_jobs").document(job_id),
+        {
+            "page_count": page_count,
+            "completed_pages": 0,
+            "successful_pages": 0,
+            "failed_pages": 0,
+            "finalize_enqueued_at": None,
+            "status": "running",
+            "phase": "processing_pages",
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        },
+        merge=True,
+    )
+    batch.commit()
+
+
 @app.route('/internal/pdf-jobs/<job_id>/split', methods=['POST'])
 @internal_pdf_task_route
 def internal_split_pdf_job(job_id):
@@ -5618,59 +7370,28 @@ def internal_split_pdf_job(job_id):
             merge=True,
         )
         pdf_bytes = _download_pdf_job_bytes(job_data["original_pdf_blob_path"])
-        page_files = convert_pdf_to_page_images(pdf_bytes, job_data["source_pdf_filename"])
+        page_count = image_prep.pdf_page_count(pdf_bytes)
 
-        if len(page_files) > PDF_JOB_MAX_PAGES:
+        if page_count > PDF_JOB_MAX_PAGES:
             _mark_pdf_job_failed(
                 job_id,
-                f"PDF has {len(page_files)} pages, exceeding the limit of {PDF_JOB_MAX_PAGES}.",
+                f"PDF has {page_count} pages, exceeding the limit of {PDF_JOB_MAX_PAGES}.",
                 phase="splitting",
             )
             return jsonify({'error': 'PDF exceeds the maximum supported page count.'}), 400
 
-        expires_at = job_data.get("expires_at") or _pdf_job_expiration_time()
-        batch = db.batch()
-        for page_index, page_file in enumerate(page_files, start=1):
-            page_file.stream.seek(0)
-            page_bytes = page_file.read()
-            page_blob_path = _pdf_job_blob_path(job_id, "pages", page_file.filename)
-            _upload_pdf_job_bytes(page_blob_path, page_bytes, content_type="image/jpeg")
-            page_ref = db.collection("pdf_jobs").document(job_id).collection("pages").document(f"{page_index:04d}")
-            batch.set(
-                page_ref,
-                {
-                    "page_index": page_index,
-                    "status": "queued",
-                    "attempt_count": 0,
-                    "filename": page_file.filename,
-                    "page_image_blob_path": page_blob_path,
-                    "result_blob_path": None,
-                    "status_code": 0,
-                    "error_message": None,
-                    "total_request_cost_usd": 0.0,
-                    "total_tokens_all": 0,
-                    "created_at": firestore.SERVER_TIMESTAMP,
-                    "updated_at": firestore.SERVER_TIMESTAMP,
-                    "expires_at": expires_at,
-                },
-            )
-        batch.commit()
+        _store_split_pdf_pages(job_id, job_data, pdf_bytes, page_count)
 
-        db.collection("pdf_jobs").document(job_id).set(
-            {
-                "page_count": len(page_files),
-                "status": "running",
-                "phase": "processing_pages",
-                "updated_at": firestore.SERVER_TIMESTAMP,
-            },
-            merge=True,
-        )
         refreshed = _get_pdf_job_or_404(job_id)
         if refreshed:
-            for page_index in range(1, len(page_files) + 1):
+            for page_index in range(1, page_count + 1):
                 _enqueue_pdf_page_task(refreshed, page_index)
 
-        return jsonify({'ok': True, 'page_count': len(page_files)}), 200
+        return jsonify({'ok': True, 'page_count': page_count}), 200
+    except image_prep.ImagePrepBusyError as e:
+        # Not a failure of the job: a non-2xx answer makes Cloud Tasks redeliver the split later
+        logger.warning("No PDF helper free to split job %s: %s", job_id, e)
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         logger.exception("Failed to split async PDF job %s", job_id)
         _mark_pdf_job_failed(job_id, str(e), phase="splitting")
@@ -5678,6 +7399,7 @@ def internal_split_pdf_job(job_id):
 
 
 @app.route('/internal/pdf-jobs/<job_id>/pages/<int:page_index>/process', methods=['POST'])
+@timed_route('/internal/pdf-jobs/page')
 @internal_pdf_task_route
 def internal_process_pdf_job_page(job_id, page_index):
     job_data = _get_pdf_job_or_404(job_id)
@@ -5707,16 +7429,26 @@ def internal_process_pdf_job_page(job_id, page_index):
                 f"Rate limit exceeded for {job_data.get('user_email')} on {exhausted}: {count}/{limit}."
             )
 
-        page_bytes = _download_pdf_job_bytes(page_data["page_image_blob_path"])
-        file_obj = FileStorage(
-            stream=BytesIO(page_bytes),
-            filename=page_data.get("filename") or f"page_{page_index:04d}.jpg",
-            content_type="image/jpeg",
-        )
-        results, status_code = app.config['processor'].process_image_request(
-            file=file_obj,
-            **_build_pdf_job_process_kwargs(job_data),
-        )
+        page_filename = page_data.get("filename") or f"page_{page_index:04d}.jpg"
+        if page_data.get("text_layer"):
+            results, status_code = app.config['processor'].process_pdf_text_page(
+                page_filename,
+                page_data["text_layer"],
+                **_build_pdf_job_process_kwargs(job_data),
+            )
+        else:
+            page_bytes = _download_pdf_job_bytes(page_data["page_image_blob_path"])
+            file_obj = FileStorage(
+                stream=BytesIO(page_bytes),
+                filename=page_filename,
+                content_type="image/jpeg",
+            )
+            results, status_code = app.config['processor'].process_image_request(
+                file=file_obj,
+                **_build_pdf_job_process_kwargs(job_data),
+            )
+        if _pdf_job_uses_text_layer(job_data) and isinstance(results, dict):
+            results["ocr_source"] = "text_layer" if page_data.get("text_layer") else "vision"
 
         event = build_usage_event(
             analytics_ctx=_build_pdf_job_analytics_context(job_data),
@@ -5747,9 +7479,11 @@ def internal_process_pdf_job_page(job_id, page_index):
         page_stem = os.path.splitext(page_data.get("filename") or f"page_{page_index:04d}.jpg")[0]
         result_filename = f"{page_stem}.json" if page_status == "completed" else f"{page_stem}_FAILED.json"
         result_blob_path = _pdf_job_blob_path(job_id, "results", result_filename)
-        _upload_pdf_job_json(result_blob_path, results)
+        _upload_pdf_job_json(result_blob_path, project_response(results, job_data.get("response_projection")))
 
-        page_ref.set(
+        _record_pdf_page_result(
+            job_id,
+            page_index,
             {
                 "status": page_status,
                 "result_blob_path": result_blob_path,
@@ -5759,9 +7493,7 @@ def internal_process_pdf_job_page(job_id, page_index):
                 "total_tokens_all": event.get("total_tokens_all"),
                 "updated_at": firestore.SERVER_TIMESTAMP,
             },
-            merge=True,
         )
-        _refresh_pdf_job_counters(job_id)
         return jsonify({'ok': True, 'status': page_status}), 200
     except Exception as e:
         logger.exception("Failed to process PDF job %s page %s", job_id, page_index)
@@ -5824,7 +7556,9 @@ def internal_process_pdf_job_page(job_id, page_index):
             logger.exception("Failed to upload failure result for PDF job %s page %s", job_id, page_index)
             failure_blob_path = None
 
-        page_ref.set(
+        _record_pdf_page_result(
+            job_id,
+            page_index,
             {
                 "status": "failed",
                 "status_code": 500,
@@ -5832,9 +7566,7 @@ def internal_process_pdf_job_page(job_id, page_index):
                 "result_blob_path": failure_blob_path,
                 "updated_at": firestore.SERVER_TIMESTAMP,
             },
-            merge=True,
         )
-        _refresh_pdf_job_counters(job_id)
         return jsonify({'ok': True, 'status': 'failed', 'error': _sanitize_error_message(str(e))}), 200
 
 
@@ -5875,14 +7607,17 @@ def internal_finalize_pdf_job(job_id):
                 result_payload.setdefault("filename", page.get("filename"))
                 successful_outputs.append(result_payload)
 
+        # Reconcile the incrementally maintained counters with the pages themselves
+        successful_pages = sum(1 for page in pages if page.get("status") == "completed")
+        failed_pages = sum(1 for page in pages if page.get("status") == "failed")
         manifest = {
             "job_id": job_id,
             "request_id": job_data.get("request_id"),
             "source_pdf_filename": job_data.get("source_pdf_filename"),
-            "status": "completed_with_errors" if _coerce_int(job_data.get("failed_pages")) else "completed",
+            "status": "completed_with_errors" if failed_pages else "completed",
             "page_count": len(pages),
-            "successful_pages": sum(1 for page in pages if page.get("status") == "completed"),
-            "failed_pages": sum(1 for page in pages if page.get("status") == "failed"),
+            "successful_pages": successful_pages,
+            "failed_pages": failed_pages,
             "created_at": _format_event_timestamp(job_data.get("created_at")),
             "expires_at": _format_event_timestamp(job_data.get("expires_at")),
             "pages": manifest_pages,
@@ -5939,6 +7674,10 @@ def internal_finalize_pdf_job(job_id):
             {
                 "status": final_status,
                 "phase": "completed",
+                "page_count": len(pages),
+                "successful_pages": successful_pages,
+                "failed_pages": failed_pages,
+                "completed_pages": successful_pages + failed_pages,
                 "bundle_blob_path": bundle_blob_path,
                 "xlsx_blob_path": xlsx_blob_path,
                 "manifest_blob_path": manifest_blob_path,
@@ -7005,9 +8744,91 @@ def test_json_order():
     ])
     return json.dumps(test_dict, cls=OrderedJsonEncoder), 200, {'Content-Type': 'application/json'}
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus exposition of per-stage latency histograms and request gauges.
+
+    Every value is for the gunicorn worker that answered the scrape: histograms,
+    throttle counters and model limits live in that process only, and counters
+    restart with the worker. With GUNICORN_WORKERS > 1 a scrape samples one worker;
+    vvgo_worker_info says which, and the instance total is roughly the sample times
+    vvgo_gunicorn_workers.
+    """
+    processor = app.config['processor']
+    throttler = processor.throttler
+    throttle = throttler.get_stats()
+    active_requests = throttle['active']
+    gauges = [
+        "# HELP vvgo_worker_info The gunicorn worker that produced this scrape.",
+        "# TYPE vvgo_worker_info gauge",
+        f'vvgo_worker_info{{pid="{os.getpid()}"}} 1',
+        "# HELP vvgo_gunicorn_workers Worker processes serving this instance.",
+        "# TYPE vvgo_gunicorn_workers gauge",
+        f"vvgo_gunicorn_workers {GUNICORN_WORKERS}",
+        "# HELP vvgo_active_requests Requests currently holding a processing slot.",
+        "# TYPE vvgo_active_requests gauge",
+        f"vvgo_active_requests {active_requests}",
+        "# HELP vvgo_max_concurrent_requests Processing slots available in this worker.",
+        "# TYPE vvgo_max_concurrent_requests gauge",
+        f"vvgo_max_concurrent_requests {throttler.max_concurrent}",
+        "# HELP vvgo_queued_requests Requests waiting in the admission queue.",
+        "# TYPE vvgo_queued_requests gauge",
+        f"vvgo_queued_requests {throttle['queued']}",
+        "# HELP vvgo_max_queued_requests Admission queue capacity.",
+        "# TYPE vvgo_max_queued_requests gauge",
+        f"vvgo_max_queued_requests {throttle['max_queue']}",
+        "# HELP vvgo_throttle_rejections_total Requests answered 429 by the throttler.",
+        "# TYPE vvgo_throttle_rejections_total counter",
+        f'vvgo_throttle_rejections_total{{reason="queue_full"}} {throttle["rejected_queue_full"]}',
+        f'vvgo_throttle_rejections_total{{reason="wait_timeout"}} {throttle["timed_out"]}',
+        "# HELP vvgo_throttle_admitted_total Requests admitted to a processing slot.",
+        "# TYPE vvgo_throttle_admitted_total counter",
+        f'vvgo_throttle_admitted_total{{queued="false"}} {throttle["admitted"] - throttle["admitted_after_wait"]}',
+        f'vvgo_throttle_admitted_total{{queued="true"}} {throttle["admitted_after_wait"]}',
+    ]
+    model_limits = processor.model_limiter.get_stats()
+    if model_limits:
+        gauges += [
+            "# HELP vvgo_model_concurrency_limit Adaptive concurrency limit per Gemini model and billing identity.",
+            "# TYPE vvgo_model_concurrency_limit gauge",
+        ]
+        gauges += [
+            f'vvgo_model_concurrency_limit{{model="{row["model"]}",identity="{row["identity"]}"}} {row["limit"]}'
+            for row in model_limits
+        ]
+        gauges += [
+            "# HELP vvgo_model_in_flight Gemini calls currently in flight.",
+            "# TYPE vvgo_model_in_flight gauge",
+        ]
+        gauges += [
+            f'vvgo_model_in_flight{{model="{row["model"]}",identity="{row["identity"]}"}} {row["in_flight"]}'
+            for row in model_limits
+        ]
+        gauges += [
+            "# HELP vvgo_model_rate_limited_total Gemini calls rejected upstream with 429 / RESOURCE_EXHAUSTED.",
+            "# TYPE vvgo_model_rate_limited_total counter",
+        ]
+        gauges += [
+            f'vvgo_model_rate_limited_total{{model="{row["model"]}",identity="{row["identity"]}"}} {row["rate_limited"]}'
+            for row in model_limits
+        ]
+    body = stage_metrics.REGISTRY.render_prometheus() + "\n".join(gauges) + "\n"
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 503 until the startup warm-up has finished, then 200"""
+    warmup = _warmup_state.get_stats()
+    if not _warmup_state.is_ready:
+        return jsonify({'status': 'warming', 'warmup': warmup}), 503
+    return jsonify({'status': 'ready', 'warmup': warmup}), 200
+
+
 @app.route('/health', methods=['GET', 'OPTIONS'])
 def health_check():
-    """Health check endpoint that reports server status"""
+    """Health check endpoint that reports server status (of the worker that answers, see /metrics)"""
     
     # Handle OPTIONS preflight request for CORS
     if request.method == 'OPTIONS':
@@ -7019,15 +8840,33 @@ def health_check():
         return response
     
     # Get the active request count from the processor
-    active_requests = app.config['processor'].throttler.get_active_count()
-    max_requests = app.config['processor'].throttler.max_concurrent
+    throttle = app.config['processor'].throttler.get_stats()
+    active_requests = throttle['active']
+    max_requests = throttle['max_concurrent']
     
+    collage_pool = app.config['processor'].collage_engine_pool
+    result_cache = app.config['processor'].result_cache
+    ocr_cache = app.config['processor'].ocr_cache
+    llm_cache = app.config['processor'].llm_cache
+
     # Create the response
     response = jsonify({
         'status': 'ok',
+        'worker': {'pid': os.getpid(), 'workers': GUNICORN_WORKERS},
         'active_requests': active_requests,
         'max_concurrent_requests': max_requests,
+        'queued_requests': throttle['queued'],
         'server_load': f"{(active_requests / max_requests) * 100:.1f}%",
+        'throttle': throttle,
+        'collage_engine_pool': collage_pool.get_stats() if collage_pool else None,
+        'result_cache': result_cache.get_stats() if result_cache else None,
+        'ocr_cache': ocr_cache.get_stats() if ocr_cache else None,
+        'llm_cache': llm_cache.get_stats() if llm_cache else None,
+        'llm_handler_pool': app.config['processor'].llm_handler_pool.get_stats(),
+        'prompt_registry': PROMPT_REGISTRY.get_stats(),
+        'image_prep': IMAGE_PREP_POOL.get_stats(),
+        'warmup': _warmup_state.get_stats(),
+        'model_limits': app.config['processor'].model_limiter.get_stats(),
         'api_status': 'available'
     })
     
@@ -8161,7 +10000,7 @@ def list_prompts_api():
         if match is not None:
             _id, data, info = match
             try:
-                payload = _download_user_prompt_bytes(data.get('gcs_path'))
+                compiled = _compiled_user_prompt(_id, data)
             except Exception as e:
                 logger.error(
                     "Failed to fetch user prompt %s from GCS [category=%s]",
@@ -8169,18 +10008,12 @@ def list_prompts_api():
                     _user_prompt_error_category(e),
                 )
                 return jsonify({'status': 'error', 'message': 'Failed to load prompt content.'}), 500
-            try:
-                parsed = yaml.safe_load(payload)
-                parse_error = None
-            except yaml.YAMLError:
-                parsed = None
-                parse_error = 'Prompt content could not be parsed.'
             prompt_details = {
-                'raw_content': payload.decode('utf-8', errors='replace'),
-                'parsed_data': parsed,
+                'raw_content': compiled.raw_content,
+                'parsed_data': compiled.data,
             }
-            if parse_error:
-                prompt_details['parse_error'] = parse_error
+            if compiled.parse_error:
+                prompt_details['parse_error'] = 'Prompt content could not be parsed.'
             if format_type == 'text':
                 return prompt_details['raw_content'], 200, {'Content-Type': 'text/plain'}
             return jsonify({
@@ -8227,11 +10060,12 @@ def list_prompts_api():
         entry = dict(info)
         if view_details:
             try:
-                payload = _download_user_prompt_bytes(data.get('gcs_path'))
-                parsed = yaml.safe_load(payload)
+                compiled = _compiled_user_prompt(prompt_id, data)
+                if compiled.parse_error:
+                    raise ValueError(compiled.parse_error)
                 entry['details'] = {
-                    'raw_content': payload.decode('utf-8', errors='replace'),
-                    'parsed_data': parsed,
+                    'raw_content': compiled.raw_content,
+                    'parsed_data': compiled.data,
                 }
             except Exception:
                 entry['details'] = {
@@ -8284,6 +10118,7 @@ def format_prompts_as_text_table(prompt_list):
         ])
     
     # Generate table
+    from tabulate import tabulate
     table = tabulate(
         table_data, 
         headers=['#', 'Filename', 'Description', 'Version', 'Author', 'Institution'],
@@ -8445,8 +10280,8 @@ def extract_prompt_info(prompt_file):
         dict: Dictionary with name, description, and other info
     """
     try:
-        with open(prompt_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        compiled = PROMPT_REGISTRY.get_file(prompt_file)
+        content = compiled.raw_content
         
         # Initialize info dictionary with defaults
         info = {
@@ -8459,26 +10294,11 @@ def extract_prompt_info(prompt_file):
             'full_path': str(prompt_file.absolute())
         }
         
-        # Try YAML parsing
-        try:
-            data = yaml.safe_load(content)
-            
-            if isinstance(data, dict):
-                # Map YAML fields to info fields
-                field_mapping = {
-                    'prompt_name': 'name',
-                    'prompt_version': 'version',
-                    'prompt_author': 'author',
-                    'prompt_author_institution': 'institution',
-                    'prompt_description': 'description'
-                }
-                
-                for yaml_field, info_field in field_mapping.items():
-                    if yaml_field in data and data[yaml_field]:
-                        info[info_field] = data[yaml_field]
-            
-        except Exception as e:
-            logger.warning(f"YAML parsing failed for info extraction: {e}, using regex")
+        # YAML fields were mapped to info fields when the prompt was compiled
+        if compiled.parse_error is None:
+            info.update(compiled.metadata)
+        else:
+            logger.warning(f"YAML parsing failed for info extraction: {compiled.parse_error}, using regex")
             # Fall back to regex pattern matching for common fields
             patterns = {
                 'name': r'prompt_name:\s*(.*?)(?=\n\w+:|$)',
@@ -8519,20 +10339,17 @@ def extract_prompt_details(prompt_file):
         dict: Dictionary with all parsed content
     """
     try:
-        with open(prompt_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        compiled = PROMPT_REGISTRY.get_file(prompt_file)
+        content = compiled.raw_content
         
         # Initialize details dictionary
         details = {
             'raw_content': content
         }
         
-        # Try YAML parsing with improved error handling
-        try:
-            import yaml
-            
-            # Use safe_load to prevent code execution
-            data = yaml.safe_load(content)
+        # The YAML was parsed once when the prompt was compiled
+        if compiled.parse_error is None:
+            data = compiled.data
             
             if isinstance(data, dict):
                 # Store the parsed data directly
@@ -8541,9 +10358,9 @@ def extract_prompt_details(prompt_file):
                 logger.warning(f"YAML parsing produced non-dictionary: {type(data)}")
                 details['parsed_data'] = {"content": data}  # Wrap non-dict data
                 
-        except Exception as e:
-            logger.warning(f"YAML parsing failed for {prompt_file}: {e}")
-            details['parse_error'] = str(e)
+        else:
+            logger.warning(f"YAML parsing failed for {prompt_file}: {compiled.parse_error}")
+            details['parse_error'] = compiled.parse_error
             
             # Attempt a line-by-line parsing approach for common YAML formats
             try:
@@ -8782,6 +10599,14 @@ def create_api_key():
             'active': True,
             'description': data.get('description', '')
         }
+
+        # Optional default response projection for requests made with this key
+        response_fields = _parse_field_list(data.get('response_fields'))
+        response_exclude = _parse_field_list(data.get('response_exclude'))
+        if response_fields:
+            key_data['response_fields'] = response_fields
+        if response_exclude:
+            key_data['response_exclude'] = response_exclude
         
         # Save to Firestore using the API key as the document ID
         db.collection('api_keys').document(api_key).set(key_data)
@@ -9236,6 +11061,7 @@ def upload_user_prompt():
         )
         _delete_user_prompt_blob(blob_path)
         return jsonify({'error': 'Failed to persist prompt record.'}), 500
+    PROMPT_REGISTRY.invalidate(safe_filename)
 
     logger.info(
         "user_prompt uploaded filename=%s owner=%s gcs=%s status=%s size=%d",
@@ -9298,6 +11124,7 @@ def update_user_prompt_status(prompt_id: str):
         'status': new_status,
         'updated_at': firestore.SERVER_TIMESTAMP,
     })
+    PROMPT_REGISTRY.invalidate(prompt_id)
     logger.info(
         "user_prompt status changed prompt_id=%s by=%s new_status=%s",
         prompt_id, caller_email, new_status,
@@ -9341,6 +11168,7 @@ def delete_user_prompt(prompt_id: str):
         'updated_at': firestore.SERVER_TIMESTAMP,
         'deleted_by': caller_email,
     })
+    PROMPT_REGISTRY.invalidate(prompt_id)
     logger.info(
         "user_prompt deleted prompt_id=%s by=%s gcs=%s",
         prompt_id, caller_email, gcs_path,
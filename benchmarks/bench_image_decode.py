@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark the ingest resize on large specimen scans: full decode vs draft decode.
+
+For every image in the corpus it times, in this process:
+
+- full:  the previous path, a full-resolution decode, LANCZOS down to
+         --max-pixels, then a quality-95 JPEG encode
+- draft: image_prep.resize_for_upload, where the decoder reduces the image first
+         (JPEG DCT scaling, HEIC thumbnails via pillow_heif's draft when
+         available) and the LANCZOS pass starts near the target size
+
+It reports the median time of each path per image, the speed-up, and the PSNR
+of the draft output against the full output, so any quality cost is visible.
+TIFF has no reduced decode and shows what the reducing_gap resize alone buys.
+
+Without --corpus, synthetic scans of --synthetic-mp megapixels are written as
+JPEG and TIFF (and HEIC when pillow_heif can encode) to a temp directory.
+
+Usage:
+    python benchmarks/bench_image_decode.py --corpus /data/specimens --runs 3
+    python benchmarks/bench_image_decode.py --synthetic-mp 50,100
+"""
+import argparse
+import io
+import math
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageChops, ImageStat
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+import image_prep  # noqa: E402
+
+EXTENSIONS = (".jpg", ".jpeg", ".tif", ".tiff", ".heic", ".heif")
+
+
+def full_decode_resize(data, filename, max_pixels):
+    image = Image.open(io.BytesIO(data))
+    size = image_prep.fit_to_max_pixels(image, max_pixels)
+    image.load()
+    if size != image.size:
+        image = image.resize(size, Image.Resampling.LANCZOS)
+    out = io.BytesIO()
+    image_prep.flatten_to_rgb(image).save(out, format="JPEG", quality=95, optimize=True)
+    return out.getvalue()
+
+
+def draft_decode_resize(data, filename, max_pixels):
+    payload, _ = image_prep.resize_for_upload(data, filename, max_pixels)
+    return payload
+
+
+def psnr(a_bytes, b_bytes):
+    with Image.open(io.BytesIO(a_bytes)) as a, Image.open(io.BytesIO(b_bytes)) as b:
+        a, b = a.convert("RGB"), b.convert("RGB")
+        if a.size != b.size:
+            b = b.resize(a.size, Image.Resampling.LANCZOS)
+        mse = statistics.mean(v / (a.width * a.height) for v in
+                              ImageStat.Stat(ImageChops.difference(a, b)).sum2)
+    return float("inf") if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+
+def synthetic_corpus(directory, megapixels):
+    """Smooth, paper-like scans (noise upsampled) in each available format."""
+    formats = [("JPEG", ".jpg", {"quality": 92}), ("TIFF", ".tif", {"compression": "tiff_lzw"})]
+    try:
+        from pillow_heif import register_heif_opener
+        register_heif_opener()
+        formats.append(("HEIF", ".heic", {"quality": 90}))
+    except ImportError:
+        print("pillow_heif not installed: no HEIC samples")
+    paths = []
+    for mp in megapixels:
+        height = int(math.sqrt(mp * 1_000_000 * 4 / 3))
+        width = int(height * 3 / 4)
+        base = Image.effect_noise((width // 16, height // 16), 48).convert("RGB")
+        image = base.resize((width, height), Image.Resampling.BICUBIC)
+        for fmt, ext, kwargs in formats:
+            path = os.path.join(directory, f"synthetic_{mp:g}mp{ext}")
+            try:
+                image.save(path, format=fmt, **kwargs)
+                paths.append(path)
+            except (KeyError, OSError) as e:
+                print(f"Skipping {fmt}: {e}")
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of large JPEG/TIFF/HEIC scans")
+    parser.add_argument("--synthetic-mp", default="50", help="Comma-separated megapixels for synthetic scans")
+    parser.add_argument("--max-pixels", type=int, default=5_200_000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    temp_dir = None
+    if args.corpus:
+        paths = sorted(os.path.join(args.corpus, name) for name in os.listdir(args.corpus)
+                       if name.lower().endswith(EXTENSIONS))
+    else:
+        temp_dir = tempfile.mkdtemp()
+        paths = synthetic_corpus(temp_dir, [float(mp) for mp in args.synthetic_mp.split(",")])
+    try:
+        print(f"{'image':<40}{'MP':>7}{'full ms':>10}{'draft ms':>10}{'speed-up':>10}{'PSNR dB':>9}")
+        speedups = []
+        for path in paths:
+            with open(path, "rb") as f:
+                data = f.read()
+            name = os.path.basename(path)
+            with Image.open(io.BytesIO(data)) as image:
+                megapixels = image.width * image.height / 1e6
+            timings = {}
+            outputs = {}
+            for label, fn in (("full", full_decode_resize), ("draft", draft_decode_resize)):
+                samples = []
+                for _ in range(max(1, args.runs)):
+                    started = time.perf_counter()
+                    outputs[label] = fn(data, name, args.max_pixels)
+                    samples.append((time.perf_counter() - started) * 1000.0)
+                timings[label] = statistics.median(samples)
+            speedup = timings["full"] / timings["draft"] if timings["draft"] else float("inf")
+            speedups.append(speedup)
+            print(f"{name[:39]:<40}{megapixels:>7.1f}{timings['full']:>10.0f}{timings['draft']:>10.0f}"
+                  f"{speedup:>9.2f}x{psnr(outputs['full'], outputs['draft']):>9.1f}")
+        if speedups:
+            print(f"\nMedian speed-up over {len(speedups)} image(s): {statistics.median(speedups):.2f}x")
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Benchmark the image hand-off in VoucherVisionProcessor.process_image_request.
+
+Compares the legacy temp-file pipeline (save upload -> read back -> base64 ->
+collage base64 -> decode -> write collage file -> OCR reopens it) against the
+in-memory pipeline (bytes held once, streams handed to the engines, base64 only
+when the response is built).
+
+CollageEngine and the Gemini OCR call are replaced by stand-ins that do the same
+image I/O the real engines do (decode, re-encode, base64) without the model or
+network work, so the numbers isolate the hand-off overhead.
+
+Each mode runs in its own subprocess so peak RSS is not shared between them.
+On Cloud Run /tmp is RAM-backed, so bytes written to temp files are reported
+separately: they count against instance memory even though RSS does not show them.
+
+Usage:
+    python benchmarks/bench_image_pipeline.py --image demo/images/MICH_16205594_Poaceae_Jouvea_pilosa_full.jpg
+    python benchmarks/bench_image_pipeline.py --synthetic-mp 5.2 --iterations 20
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+
+def _collage_stand_in(image):
+    """Mimic CollageEngine.run_fake: open the image, return a base64 JPEG collage."""
+    with Image.open(image) as img:
+        buf = io.BytesIO()
+        img.convert("RGB").save(buf, format="JPEG", quality=95)
+    return {"base64image_text_collage": base64.b64encode(buf.getvalue()).decode("utf-8")}
+
+
+def _ocr_stand_in(image):
+    """Mimic OCRGeminiProVision.ocr_gemini: open the image and serialize it for the request."""
+    with Image.open(image) as img:
+        img.load()
+    if hasattr(image, "read"):
+        image.seek(0)
+        payload = image.read()
+    else:
+        with open(image, "rb") as f:
+            payload = f.read()
+    return len(payload)
+
+
+def run_legacy(image_bytes, filename):
+    temp_written = 0
+    temp_dir = tempfile.mkdtemp()
+    try:
+        original_path = os.path.join(temp_dir, f"original_{filename}")
+        with open(original_path, "wb") as f:
+            f.write(image_bytes)
+        temp_written += len(image_bytes)
+        with open(original_path, "rb") as f:
+            base64image_input_resized = base64.b64encode(f.read()).decode("utf-8")
+        collage = _collage_stand_in(original_path)
+        collage["base64image_input_resized"] = base64image_input_resized
+        collage_bytes = base64.b64decode(collage["base64image_text_collage"])
+        collage_path = os.path.join(temp_dir, f"collage_{filename}")
+        with open(collage_path, "wb") as f:
+            f.write(collage_bytes)
+        temp_written += len(collage_bytes)
+        _ocr_stand_in(collage_path)
+        json.dumps(collage)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return temp_written
+
+
+def run_in_memory(image_bytes, filename):
+    stream = io.BytesIO(image_bytes)
+    stream.name = filename
+    collage = _collage_stand_in(stream)
+    collage_bytes = base64.b64decode(collage["base64image_text_collage"])
+    collage_stream = io.BytesIO(collage_bytes)
+    collage_stream.name = "collage.jpg"
+    _ocr_stand_in(collage_stream)
+    collage["base64image_input_resized"] = base64.b64encode(image_bytes).decode("utf-8")
+    json.dumps(collage)
+    return 0
+
+
+def _load_image_bytes(args):
+    if args.image:
+        with open(args.image, "rb") as f:
+            return f.read(), os.path.basename(args.image)
+    side = int((args.synthetic_mp * 1_000_000) ** 0.5)
+    img = Image.effect_noise((side, side), 64).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=95)
+    return buf.getvalue(), "synthetic.jpg"
+
+
+def _child(args):
+    image_bytes, filename = _load_image_bytes(args)
+    fn = run_legacy if args.mode == "legacy" else run_in_memory
+    fn(image_bytes, filename)  # warm-up
+    latencies = []
+    temp_written = 0
+    for _ in range(args.iterations):
+        t0 = time.perf_counter()
+        temp_written = fn(image_bytes, filename)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "mode": args.mode,
+        "image_bytes": len(image_bytes),
+        "iterations": args.iterations,
+        "latency_ms_p50": round(statistics.median(latencies), 2),
+        "latency_ms_max": round(max(latencies), 2),
+        "peak_rss_mb": round(peak_rss_kb / 1024.0, 1),
+        "tmpfs_bytes_per_request": temp_written,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="Path to a specimen image (default: synthetic noise JPEG)")
+    parser.add_argument("--synthetic-mp", type=float, default=5.2, help="Megapixels for the synthetic image")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--mode", choices=["legacy", "in_memory"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        _child(args)
+        return
+
+    rows = []
+    for mode in ("legacy", "in_memory"):
+        cmd = [sys.executable, __file__, "--mode", mode, "--iterations", str(args.iterations),
+               "--synthetic-mp", str(args.synthetic_mp)]
+        if args.image:
+            cmd += ["--image", args.image]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        rows.append(json.loads(out.strip().splitlines()[-1]))
+
+    print(f"{'mode':<10} {'p50 ms':>9} {'max ms':>9} {'peak RSS MB':>12} {'tmpfs bytes/req':>16}")
+    for row in rows:
+        print(f"{row['mode']:<10} {row['latency_ms_p50']:>9} {row['latency_ms_max']:>9} "
+              f"{row['peak_rss_mb']:>12} {row['tmpfs_bytes_per_request']:>16}")
+
+
+if __name__ == "__main__":
+    main()
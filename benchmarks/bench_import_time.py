@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Import-time budget for the service's cold start.
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter (the same
+work a new Cloud Run instance does before it can answer a request) and reports:
+
+- the cumulative import time of the module and the wall time of the process
+- the packages that contribute the most self time (summed per top-level package)
+- the slowest individual imports by cumulative time
+
+It fails (exit status 1) when the median cumulative import time over --runs
+exceeds --budget-ms, or when any of the --lazy modules was imported eagerly,
+so a regression in cold start shows up in CI instead of in production.
+
+The startup warm-up thread is disabled for the measurement (WARMUP_ENABLED=false)
+so only import and module-level initialisation are timed.
+
+Usage:
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --budget-ms 6000 --runs 5 --top 15
+    python benchmarks/bench_import_time.py --module result_cache --lazy ""
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+# Dependencies app.py must only import on first use
+DEFAULT_LAZY = "fitz,rasterio,openpyxl,pandas,tabulate,smtplib"
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def parse_importtime(stderr):
+    """[(module, depth, self_us, cumulative_us)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, (len(indent) - 1) // 2, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(module, env):
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000.0
+    rows = parse_importtime(proc.stderr)
+    if proc.returncode != 0:
+        tail = "\n".join(proc.stderr.splitlines()[-15:])
+        raise SystemExit(f"import {module} failed (exit {proc.returncode}):\n{tail}")
+    total_us = next((cum for name, depth, _, cum in rows if name == module and depth == 0), 0)
+    return rows, total_us / 1000.0, wall_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app", help="Module to import (default: app)")
+    parser.add_argument("--budget-ms", type=float, default=8000.0, help="Fail above this median import time")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--lazy", default=DEFAULT_LAZY,
+                        help="Comma-separated modules that must not be imported (empty to skip)")
+    args = parser.parse_args()
+
+    env = dict(os.environ, WARMUP_ENABLED="false", PYTHONDONTWRITEBYTECODE="1")
+    totals, walls = [], []
+    for _ in range(max(1, args.runs)):
+        rows, total_ms, wall_ms = measure(args.module, env)
+        totals.append(total_ms)
+        walls.append(wall_ms)
+
+    by_package = defaultdict(int)
+    for name, _, self_us, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    imported = {name for name, _, _, _ in rows}
+
+    print(f"import {args.module}: median {statistics.median(totals):.0f} ms "
+          f"(runs: {', '.join(f'{t:.0f}' for t in totals)}), process wall median {statistics.median(walls):.0f} ms")
+    print(f"\nTop {args.top} packages by self time (last run):")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {self_us / 1000.0:>9.1f} ms  {package}")
+    print(f"\nTop {args.top} imports by cumulative time (last run):")
+    for name, depth, _, cumulative_us in sorted(rows, key=lambda row: -row[3])[:args.top]:
+        print(f"  {cumulative_us / 1000.0:>9.1f} ms  {'  ' * depth}{name}")
+
+    failures = []
+    eager = [name for name in (m.strip() for m in args.lazy.split(",")) if name and name in imported]
+    if eager:
+        failures.append(f"imported eagerly (should be lazy): {', '.join(eager)}")
+    if statistics.median(totals) > args.budget_ms:
+        failures.append(f"median import time {statistics.median(totals):.0f} ms exceeds budget {args.budget_ms:.0f} ms")
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        return 1
+    print(f"\nOK: within {args.budget_ms:.0f} ms budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
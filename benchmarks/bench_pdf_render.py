@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+CPU per PDF page: render at 150 dpi then resize, vs render at the pixel budget.
+
+- before: each page is rendered at --dpi and JPEG-encoded, then (like an upload)
+          decoded again, LANCZOS-resized to --max-pixels when over budget and
+          re-encoded at quality 95
+- after:  image_prep.render_pdf_pages with max_pixels, which scales the fitz
+          matrix per page so large pages come out at the budget in one pass
+
+CPU time (time.process_time) is reported per page, with the output size of the
+first page. Small pages (Letter / A4 at 150 dpi are about 2 MP) are rendered the
+same way by both paths; the difference shows on large ledger and map sheets.
+
+Without --pdf, a synthetic document is generated with PyMuPDF: with --kind
+ledger, --pages pages of ruled text around an embedded photograph (rasterized by
+both paths); with --kind scan, pages that are each one full-page 300 dpi JPEG,
+which the after path takes from the PDF without rasterizing.
+
+Measured on 1 vCPU with PyMuPDF 1.28.2, 10 synthetic pages, --runs 3, 150 dpi,
+5.2 MP budget (CPU ms/page, before -> after):
+
+    ledger A1       2392 -> 464   (rendered at the budget, 5.2 MP)
+    ledger Letter    191 -> 201   (2.1 MP, same render; within noise)
+    scan A3 300dpi   879 -> 685   (embedded JPEG reduced to 4.4 MP)
+    scan Letter      410 -> 59    (embedded JPEG reduced to 2.1 MP)
+
+No real ledger volume has been measured yet; run --pdf on one before relying on
+these numbers for scanned ledgers.
+
+Usage:
+    python benchmarks/bench_pdf_render.py --pdf ledgers/volume_12.pdf
+    python benchmarks/bench_pdf_render.py --pages 20 --page-size a1 --runs 3
+    python benchmarks/bench_pdf_render.py --kind scan --page-size letter --pages 50
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+import image_prep  # noqa: E402
+
+
+def synthetic_ledger(pages, page_size):
+    import fitz  # PyMuPDF
+
+    scan = io.BytesIO()
+    base = Image.effect_noise((300, 200), 40).convert("RGB").resize((3000, 2000), Image.Resampling.BICUBIC)
+    base.save(scan, format="JPEG", quality=90)
+    doc = fitz.open()
+    for number in range(pages):
+        width, height = fitz.paper_size(page_size)
+        page = doc.new_page(width=width, height=height)
+        page.insert_image(fitz.Rect(width * 0.1, height * 0.05, width * 0.9, height * 0.45), stream=scan.getvalue())
+        y = height * 0.5
+        while y < height * 0.95:
+            page.draw_line((width * 0.05, y), (width * 0.95, y), color=(0.6, 0.6, 0.8))
+            page.insert_text((width * 0.06, y - 4), f"No. {number}-{int(y)}  Quercus alba L.  coll. 1893",
+                             fontsize=14, fontname="tiro")
+            y += 28
+    return doc.tobytes()
+
+
+def synthetic_scans(pages, page_size):
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    width, height = fitz.paper_size(page_size)
+    pixels = (int(width / 72 * 300), int(height / 72 * 300))
+    for _ in range(pages):
+        scan = io.BytesIO()
+        base = Image.effect_noise((pixels[0] // 16, pixels[1] // 16), 40).convert("RGB")
+        base.resize(pixels, Image.Resampling.BICUBIC).save(scan, format="JPEG", quality=90)
+        page = doc.new_page(width=width, height=height)
+        page.insert_image(page.rect, stream=scan.getvalue())
+    return doc.tobytes()
+
+
+def before(pdf_bytes, dpi, max_pixels):
+    payload, sizes = image_prep.render_pdf_pages(pdf_bytes, dpi)
+    pages = []
+    for index, page in enumerate(image_prep.split_payload(payload, sizes)):
+        name = f"page_{index + 1:04d}.jpg"
+        if image_prep.needs_resize(page, name, max_pixels):
+            page, _ = image_prep.resize_for_upload(page, name, max_pixels)
+        pages.append(page)
+    return pages
+
+
+def after(pdf_bytes, dpi, max_pixels):
+    payload, sizes = image_prep.render_pdf_pages(pdf_bytes, dpi, max_pixels=max_pixels)
+    return image_prep.split_payload(payload, sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF to render (default: a synthetic ledger)")
+    parser.add_argument("--kind", choices=("ledger", "scan"), default="ledger", help="Synthetic document type")
+    parser.add_argument("--pages", type=int, default=10, help="Synthetic document pages")
+    parser.add_argument("--page-size", default="a1", help="Synthetic paper size (fitz.paper_size name)")
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("--max-pixels", type=int, default=5_200_000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            pdf_bytes = f.read()
+    else:
+        build = synthetic_ledger if args.kind == "ledger" else synthetic_scans
+        pdf_bytes = build(args.pages, args.page_size)
+    page_count = image_prep.pdf_page_count(pdf_bytes)
+
+    results = {}
+    for label, fn in (("before", before), ("after", after)):
+        samples = []
+        for _ in range(max(1, args.runs)):
+            started = time.process_time()
+            pages = fn(pdf_bytes, args.dpi, args.max_pixels)
+            samples.append((time.process_time() - started) * 1000.0 / page_count)
+        with Image.open(io.BytesIO(pages[0])) as first:
+            size = first.size
+        results[label] = (statistics.median(samples), size, sum(len(p) for p in pages) / page_count)
+
+    print(f"{page_count} page(s), {args.dpi} dpi, budget {args.max_pixels / 1e6:.1f} MP")
+    print(f"{'path':<8}{'CPU ms/page':>13}{'page 1 size':>14}{'MP':>6}{'KB/page':>9}")
+    for label, (cpu_ms, (width, height), avg_bytes) in results.items():
+        print(f"{label:<8}{cpu_ms:>13.0f}{f'{width}x{height}':>14}{width * height / 1e6:>6.1f}{avg_bytes / 1024:>9.0f}")
+    print(f"\nCPU per page: {results['before'][0] / results['after'][0]:.2f}x less with budget rendering")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
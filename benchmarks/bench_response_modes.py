@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark the /process response encodings: JSON with base64 images vs the
+multipart mode (Accept: multipart/form-data) with raw JPEG parts.
+
+For each mode it measures:
+- payload bytes on the wire
+- server-side build time (base64-encode the input / decode the collage, serialize)
+- client-side parse time (json.loads + base64 decode vs multipart decode)
+- end-to-end time = build + transfer at --bandwidth-mbps + parse
+
+The response body is a representative VoucherVision result (OCR text, parsed
+JSON, token/cost info) around the two images, so the numbers isolate the image
+transport. The multipart layout mirrors app.build_multipart_body and the
+client-side parse mirrors client.py (requests_toolbelt when installed,
+otherwise a direct split on the boundary).
+
+Usage:
+    python benchmarks/bench_response_modes.py --image demo/images/MICH_16205594_Poaceae_Jouvea_pilosa_full.jpg
+    python benchmarks/bench_response_modes.py --synthetic-mp 5.2 --bandwidth-mbps 20
+"""
+import argparse
+import base64
+import io
+import json
+import statistics
+import time
+import uuid
+from collections import OrderedDict
+
+from PIL import Image
+
+
+def _load_images(args):
+    if args.image:
+        with open(args.image, "rb") as f:
+            image_bytes = f.read()
+    else:
+        side = int((args.synthetic_mp * 1_000_000) ** 0.5)
+        img = Image.effect_noise((side, side), 64).convert("RGB")
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=95)
+        image_bytes = buf.getvalue()
+    # Collage stand-in: the label crops are a fraction of the sheet
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img = img.convert("RGB")
+        img.thumbnail((img.width // 2, img.height // 2))
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=95)
+    return image_bytes, buf.getvalue()
+
+
+def _result_body():
+    return OrderedDict([
+        ("filename", "specimen.jpg"),
+        ("url_source", ""),
+        ("prompt", "SLTPvM_default.yaml"),
+        ("ocr_info", {"gemini-2.5-flash": {"tokens_in": 1800, "tokens_out": 420, "total_cost": 0.0011}}),
+        ("WFO_info", ""),
+        ("COP90_elevation_m", 1432),
+        ("ocr", "PLANTS OF MEXICO  Jouvea pilosa (J. Presl) Scribn.  Coastal dunes ... " * 8),
+        ("formatted_json", OrderedDict((f"field_{i}", f"value {i}") for i in range(40))),
+        ("parsing_info", {"model": "gemini-2.5-flash", "input": 2400, "output": 650}),
+    ])
+
+
+def build_json(image_bytes, collage_b64):
+    results = _result_body()
+    results["collage_info"] = OrderedDict([
+        ("base64image_text_collage", collage_b64),
+        ("base64image_input_resized", base64.b64encode(image_bytes).decode("utf-8")),
+    ])
+    return json.dumps(results).encode("utf-8"), "application/json"
+
+
+def parse_json(payload, content_type):
+    results = json.loads(payload)
+    info = results["collage_info"]
+    return base64.b64decode(info["base64image_text_collage"]), base64.b64decode(info["base64image_input_resized"])
+
+
+def build_multipart(image_bytes, collage_b64):
+    results = _result_body()
+    results["collage_info"] = {"image_parts": {"base64image_text_collage": "image",
+                                               "base64image_input_resized": "input_image"}}
+    boundary = f"boundary--{uuid.uuid4()}"
+    delimiter = f"--{boundary}\r\n".encode("utf-8")
+    body = [delimiter, b'Content-Disposition: form-data; name="json_data"\r\n',
+            b"Content-Type: application/json\r\n\r\n", json.dumps(results).encode("utf-8"), b"\r\n"]
+    for name, filename, part in (("image", "collage.jpg", base64.b64decode(collage_b64)),
+                                 ("input_image", "input_resized.jpg", image_bytes)):
+        body += [delimiter,
+                 f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'.encode("utf-8"),
+                 b"Content-Type: image/jpeg\r\n\r\n", part, b"\r\n"]
+    body.append(f"--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(body), f"multipart/form-data; boundary={boundary}"
+
+
+def parse_multipart(payload, content_type):
+    try:
+        from requests_toolbelt.multipart import decoder
+    except ImportError:
+        decoder = None
+    if decoder is not None:
+        parts = {}
+        for part in decoder.MultipartDecoder(payload, content_type).parts:
+            disposition = part.headers.get(b"Content-Disposition", b"").decode()
+            name = disposition.split('name="', 1)[1].split('"', 1)[0]
+            parts[name] = part.content
+    else:
+        boundary = content_type.split("boundary=", 1)[1].encode("utf-8")
+        parts = {}
+        for chunk in payload.split(b"--" + boundary)[1:-1]:
+            headers, _, content = chunk.partition(b"\r\n\r\n")
+            name = headers.split(b'name="', 1)[1].split(b'"', 1)[0].decode()
+            parts[name] = content[:-2]  # trailing CRLF before the next delimiter
+    json.loads(parts["json_data"])
+    return parts["image"], parts["input_image"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="Path to a specimen image (default: synthetic noise JPEG)")
+    parser.add_argument("--synthetic-mp", type=float, default=5.2, help="Megapixels for the synthetic image")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--bandwidth-mbps", type=float, default=50.0, help="Link speed used for transfer time")
+    args = parser.parse_args()
+
+    image_bytes, collage_bytes = _load_images(args)
+    # The collage engine hands the server base64 in both modes
+    collage_b64 = base64.b64encode(collage_bytes).decode("utf-8")
+
+    print(f"input {len(image_bytes)} bytes, collage {len(collage_bytes)} bytes, "
+          f"{args.bandwidth_mbps} Mbit/s, {args.iterations} iterations")
+    print(f"{'mode':<10} {'payload MB':>11} {'build ms':>9} {'parse ms':>9} {'transfer ms':>12} {'end-to-end ms':>14}")
+    for mode, build, parse in (("json", build_json, parse_json), ("multipart", build_multipart, parse_multipart)):
+        build_ms, parse_ms = [], []
+        for _ in range(args.iterations):
+            t0 = time.perf_counter()
+            payload, content_type = build(image_bytes, collage_b64)
+            t1 = time.perf_counter()
+            collage_out, input_out = parse(payload, content_type)
+            t2 = time.perf_counter()
+            assert collage_out == collage_bytes and input_out == image_bytes
+            build_ms.append((t1 - t0) * 1000.0)
+            parse_ms.append((t2 - t1) * 1000.0)
+        transfer_ms = len(payload) * 8 / (args.bandwidth_mbps * 1_000_000) * 1000.0
+        build_p50, parse_p50 = statistics.median(build_ms), statistics.median(parse_ms)
+        print(f"{mode:<10} {len(payload) / 1e6:>11.2f} {build_p50:>9.1f} {parse_p50:>9.1f} "
+              f"{transfer_ms:>12.1f} {build_p50 + transfer_ms + parse_p50:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Throughput of a running deployment in images/min, to compare serving modes.
+
+Posts specimen images to /process from --concurrency client threads for
+--duration seconds against each --target and reports, per target:
+
+- completed images/min (200 responses only) and the error / 429 counts
+- client-side latency p50 / p95 / max
+
+The comparison this was written for is the single-process server (one gunicorn
+worker, 8 threads: the CPU-bound stages share one GIL) against the preloaded
+multi-worker mode (GUNICORN_WORKERS, see gunicorn.conf.py) on the same 4-vCPU
+Cloud Run shape. Deploy two revisions of the same image with tagged URLs:
+
+    gcloud run deploy vouchervision-go --image IMAGE --cpu 4 --memory 8Gi \\
+        --tag threads --no-traffic --set-env-vars GUNICORN_WORKERS=1,GUNICORN_THREADS=8
+    gcloud run deploy vouchervision-go --image IMAGE --cpu 4 --memory 8Gi \\
+        --tag workers --no-traffic --set-env-vars GUNICORN_WORKERS=4,GUNICORN_THREADS=4,GUNICORN_PRELOAD=true
+
+and pin --max-instances 1 on both so one instance takes the whole load. Wait for
+/ready, then run with the same images and concurrency against both tags. Run
+each target twice and keep the second run (the first pays per-worker warm-up).
+Use the same --form options for both; skip_label_collage=false keeps the OpenVINO
+stage, which is where the extra workers pay off. Compare memory with the Cloud
+Run instance memory metric: the prompts and WFO caches are shared copy-on-write, but
+each worker loads its own CollageEngine pool (COLLAGE_ENGINE_POOL_SIZE is split
+between the workers by default).
+
+No results have been recorded for this comparison yet. Whether the multi-worker
+mode is worth enabling is still an open question until it has been run on the
+target instance shape.
+
+Usage:
+    python benchmarks/bench_serving_modes.py --api-key KEY --images demo/images \\
+        --target threads=https://threads---vouchervision-go-xxxx.a.run.app \\
+        --target workers=https://workers---vouchervision-go-xxxx.a.run.app
+    python benchmarks/bench_serving_modes.py --target local=http://localhost:8080 \\
+        --images demo/images --concurrency 16 --duration 120 --form ocr_only=true
+"""
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff")
+
+
+def _load_images(path):
+    if os.path.isfile(path):
+        paths = [path]
+    else:
+        paths = sorted(os.path.join(path, name) for name in os.listdir(path)
+                       if name.lower().endswith(IMAGE_EXTENSIONS))
+    if not paths:
+        raise SystemExit(f"No images found at {path}")
+    images = []
+    for image_path in paths:
+        with open(image_path, "rb") as f:
+            images.append((os.path.basename(image_path), f.read()))
+    return images
+
+
+def _parse_pairs(values, flag):
+    pairs = []
+    for value in values:
+        key, sep, rest = value.partition("=")
+        if not sep or not key:
+            raise SystemExit(f"{flag} expects key=value, got {value!r}")
+        pairs.append((key, rest))
+    return pairs
+
+
+def run_target(url, images, args, form, headers):
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    next_image = itertools.cycle(images).__next__
+    deadline = time.monotonic() + args.duration
+
+    def client():
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            with lock:
+                name, data = next_image()
+            started = time.monotonic()
+            try:
+                response = session.post(f"{url.rstrip('/')}/process", headers=headers, data=form,
+                                        files={"file": (name, data)}, timeout=args.timeout)
+                status = response.status_code
+            except requests.RequestException as e:
+                status = e.__class__.__name__
+            elapsed = time.monotonic() - started
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for _ in range(args.concurrency):
+            pool.submit(client)
+    wall = time.monotonic() - started
+    return latencies, statuses, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", required=True, help="label=base URL (repeatable)")
+    parser.add_argument("--images", required=True, help="Image file or directory of images")
+    parser.add_argument("--api-key", default=os.environ.get("VOUCHERVISION_API_KEY"),
+                        help="Sent as X-API-Key (default: $VOUCHERVISION_API_KEY)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of load per target")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--form", action="append", default=[], help="Extra /process form field key=value")
+    args = parser.parse_args()
+
+    images = _load_images(args.images)
+    form = _parse_pairs(args.form, "--form")
+    headers = {"X-API-Key": args.api_key} if args.api_key else {}
+
+    print(f"{len(images)} image(s), concurrency {args.concurrency}, {args.duration:.0f}s per target")
+    print(f"{'target':<16}{'images/min':>12}{'ok':>7}{'429':>6}{'errors':>8}{'p50 s':>8}{'p95 s':>8}{'max s':>8}")
+    for label, url in _parse_pairs(args.target, "--target"):
+        latencies, statuses, wall = run_target(url, images, args, form, headers)
+        ok = len(latencies)
+        throttled = statuses.get(429, 0)
+        errors = sum(statuses.values()) - ok - throttled
+        ordered = sorted(latencies)
+        p50 = statistics.median(ordered) if ordered else 0.0
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] if ordered else 0.0
+        print(f"{label:<16}{ok * 60.0 / wall:>12.1f}{ok:>7}{throttled:>6}{errors:>8}"
+              f"{p50:>8.2f}{p95:>8.2f}{(ordered[-1] if ordered else 0.0):>8.2f}")
+        other = {status: count for status, count in statuses.items() if status not in (200, 429)}
+        if other:
+            print(f"{'':<16}other statuses: {other}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
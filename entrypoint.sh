@@ -2,5 +2,5 @@
 
 echo "Starting VoucherVision GO service..."
 
-# Start Gunicorn server
-exec gunicorn --bind :$PORT --workers 1 --threads 8 --timeout 0 app:app
+# Start Gunicorn server (GUNICORN_PRELOAD=true preloads the app, see gunicorn.conf.py)
+exec gunicorn --config gunicorn.conf.py --bind :$PORT --workers "${GUNICORN_WORKERS:-1}" --threads "${GUNICORN_THREADS:-8}" --timeout 0 app:app
@@ -5,8 +5,12 @@ import os
 bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
 
 # Worker configuration - adjust based on your needs
-# workers = int(os.environ.get('GUNICORN_WORKERS', 2))
-workers = 1
+# One worker (the default) keeps the original threaded setup. With more workers the
+# CPU-bound stages (collage detection, image prep, PDF rendering) run in parallel
+# instead of sharing one GIL; pair GUNICORN_WORKERS with the instance's vCPUs.
+workers = max(1, int(os.environ.get('GUNICORN_WORKERS', 1)))
+# app.py splits the instance-wide limits by this count
+os.environ['GUNICORN_WORKERS'] = str(workers)
 # worker_class = "gthread"
 worker_class = "sync"
 worker_connections = 1000
@@ -24,11 +28,40 @@ accesslog = '-'  # Log to stdout
 errorlog = '-'   # Log to stderr
 access_log_format = '%(h)s "%(r)s" %(s)s %(b)s %(D)sμs'
 
-# Preload the application
-preload_app = False
+# GUNICORN_PRELOAD=true preloads the application in the master when running several
+# workers, so the WFO hierarchy cache and compiled prompts are loaded once and shared
+# copy-on-write instead of once per worker (app.reinitialize_after_fork rebuilds what
+# does not survive fork). It stays off by default until benchmarks/bench_serving_modes.py
+# has been run against both modes on the target instance shape. The OpenVINO CollageEngines are not fork-safe and are built in each
+# worker, COLLAGE_ENGINE_POOL_SIZE per worker.
+#
+# Each worker is its own process: the throttle slots, model limits and metrics
+# are per worker. app.py divides THROTTLE_MAX_CONCURRENT, THROTTLE_MAX_QUEUE and
+# MODEL_LIMIT_* by GUNICORN_WORKERS, and /metrics and /health report the worker
+# that answered.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false').lower() == 'true'
+os.environ['GUNICORN_PRELOAD'] = 'true' if preload_app else 'false'
+if preload_app:
+    # Must be set before grpc is first imported (by the app, in the master)
+    os.environ.setdefault('GRPC_ENABLE_FORK_SUPPORT', 'true')
+    os.environ.setdefault('GRPC_POLL_STRATEGY', 'poll')
 
 # Process naming
 proc_name = 'vouchervision-api'
 
 # For Cloud Run, ensure proper signal handling
-worker_tmp_dir = '/dev/shm'  # Use shared memory for worker heartbeat
\ No newline at end of file
+worker_tmp_dir = '/dev/shm'  # Use shared memory for worker heartbeat
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # Move everything the master has built out of the collector's reach so
+        # collections in the workers don't write to (and un-share) those pages
+        import gc
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        import app
+        app.reinitialize_after_fork()
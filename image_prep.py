@@ -0,0 +1,600 @@
+"""
+CPU-bound image preparation for VoucherVisionGO, off the request threads.
+
+Decoding, LANCZOS resizing and JPEG encoding hold the GIL for hundreds of
+milliseconds per specimen image, which stalls every other request thread of the
+worker, including the ones only waiting on Gemini. ImagePrepPool runs these steps
+in a small process pool instead:
+
+- input and output bytes travel through shared memory segments (created and
+  unlinked by the calling process), so only segment names cross the pipe
+- at most max_pending jobs are queued; callers wait up to max_wait_seconds for a
+  place and otherwise fail with ImagePrepBusyError (the request is answered 503),
+  so a full-size decode never lands back on a request thread under load
+- inputs smaller than inline_max_bytes are prepared in-thread, where the process
+  round trip would cost more than it saves
+- a job that kills its pool process (e.g. OOM on a huge image) is retried once in
+  a fresh pool and then fails with ImagePrepError; it is never re-run in-thread,
+  where it would take the server process down. A job running longer than
+  job_timeout_seconds fails the same way and its pool is terminated.
+- PDFs are rendered page by page by iter_pdf_pages in one helper process per
+  document, outside the pool, so the file is copied and parsed once rather than
+  once per batch of pages. At most max_pdf_helpers run at once (further documents
+  wait like queued jobs), and a PDF the helper cannot open or render fails with
+  ImagePrepError carrying the helper's error, without a retry
+
+Job functions take the input bytes first and return None (nothing to do) or a
+(payload_bytes, meta) pair. They must be module-level functions of a module that
+is cheap to import (this one), because the pool's processes import them by name.
+"""
+from __future__ import annotations
+
+import io
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+from PIL import Image
+
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:  # HEIC uploads then fail to decode, as they would in-thread
+    pass
+
+logger = logging.getLogger(__name__)
+
+# Oversized images are first reduced by the decoder itself (JPEG DCT scaling, HEIC
+# thumbnails) to no less than DRAFT_REDUCING_GAP x the target size, then resized
+# with LANCZOS. Resizes that remain more than RESIZE_REDUCING_GAP x the target use
+# a fast integer reduce() first, which Pillow documents as visually equivalent.
+DRAFT_REDUCING_GAP = 1.0
+RESIZE_REDUCING_GAP = 3.0
+
+# Code points a broken PDF font encoding extracts instead of text: control,
+# unassigned, private-use and surrogate characters, and U+FFFD
+TEXT_LAYER_GARBAGE_CATEGORIES = frozenset(("Cc", "Cn", "Co", "Cs"))
+
+
+# ----------------------------------------------------------------------
+# Job functions (run in the pool's processes or in-thread)
+# ----------------------------------------------------------------------
+
+def fit_to_max_pixels(image, max_pixels):
+    """Size (w, h) with at most max_pixels that keeps the aspect ratio of image."""
+    width, height = image.size
+    if width * height <= max_pixels:
+        return width, height
+    scale_factor = math.sqrt(max_pixels / (width * height))
+    new_width, new_height = int(width * scale_factor), int(height * scale_factor)
+    # Ensure we don't exceed the pixel limit due to rounding
+    while new_width * new_height > max_pixels:
+        if new_width > new_height:
+            new_width -= 1
+        else:
+            new_height -= 1
+    return new_width, new_height
+
+
+def open_for_max_pixels(data, max_pixels):
+    """
+    Open data for resizing to max_pixels, decoding as little as possible.
+
+    Returns (image, target_size). When the format's decoder supports it, image is
+    already reduced towards target_size, but never below it.
+    """
+    image = Image.open(io.BytesIO(data))
+    target = fit_to_max_pixels(image, max_pixels)
+    if target != image.size:
+        image.draft(None, (max(1, int(target[0] * DRAFT_REDUCING_GAP)),
+                           max(1, int(target[1] * DRAFT_REDUCING_GAP))))
+        if image.width < target[0] or image.height < target[1]:
+            # The decoder picked something smaller (e.g. a tiny HEIC thumbnail)
+            image = Image.open(io.BytesIO(data))
+    return image, target
+
+
+def flatten_to_rgb(image):
+    """RGB copy of image for JPEG encoding; transparency is composited on white."""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
+        return background
+    if image.mode != 'RGB':
+        # Catches YCbCr, CMYK, etc. (common in HEIC)
+        return image.convert('RGB')
+    return image
+
+
+def needs_resize(data, filename, max_pixels):
+    """Header-only check: is the image over max_pixels, or HEIC (always converted)?"""
+    if filename and filename.lower().endswith(('.heic', '.heif')):
+        return True
+    with Image.open(io.BytesIO(data)) as image:
+        return image.width * image.height > max_pixels
+
+
+def resize_for_upload(data, filename, max_pixels):
+    """
+    Resize an uploaded / downloaded image to max_pixels and re-encode it.
+
+    PNG stays PNG, everything else becomes a quality-95 JPEG.
+    Returns (image_bytes, (filename, content_type)).
+    """
+    image, size = open_for_max_pixels(data, max_pixels)
+    if size != image.size:
+        image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=RESIZE_REDUCING_GAP)
+
+    image_format = 'PNG' if filename and filename.lower().endswith('.png') else 'JPEG'
+    save_kwargs = {'format': image_format}
+    if image_format == 'JPEG':
+        image = flatten_to_rgb(image)
+        save_kwargs['quality'] = 95
+        save_kwargs['optimize'] = True
+    out = io.BytesIO()
+    image.save(out, **save_kwargs)
+
+    # Update filename if format changed (covers HEIC -> JPEG rename)
+    if image_format == 'JPEG' and filename and not filename.lower().endswith(('.jpg', '.jpeg')):
+        filename = f"{os.path.splitext(filename)[0]}.jpg"
+    return out.getvalue(), (filename, f'image/{image_format.lower()}')
+
+
+def pdf_page_count(data):
+    """Number of pages in a PDF (parses the document structure only)."""
+    import fitz  # PyMuPDF
+
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        return len(doc)
+
+
+def pdf_page_zoom(width_pt, height_pt, dpi, max_pixels):
+    """
+    Render scale for a page of width_pt x height_pt points: dpi, lowered where
+    needed so the pixmap has at most max_pixels pixels.
+    """
+    zoom = dpi / 72.0
+    if width_pt * height_pt * zoom * zoom > max_pixels:
+        zoom = math.sqrt(max_pixels / (width_pt * height_pt))
+    # The pixmap covers whole pixels: trim until the rounded-up size fits too
+    while math.ceil(width_pt * zoom) * math.ceil(height_pt * zoom) > max_pixels:
+        zoom *= 0.999
+    return zoom
+
+
+def embedded_page_jpeg(doc, page, max_pixels):
+    """
+    The JPEG a scanned page consists of, taken from the PDF without rasterizing.
+
+    Applies to unrotated pages whose only content is one opaque RGB / grey JPEG
+    (DCTDecode) drawn upright over the whole page, optionally with an invisible
+    OCR text layer (render mode 3); pages with annotations, form fields or visible
+    text are rendered, as the JPEG alone would drop them. The stream is returned as-is
+    when it has at most max_pixels pixels, otherwise it is reduced to max_pixels
+    via a draft decode. Returns None for every other page, which is rendered.
+    """
+    images = page.get_images(full=True)
+    if len(images) != 1 or page.rotation:
+        return None
+    xref, smask, image_filter = images[0][0], images[0][1], images[0][8]
+    if smask or image_filter != "DCTDecode":
+        return None
+    if page.first_annot or page.first_widget or page.get_drawings():
+        return None
+    # Span type is the text render mode; 3 is invisible (the OCR layer of a scan)
+    if any(span["type"] != 3 for span in page.get_texttrace()):
+        return None
+    # get_image_info lists placements without hashing the decoded image (unlike
+    # get_image_rects); with a single image xref, a single placement is that xref
+    placements = page.get_image_info()
+    if len(placements) != 1:
+        return None
+    a, b, c, d = placements[0]["transform"][:4]
+    if abs(b) > 1e-3 or abs(c) > 1e-3 or a <= 0 or d <= 0:
+        return None
+    x0, y0, x1, y1 = placements[0]["bbox"]
+    page_rect = page.rect
+    page_area = page_rect.width * page_rect.height
+    covered = (max(0.0, min(x1, page_rect.x1) - max(x0, page_rect.x0))
+               * max(0.0, min(y1, page_rect.y1) - max(y0, page_rect.y0)))
+    if not (0.98 * page_area <= (x1 - x0) * (y1 - y0) <= 1.02 * page_area) or covered < 0.98 * page_area:
+        return None
+
+    info = doc.extract_image(xref)
+    if not info or info.get("ext") not in ("jpeg", "jpg") or info.get("colorspace") not in (1, 3):
+        return None
+    if info["width"] * info["height"] <= max_pixels:
+        return info["image"]
+    payload, _ = resize_for_upload(info["image"], "page.jpg", max_pixels)
+    return payload
+
+
+def text_layer_quality(text):
+    """(non-whitespace characters, share of them that are garbage) of a PDF text layer."""
+    chars = garbage = 0
+    for ch in text or "":
+        if ch.isspace():
+            continue
+        chars += 1
+        if ch == "\ufffd" or unicodedata.category(ch) in TEXT_LAYER_GARBAGE_CATEGORIES:
+            garbage += 1
+    return chars, (garbage / chars if chars else 1.0)
+
+
+def usable_text_layer(page, min_chars, max_garbage_ratio):
+    """The page's text layer in reading order, or None if it is too short or too garbled."""
+    text = page.get_text("text", sort=True)
+    chars, garbage_ratio = text_layer_quality(text)
+    if chars < min_chars or garbage_ratio > max_garbage_ratio:
+        return None
+    return text
+
+
+def iter_pdf_page_jpegs(doc, dpi, first_page=0, last_page=None, max_pixels=None, text_layer=None):
+    """
+    Yield (JPEG, text layer or None) for pages [first_page, last_page) of an open
+    PyMuPDF document; see render_pdf_pages for max_pixels and text_layer.
+    """
+    import fitz  # PyMuPDF
+
+    last_page = len(doc) if last_page is None else min(len(doc), last_page)
+    for page_num in range(first_page, last_page):
+        page = doc.load_page(page_num)
+        text = usable_text_layer(page, *text_layer) if text_layer else None
+        if text is not None:
+            yield b"", text
+            continue
+        zoom = dpi / 72.0
+        if max_pixels:
+            zoom = pdf_page_zoom(page.rect.width, page.rect.height, dpi, max_pixels)
+            page_pixels = math.ceil(page.rect.width * zoom) * math.ceil(page.rect.height * zoom)
+            embedded = embedded_page_jpeg(doc, page, page_pixels)
+            if embedded is not None:
+                yield embedded, None
+                continue
+        yield page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes("jpeg"), None
+
+
+def render_pdf_pages(data, dpi, first_page=0, max_pages=None, max_pixels=None, text_layer=None):
+    """
+    Render pages [first_page, first_page + max_pages) of a PDF (all by default)
+    to JPEG; returns (concatenated JPEGs, [page sizes]).
+
+    With max_pixels, large pages are rendered straight at that budget instead of
+    being rendered at dpi and resized afterwards, and scanned pages are taken
+    from their embedded JPEG (see embedded_page_jpeg), reduced to no more pixels
+    than the page would have been rendered with.
+
+    With text_layer=(min_chars, max_garbage_ratio), pages whose text layer passes
+    usable_text_layer are not rendered at all: their JPEG is empty and the meta is
+    ([page sizes], [text layer or None per page]).
+    """
+    import fitz  # PyMuPDF
+
+    pages = []
+    texts = []
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        last_page = None if max_pages is None else first_page + max_pages
+        for jpeg, text in iter_pdf_page_jpegs(doc, dpi, first_page, last_page, max_pixels, text_layer):
+            pages.append(jpeg)
+            texts.append(text)
+    sizes = [len(page) for page in pages]
+    return b"".join(pages), ((sizes, texts) if text_layer else sizes)
+
+
+def split_payload(payload, sizes):
+    """Inverse of the concatenation done by multi-output jobs such as render_pdf_pages."""
+    parts, offset = [], 0
+    for size in sizes:
+        parts.append(payload[offset:offset + size])
+        offset += size
+    return parts
+
+
+def _run_in_process(fn, in_name, in_size, out_name, out_capacity, args):
+    shm_in = shared_memory.SharedMemory(name=in_name)
+    try:
+        data = bytes(shm_in.buf[:in_size])
+    finally:
+        shm_in.close()
+    result = fn(data, *args)
+    if result is None:
+        return None
+    payload, meta = result
+    if len(payload) > out_capacity:
+        # Larger than the caller's estimate: fall back to the result pipe
+        return ("inline", payload, meta)
+    shm_out = shared_memory.SharedMemory(name=out_name)
+    try:
+        shm_out.buf[:len(payload)] = payload
+    finally:
+        shm_out.close()
+    return ("shm", len(payload), meta)
+
+
+def _serve_pdf_pages(conn, in_name, in_size, dpi, first_page, max_pixels, text_layer):
+    """
+    Helper process of ImagePrepPool.iter_pdf_pages: opens the PDF once, sends its
+    page count, then answers each requested page count with that many pages. An
+    error opening or rendering the PDF is sent back as ("error", message).
+    """
+    import fitz  # PyMuPDF
+
+    try:
+        shm_in = shared_memory.SharedMemory(name=in_name)
+        try:
+            data = bytes(shm_in.buf[:in_size])
+        finally:
+            shm_in.close()
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            conn.send(len(doc))
+            pages = iter_pdf_page_jpegs(doc, dpi, first_page, None, max_pixels, text_layer)
+            while True:
+                count = conn.recv()
+                conn.send(list(itertools.islice(pages, count)))
+    except (EOFError, BrokenPipeError):  # the caller is done with the document
+        pass
+    except Exception as e:
+        try:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+        except OSError:
+            pass
+
+
+# ----------------------------------------------------------------------
+# Pool
+# ----------------------------------------------------------------------
+
+class ImagePrepError(RuntimeError):
+    """A pool job crashed its process (twice) or ran past the job timeout."""
+
+
+class ImagePrepBusyError(ImagePrepError):
+    """No pool slot came free within max_wait_seconds; the job was not run."""
+
+
+class ImagePrepPool:
+    """Bounded process pool for image preparation jobs (small inputs run in-thread)."""
+
+    def __init__(self, processes: int, max_pending: int | None = None,
+                 inline_max_bytes: int = 256 * 1024, max_wait_seconds: float = 5.0,
+                 job_timeout_seconds: float = 120.0, max_pdf_helpers: int | None = None):
+        self.processes = max(0, processes)
+        self.max_pending = max(1, max_pending or self.processes * 4)
+        self.max_pdf_helpers = max(1, max_pdf_helpers or self.processes)
+        self.inline_max_bytes = inline_max_bytes
+        self.max_wait_seconds = max_wait_seconds
+        self.job_timeout_seconds = job_timeout_seconds
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pdf_slots = threading.BoundedSemaphore(self.max_pdf_helpers)
+        self._lock = threading.Lock()
+        self._executor = None
+        self.pending = 0
+        self.max_seen_pending = 0
+        self.offloaded = 0
+        self.inline_small = 0
+        self.rejected_busy = 0
+        self.pool_errors = 0
+        self.timeouts = 0
+        self.pdf_helpers = 0
+        self.pdf_helpers_running = 0
+        self.pdf_errors = 0
+        self.total_wait_seconds = 0.0
+
+    @staticmethod
+    def _mp_context():
+        # forkserver: workers fork from a clean helper process, not from this
+        # threaded one (gRPC channels, OpenVINO thread pools)
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        return multiprocessing.get_context(method)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=self._mp_context())
+            return self._executor
+
+    def _discard_executor(self, executor, terminate=False):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        if terminate:
+            # A hung job never returns on its own: stop the pool's processes. The other
+            # jobs of this pool then fail with BrokenProcessPool and are retried.
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _count(self, counter, pending_delta=0, wait=0.0):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            self.pending += pending_delta
+            self.max_seen_pending = max(self.max_seen_pending, self.pending)
+            self.total_wait_seconds += wait
+
+    def run(self, fn, data, *args, output_capacity: int | None = None):
+        """fn(data, *args) in a pool process (or in-thread); returns its result."""
+        if self.processes == 0 or len(data) < max(1, self.inline_max_bytes):
+            self._count("inline_small")
+            return fn(data, *args)
+
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.max_wait_seconds):
+            self._count("rejected_busy")
+            raise ImagePrepBusyError(f"No image prep slot free within {self.max_wait_seconds:g}s")
+        self._count("offloaded", pending_delta=1, wait=time.monotonic() - started)
+        try:
+            return self._run_offloaded(fn, data, args, output_capacity or max(4 * len(data), 32 << 20))
+        finally:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+
+    def _run_offloaded(self, fn, data, args, out_capacity):
+        shm_in = shared_memory.SharedMemory(create=True, size=len(data))
+        shm_out = shared_memory.SharedMemory(create=True, size=out_capacity)
+        try:
+            shm_in.buf[:len(data)] = data
+            for attempt in (1, 2):
+                executor = self._get_executor()
+                future = executor.submit(
+                    _run_in_process, fn, shm_in.name, len(data), shm_out.name, out_capacity, args
+                )
+                try:
+                    result = future.result(timeout=self.job_timeout_seconds)
+                    break
+                except FutureTimeoutError:
+                    self._count("timeouts")
+                    self._discard_executor(executor, terminate=True)
+                    raise ImagePrepError(f"{fn.__name__} ran longer than {self.job_timeout_seconds:g}s")
+                except BrokenProcessPool as e:
+                    # A pool process died (e.g. OOM on a huge image): retry once in a fresh pool
+                    self._count("pool_errors")
+                    self._discard_executor(executor)
+                    logger.warning(f"Image prep pool broke during {fn.__name__} (attempt {attempt}): {e}")
+            else:
+                raise ImagePrepError(f"{fn.__name__} crashed its image prep process twice")
+            if result is None:
+                return None
+            if result[0] == "inline":
+                return result[1], result[2]
+            _, size, meta = result
+            return bytes(shm_out.buf[:size]), meta
+        finally:
+            for shm in (shm_in, shm_out):
+                shm.close()
+                shm.unlink()
+
+    def iter_pdf_pages(self, data, dpi, max_pixels=None, text_layer=None, batch_pages=1):
+        """
+        Yield (JPEG, text layer or None) for every page of a PDF, in order (see
+        render_pdf_pages for max_pixels and text_layer).
+
+        The PDF is parsed once per call: in-thread for small inputs or without
+        processes, otherwise in a helper process of its own that receives the bytes
+        once through shared memory and renders the next batch_pages pages while the
+        caller works through the current batch. At most max_pdf_helpers helpers run
+        at once; a call that finds none free within max_wait_seconds raises
+        ImagePrepBusyError. A helper that dies is replaced once, resuming at the next
+        page; a second crash, a batch that takes longer than job_timeout_seconds, or
+        an error raised in the helper (e.g. a corrupt PDF) raises ImagePrepError.
+        """
+        if self.processes == 0 or len(data) < max(1, self.inline_max_bytes):
+            import fitz  # PyMuPDF
+
+            self._count("inline_small")
+            with fitz.open(stream=data, filetype="pdf") as doc:
+                yield from iter_pdf_page_jpegs(doc, dpi, 0, None, max_pixels, text_layer)
+            return
+
+        if not self._pdf_slots.acquire(timeout=self.max_wait_seconds):
+            self._count("rejected_busy")
+            raise ImagePrepBusyError(f"No PDF helper free within {self.max_wait_seconds:g}s")
+        with self._lock:
+            self.pdf_helpers_running += 1
+        try:
+            yield from self._iter_helper_pages(data, dpi, max_pixels, text_layer, batch_pages)
+        finally:
+            with self._lock:
+                self.pdf_helpers_running -= 1
+            self._pdf_slots.release()
+
+    def _iter_helper_pages(self, data, dpi, max_pixels, text_layer, batch_pages):
+        shm_in = shared_memory.SharedMemory(create=True, size=len(data))
+        try:
+            shm_in.buf[:len(data)] = data
+            next_page = 0
+            for attempt in (1, 2):
+                self._count("pdf_helpers")
+                process, conn = self._start_pdf_helper(shm_in.name, len(data), dpi, next_page, max_pixels, text_layer)
+                try:
+                    page_count = self._receive_from_helper(conn)
+                    if next_page < page_count:
+                        conn.send(max(1, batch_pages))
+                    while next_page < page_count:
+                        batch = self._receive_from_helper(conn)
+                        if not batch:
+                            raise ImagePrepError(f"PDF helper returned no page {next_page + 1} of {page_count}")
+                        if next_page + len(batch) < page_count:
+                            # The helper renders the next batch while this one is used
+                            conn.send(max(1, batch_pages))
+                        for page in batch:
+                            next_page += 1
+                            yield page
+                    return
+                except (EOFError, ConnectionError) as e:
+                    self._count("pool_errors")
+                    logger.warning(f"PDF helper process died at page {next_page + 1} (attempt {attempt}): {e!r}")
+                finally:
+                    self._stop_pdf_helper(process, conn)
+            raise ImagePrepError("render_pdf_pages crashed its PDF helper process twice")
+        finally:
+            shm_in.close()
+            shm_in.unlink()
+
+    def _start_pdf_helper(self, in_name, in_size, dpi, first_page, max_pixels, text_layer):
+        context = self._mp_context()
+        conn, child_conn = context.Pipe()
+        process = context.Process(
+            target=_serve_pdf_pages, name="pdf-pages", daemon=True,
+            args=(child_conn, in_name, in_size, dpi, first_page, max_pixels, text_layer),
+        )
+        process.start()
+        child_conn.close()
+        return process, conn
+
+    def _receive_from_helper(self, conn):
+        # poll() also returns once the helper has exited; recv() then raises EOFError
+        if not conn.poll(self.job_timeout_seconds):
+            self._count("timeouts")
+            raise ImagePrepError(f"render_pdf_pages ran longer than {self.job_timeout_seconds:g}s")
+        message = conn.recv()
+        if isinstance(message, tuple) and message[0] == "error":
+            # Deterministic for this PDF: a fresh helper would fail the same way
+            self._count("pdf_errors")
+            raise ImagePrepError(f"render_pdf_pages failed: {message[1]}")
+        return message
+
+    @staticmethod
+    def _stop_pdf_helper(process, conn):
+        conn.close()
+        process.join(timeout=1.0)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "processes": self.processes,
+                "started": self._executor is not None,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "max_seen_pending": self.max_seen_pending,
+                "offloaded": self.offloaded,
+                "inline_small": self.inline_small,
+                "rejected_busy": self.rejected_busy,
+                "pool_errors": self.pool_errors,
+                "timeouts": self.timeouts,
+                "max_pdf_helpers": self.max_pdf_helpers,
+                "pdf_helpers": self.pdf_helpers,
+                "pdf_helpers_running": self.pdf_helpers_running,
+                "pdf_errors": self.pdf_errors,
+                "avg_queue_wait_ms": round(1000.0 * self.total_wait_seconds / self.offloaded, 2) if self.offloaded else 0.0,
+            }
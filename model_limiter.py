@@ -0,0 +1,209 @@
+"""
+Adaptive per-model concurrency limits for Gemini calls.
+
+Gemini quotas are enforced per model and per billing identity (the server's key,
+a user's own API key or a user's Vertex project), so one global concurrency
+number either wastes flash capacity or lets pro traffic run into 429s. Each
+(model, billing identity) pair gets its own AdaptiveLimiter:
+
+- additive increase: a success while the limit is the bottleneck grows the limit
+  by about one slot per limit's worth of calls
+- multiplicative decrease: a 429 / RESOURCE_EXHAUSTED halves the limit
+- latency gradient: when the smoothed call latency rises past
+  latency_tolerance x the observed baseline, the limit is trimmed before the
+  upstream starts rejecting
+
+Decreases are applied at most once per cooldown window (the smoothed latency)
+so a burst of in-flight failures counts as one congestion signal. Calls that
+cannot get a slot within max_wait_seconds raise ModelCapacityError instead of
+piling more load onto an overloaded model.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class ModelCapacityError(RuntimeError):
+    """No slot for this model / billing identity became free in time."""
+
+
+def is_rate_limit_error(exc) -> bool:
+    """Heuristic: did an upstream Gemini call fail because of quota / rate limiting?"""
+    if exc is None:
+        return False
+    if type(exc).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    msg = str(exc).upper()
+    if "RESOURCE_EXHAUSTED" in msg or "RESOURCE EXHAUSTED" in msg or "TOO MANY REQUESTS" in msg:
+        return True
+    if " 429" in msg or msg.startswith("429") or "STATUS: 429" in msg or "CODE: 429" in msg:
+        return True
+    if "RATE LIMIT" in msg or "QUOTA EXCEEDED" in msg:
+        return True
+    return False
+
+
+def billing_identity(user_api_key: str | None = None, user_vertex_project: str | None = None) -> str:
+    """Stable, non-secret label for whose quota a Gemini call draws on."""
+    if user_vertex_project:
+        return "vertex:" + hashlib.sha256(user_vertex_project.encode("utf-8")).hexdigest()[:12]
+    if user_api_key:
+        return "key:" + hashlib.sha256(user_api_key.encode("utf-8")).hexdigest()[:12]
+    return "server"
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit with a latency-gradient brake for one upstream quota."""
+
+    def __init__(self, initial_limit: float = 8, min_limit: float = 1, max_limit: float = 64,
+                 backoff_ratio: float = 0.5, latency_tolerance: float = 2.0, smoothing: float = 0.2,
+                 clock=time.monotonic):
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.limit = min(self.max_limit, max(self.min_limit, float(initial_limit)))
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self._clock = clock
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.smoothed_latency = None
+        self.baseline_latency = None
+        self._last_decrease = float("-inf")
+        self.successes = 0
+        self.rate_limited = 0
+        self.latency_backoffs = 0
+        self.wait_timeouts = 0
+
+    def _slots(self) -> int:
+        return max(1, int(self.limit))
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        deadline = None if timeout is None else self._clock() + timeout
+        with self._cond:
+            self.waiting += 1
+            try:
+                while self.in_flight >= self._slots():
+                    remaining = None if deadline is None else deadline - self._clock()
+                    if remaining is not None and remaining <= 0:
+                        self.wait_timeouts += 1
+                        return False
+                    self._cond.wait(remaining)
+                self.in_flight += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def _decrease(self, ratio: float) -> bool:
+        now = self._clock()
+        if now - self._last_decrease < (self.smoothed_latency or 0.0):
+            return False
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * ratio)
+        return True
+
+    def release(self, latency: float | None = None, rate_limited: bool = False) -> None:
+        """Return a slot; latency is given for successful calls, rate_limited for 429s."""
+        with self._cond:
+            self.in_flight -= 1
+            if rate_limited:
+                self.rate_limited += 1
+                self._decrease(self.backoff_ratio)
+            elif latency is not None:
+                self.successes += 1
+                saturated = self.in_flight + 1 >= self._slots()
+                if self.smoothed_latency is None:
+                    self.smoothed_latency = self.baseline_latency = latency
+                else:
+                    self.smoothed_latency += self.smoothing * (latency - self.smoothed_latency)
+                    # The baseline follows improvements immediately and drifts up slowly,
+                    # so a permanent shift in model latency is eventually accepted.
+                    self.baseline_latency = min(latency, self.baseline_latency * 1.01)
+                if self.smoothed_latency > self.latency_tolerance * self.baseline_latency:
+                    if self._decrease(max(self.backoff_ratio, 0.9)):
+                        self.latency_backoffs += 1
+                elif saturated:
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "smoothed_latency_ms": round((self.smoothed_latency or 0.0) * 1000.0, 1),
+                "baseline_latency_ms": round((self.baseline_latency or 0.0) * 1000.0, 1),
+                "successes": self.successes,
+                "rate_limited": self.rate_limited,
+                "latency_backoffs": self.latency_backoffs,
+                "wait_timeouts": self.wait_timeouts,
+            }
+
+
+class ModelLimiterRegistry:
+    """One AdaptiveLimiter per (model, billing identity), created on first use.
+
+    Every user API key and Vertex project is its own identity, so at most
+    max_entries limiters are kept: the least recently used idle ones are dropped
+    (and start again from initial_limit if that identity comes back).
+    """
+
+    def __init__(self, max_wait_seconds: float = 60.0, max_entries: int = 1024, **limiter_kwargs):
+        self.max_wait_seconds = max_wait_seconds
+        self.max_entries = max(1, max_entries)
+        self.limiter_kwargs = limiter_kwargs
+        self._limiters: OrderedDict[tuple[str, str], AdaptiveLimiter] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model: str, identity: str) -> AdaptiveLimiter:
+        key = (model or "", identity or "server")
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = self._limiters[key] = AdaptiveLimiter(**self.limiter_kwargs)
+                self._evict_locked()
+            else:
+                self._limiters.move_to_end(key)
+            return limiter
+
+    def _evict_locked(self) -> None:
+        excess = len(self._limiters) - self.max_entries
+        if excess <= 0:
+            return
+        # Limiters with calls in flight stay: their slots are released to them
+        idle = [key for key, limiter in self._limiters.items() if not limiter.in_flight][:excess]
+        for key in idle:
+            del self._limiters[key]
+
+    @contextmanager
+    def slot(self, model: str, identity: str):
+        """Hold a slot for one upstream call; the outcome adjusts the limit."""
+        limiter = self.get(model, identity)
+        if not limiter.acquire(self.max_wait_seconds):
+            raise ModelCapacityError(
+                f"{model} is at its adaptive concurrency limit; please retry later"
+            )
+        started = time.monotonic()
+        try:
+            yield limiter
+        except BaseException as e:
+            limiter.release(rate_limited=is_rate_limit_error(e))
+            raise
+        limiter.release(latency=time.monotonic() - started)
+
+    def get_stats(self) -> list[dict]:
+        """Current limit and counters per (model, billing identity)."""
+        with self._lock:
+            items = sorted(self._limiters.items())
+        stats = []
+        for (model, identity), limiter in items:
+            row = OrderedDict([("model", model), ("identity", identity)])
+            row.update(limiter.get_stats())
+            stats.append(row)
+        return stats
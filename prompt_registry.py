@@ -0,0 +1,152 @@
+"""
+In-memory registry of compiled prompt YAMLs for VoucherVisionGO.
+
+A prompt is parsed once per version into an immutable CompiledPrompt holding
+the raw text, the parsed YAML and the listing metadata. Versions are
+identified by content:
+
+- built-in prompts (files on disk) by path + SHA-256 of the file, which is
+  memoized on (mtime, size) so an unchanged file is never re-read
+- user prompts by filename + the Firestore `updated_at` key, so a re-upload is
+  a new version and the old one is simply never asked for again
+
+The processor, the LLM handler pool and the /prompts routes all read from the
+same registry; invalidate(name) drops every cached version of a prompt.
+
+The registry holds no JSON skeleton or rendered prompt prefix: VoucherVision
+builds JSON_dict_structure and the prompt text itself, from the prompt file
+(setup_JSON_dict_structure / setup_prompt), and has no way to accept them
+precomputed. A pooled handler pair does that once when it is built
+(VoucherVisionProcessor._build_llm_handlers), not per request.
+"""
+from __future__ import annotations
+
+import copy
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import yaml
+
+from result_cache import file_content_digest
+
+# YAML field -> listing field, as shown by /prompts
+METADATA_FIELDS = OrderedDict([
+    ("prompt_name", "name"),
+    ("prompt_version", "version"),
+    ("prompt_author", "author"),
+    ("prompt_author_institution", "institution"),
+    ("prompt_description", "description"),
+])
+
+
+class CompiledPrompt:
+    """Parsed, read-only view of one prompt version."""
+
+    __slots__ = ("name", "version_key", "digest", "raw_content", "parse_error",
+                 "_data", "metadata")
+
+    def __init__(self, name: str, version_key: str, raw_bytes: bytes):
+        def assign(attr, value):
+            object.__setattr__(self, attr, value)
+
+        assign("name", name)
+        assign("version_key", version_key)
+        assign("digest", hashlib.sha256(raw_bytes).hexdigest())
+        assign("raw_content", raw_bytes.decode("utf-8", errors="replace"))
+        try:
+            data = yaml.safe_load(raw_bytes)
+            parse_error = None
+        except yaml.YAMLError as e:
+            data, parse_error = None, str(e)
+        assign("parse_error", parse_error)
+        assign("_data", data)
+
+        metadata = {}
+        if isinstance(data, dict):
+            for yaml_field, info_field in METADATA_FIELDS.items():
+                if data.get(yaml_field):
+                    metadata[info_field] = data[yaml_field]
+        assign("metadata", metadata)
+
+    def __setattr__(self, attr, value):
+        raise AttributeError("CompiledPrompt is immutable")
+
+    @property
+    def data(self):
+        """A private copy of the parsed YAML (None if it did not parse)."""
+        return copy.deepcopy(self._data)
+
+
+class PromptRegistry:
+    """Thread-safe LRU of CompiledPrompt versions."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max(1, max_entries)
+        self._entries: OrderedDict[tuple[str, str], CompiledPrompt] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return compiled
+
+    def _store(self, key, compiled) -> None:
+        with self._lock:
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_file(self, path, name: str | None = None) -> CompiledPrompt:
+        """Compiled prompt for a YAML file on disk (recompiled when its content changes).
+
+        name is the prompt ref used by invalidate(); it defaults to the file name.
+        """
+        path = os.path.abspath(str(path))
+        key = (path, file_content_digest(path))
+        compiled = self._lookup(key)
+        if compiled is None:
+            with open(path, "rb") as fh:
+                compiled = CompiledPrompt(name or os.path.basename(path), key[1], fh.read())
+            self._store(key, compiled)
+        return compiled
+
+    def get_version(self, name: str, version_key: str, load_bytes) -> CompiledPrompt:
+        """Compiled prompt for (name, version_key); load_bytes() runs only on a miss."""
+        key = (name, version_key or "")
+        compiled = self._lookup(key)
+        if compiled is None:
+            compiled = CompiledPrompt(name, version_key or "", load_bytes())
+            self._store(key, compiled)
+        return compiled
+
+    def invalidate(self, name: str) -> int:
+        """Drop every cached version of the prompt `name`."""
+        with self._lock:
+            stale = [key for key, compiled in self._entries.items() if compiled.name == name]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
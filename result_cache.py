@@ -0,0 +1,337 @@
+"""
+Content-addressed result cache for VoucherVisionGO.
+
+Results are keyed by the SHA-256 of the (already resized) image bytes plus every
+request parameter that changes the output, so a resubmitted specimen image skips
+the collage, OCR and LLM stages entirely. Storage is pluggable:
+
+- MemoryLRUBackend: in-process LRU bounded by a byte budget
+- DiskBackend: one file per entry under a local directory, bounded by a byte budget
+- GCSBackend: one object per entry in a bucket (pair with a bucket lifecycle rule)
+
+Every entry carries an absolute expiry; expired entries are treated as misses and
+removed when they are read.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Entry layout shared by the disk and GCS backends: 8-byte big-endian expiry
+# (unix seconds, float) followed by the payload.
+_EXPIRY_HEADER = struct.Struct(">d")
+
+
+def build_cache_key(image_bytes: bytes, params: dict) -> str:
+    """SHA-256 over the image bytes and a canonical JSON rendering of params."""
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(image_bytes).digest())
+    digest.update(json.dumps(params, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+_file_digest_lock = threading.Lock()
+_file_digest_memo: dict[str, tuple[float, int, str]] = {}
+
+
+def file_content_digest(path: str) -> str:
+    """SHA-256 of a file's contents, memoized on (mtime, size)."""
+    stat = os.stat(path)
+    with _file_digest_lock:
+        memo = _file_digest_memo.get(path)
+        if memo and memo[0] == stat.st_mtime and memo[1] == stat.st_size:
+            return memo[2]
+    with open(path, "rb") as fh:
+        digest = hashlib.sha256(fh.read()).hexdigest()
+    with _file_digest_lock:
+        _file_digest_memo[path] = (stat.st_mtime, stat.st_size, digest)
+    return digest
+
+
+class MemoryLRUBackend:
+    """In-process LRU cache bounded by the total size of the stored payloads."""
+
+    name = "memory"
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def set(self, key: str, payload: bytes, expires_at: float) -> None:
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, payload)
+            self._bytes += len(payload)
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def _remove(self, key: str) -> None:
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+class DiskBackend:
+    """Local-directory cache; evicts least recently used files past max_bytes.
+
+    The directory may be shared by several worker processes, each keeping its own
+    running byte count. That count is re-synced from the directory every
+    RESCAN_SECONDS, after each tenth of max_bytes written and on every
+    eviction, so max_bytes holds across workers (within a tenth per worker).
+    In-flight ``.tmp`` files are never counted.
+    """
+
+    name = "disk"
+    RESCAN_SECONDS = 30.0
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._rescan_locked()
+
+    def _scan_entries(self) -> list[tuple[float, int, str]]:
+        """(mtime, size, path) of every cache entry, oldest first"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".bin"):
+                continue
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            except OSError:  # removed by another worker meanwhile
+                pass
+        entries.sort()
+        return entries
+
+    def _rescan_locked(self) -> list[tuple[float, int, str]]:
+        entries = self._scan_entries()
+        self._bytes = sum(size for _, size, _ in entries)
+        self._scanned_at = time.monotonic()
+        self._written_since_scan = 0
+        return entries
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.bin")
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fh:
+                raw = fh.read()
+        except FileNotFoundError:
+            return None
+        (expires_at,) = _EXPIRY_HEADER.unpack_from(raw)
+        if expires_at <= time.time():
+            self._delete(path)
+            return None
+        try:
+            os.utime(path, None)  # mtime doubles as the LRU clock
+        except OSError:
+            pass
+        return raw[_EXPIRY_HEADER.size:]
+
+    def set(self, key: str, payload: bytes, expires_at: float) -> None:
+        raw = _EXPIRY_HEADER.pack(expires_at) + payload
+        if len(raw) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(raw)
+        with self._lock:
+            try:
+                self._bytes -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(tmp_path, path)
+            self._bytes += len(raw)
+            self._written_since_scan += len(raw)
+            if (self._written_since_scan > self.max_bytes // 10
+                    or time.monotonic() - self._scanned_at > self.RESCAN_SECONDS):
+                self._rescan_locked()
+            if self._bytes > self.max_bytes:
+                self._evict_locked()
+
+    def _delete(self, path: str) -> None:
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                self._bytes -= size
+            except OSError:
+                pass
+
+    def _evict_locked(self) -> None:
+        # Other workers write to the same directory: count what is really there
+        entries = self._rescan_locked()
+        # Evict down to 90% of the budget so eviction does not run on every write
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in entries:
+            if self._bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self._bytes -= size
+            except OSError:
+                pass
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {"directory": self.directory, "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+class GCSBackend:
+    """Cache objects stored as gs://<bucket>/<prefix>/<key>.bin.
+
+    Size is not bounded here; configure a bucket lifecycle rule (e.g. delete
+    after RESULT_CACHE_TTL_SECONDS) to age objects out.
+    """
+
+    name = "gcs"
+
+    def __init__(self, bucket_name: str, prefix: str, client_factory):
+        self.bucket_name = bucket_name
+        self.prefix = prefix.strip("/")
+        self._client_factory = client_factory
+
+    def _blob(self, key: str):
+        return self._client_factory().bucket(self.bucket_name).blob(f"{self.prefix}/{key}.bin")
+
+    def get(self, key: str) -> bytes | None:
+        from google.api_core import exceptions as google_exceptions
+
+        blob = self._blob(key)
+        try:
+            raw = blob.download_as_bytes()
+        except google_exceptions.NotFound:
+            return None
+        (expires_at,) = _EXPIRY_HEADER.unpack_from(raw)
+        if expires_at <= time.time():
+            try:
+                blob.delete()
+            except Exception:
+                pass
+            return None
+        return raw[_EXPIRY_HEADER.size:]
+
+    def set(self, key: str, payload: bytes, expires_at: float) -> None:
+        self._blob(key).upload_from_string(
+            _EXPIRY_HEADER.pack(expires_at) + payload, content_type="application/octet-stream"
+        )
+
+    def get_stats(self) -> dict:
+        return {"bucket": self.bucket_name, "prefix": self.prefix}
+
+
+class ResultCache:
+    """JSON result cache over one of the backends above, with hit/miss counters.
+
+    Backend failures are logged and treated as misses so the cache can never
+    fail a request.
+    """
+
+    def __init__(self, backend, ttl_seconds: float):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, key: str):
+        try:
+            payload = self.backend.get(key)
+        except Exception as e:
+            logger.warning("result cache read failed (%s): %s", self.backend.name, e)
+            payload = None
+            with self._lock:
+                self.errors += 1
+        if payload is not None:
+            try:
+                value = json.loads(payload.decode("utf-8"), object_pairs_hook=OrderedDict)
+            except ValueError:
+                value = None
+        else:
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key: str, value) -> None:
+        try:
+            payload = json.dumps(value, ensure_ascii=False).encode("utf-8")
+            self.backend.set(key, payload, time.time() + self.ttl_seconds)
+        except Exception as e:
+            logger.warning("result cache write failed (%s): %s", self.backend.name, e)
+            with self._lock:
+                self.errors += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "backend": self.backend.name,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+        stats.update(self.backend.get_stats())
+        return stats
+
+
+def build_result_cache(backend_name: str, *, ttl_seconds: float, max_bytes: int,
+                       directory: str | None = None, gcs_bucket: str | None = None,
+                       gcs_prefix: str = "result-cache", gcs_client_factory=None):
+    """Create a ResultCache for backend_name ('memory', 'disk', 'gcs'); None when disabled."""
+    backend_name = (backend_name or "none").strip().lower()
+    if backend_name in ("", "none", "off", "false"):
+        return None
+    if backend_name == "memory":
+        backend = MemoryLRUBackend(max_bytes)
+    elif backend_name == "disk":
+        backend = DiskBackend(directory or "/tmp/vvgo_result_cache", max_bytes)
+    elif backend_name == "gcs":
+        if not gcs_bucket or gcs_client_factory is None:
+            raise ValueError("GCS result cache needs a bucket and a storage client factory")
+        backend = GCSBackend(gcs_bucket, gcs_prefix, gcs_client_factory)
+    else:
+        raise ValueError(f"Unknown result cache backend: {backend_name}")
+    return ResultCache(backend, ttl_seconds)
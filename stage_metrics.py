@@ -0,0 +1,211 @@
+"""
+Per-stage latency instrumentation for VoucherVisionGO.
+
+Every timed stage (resize, collage, OCR per engine, LLM, WFO, COP90, Firestore
+usage writes, quota transactions, ...) is recorded into a process-wide registry
+labelled by stage, route, model and auth_method:
+
+- a cumulative histogram with fixed buckets (Prometheus `histogram`)
+- a sliding window of recent samples for p50/p95/p99 (Prometheus `summary`)
+
+Routes open a RequestTimings with start_request(); spans recorded while it is
+active (including on executor threads that run under a copied context) are also
+summed per request so they can be returned as a `timings` block.
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+LABEL_NAMES = ("stage", "route", "model", "auth_method")
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current_timings: contextvars.ContextVar = contextvars.ContextVar("vvgo_request_timings", default=None)
+
+# Model names come from request input: only registered ones become a label value,
+# anything else is recorded as OTHER_MODEL so the number of series stays bounded.
+OTHER_MODEL = "other"
+_known_models: frozenset = frozenset()
+
+
+class _Series:
+    __slots__ = ("bucket_counts", "count", "total", "recent")
+
+    def __init__(self, n_buckets: int, window: int):
+        self.bucket_counts = [0] * n_buckets
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+
+def _quantile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class StageMetrics:
+    """Thread-safe histogram + recent-sample registry keyed by label values."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window: int = 1024, prefix: str = "vvgo_stage_duration"):
+        self.buckets = tuple(buckets)
+        self.window = window
+        self.prefix = prefix
+        self._series: dict[tuple, _Series] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, **labels) -> None:
+        key = tuple(str(labels.get(name) or "") for name in LABEL_NAMES)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.buckets), self.window)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series.bucket_counts[i] += 1
+            series.count += 1
+            series.total += seconds
+            series.recent.append(seconds)
+
+    def _snapshot(self):
+        with self._lock:
+            return [
+                (key, list(s.bucket_counts), s.count, s.total, sorted(s.recent))
+                for key, s in sorted(self._series.items())
+            ]
+
+    def get_stats(self) -> list[dict]:
+        """Recent p50/p95/p99 (ms) per label set."""
+        stats = []
+        for key, _, count, total, recent in self._snapshot():
+            row = OrderedDict(zip(LABEL_NAMES, key))
+            row["count"] = count
+            row["avg_ms"] = round(total / count * 1000.0, 2) if count else 0.0
+            for q in QUANTILES:
+                row[f"p{int(q * 100)}_ms"] = round(_quantile(recent, q) * 1000.0, 2)
+            stats.append(row)
+        return stats
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition (format 0.0.4)."""
+        snapshot = self._snapshot()
+        lines = [
+            f"# HELP {self.prefix}_seconds Time spent in each request stage.",
+            f"# TYPE {self.prefix}_seconds histogram",
+        ]
+        for key, bucket_counts, count, total, _ in snapshot:
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(LABEL_NAMES, key))
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                lines.append(f'{self.prefix}_seconds_bucket{{{labels},le="{bound:g}"}} {bucket_count}')
+            lines.append(f'{self.prefix}_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{self.prefix}_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{self.prefix}_seconds_count{{{labels}}} {count}")
+        lines += [
+            f"# HELP {self.prefix}_recent_seconds Stage latency quantiles over the last {self.window} samples.",
+            f"# TYPE {self.prefix}_recent_seconds summary",
+        ]
+        for key, _, _, _, recent in snapshot:
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(LABEL_NAMES, key))
+            for q in QUANTILES:
+                lines.append(f'{self.prefix}_recent_seconds{{{labels},quantile="{q:g}"}} {_quantile(recent, q):.6f}')
+            lines.append(f"{self.prefix}_recent_seconds_sum{{{labels}}} {sum(recent):.6f}")
+            lines.append(f"{self.prefix}_recent_seconds_count{{{labels}}} {len(recent)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = StageMetrics()
+
+
+class RequestTimings:
+    """Labels and summed span durations for one request."""
+
+    def __init__(self, route: str, include_in_response: bool = False):
+        self.labels = {"route": route}
+        self.include_in_response = include_in_response
+        self.spans: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def as_dict(self) -> OrderedDict:
+        """Per-stage milliseconds, plus the elapsed total so far."""
+        with self._lock:
+            timings = OrderedDict((name, round(seconds * 1000.0, 1)) for name, seconds in self.spans.items())
+        timings["total"] = round((time.perf_counter() - self._started) * 1000.0, 1)
+        return timings
+
+
+def start_request(route: str, include_in_response: bool = False):
+    """Activate a RequestTimings for the current context; returns (timings, token)."""
+    timings = RequestTimings(route, include_in_response)
+    return timings, _current_timings.set(timings)
+
+
+def end_request(token) -> None:
+    _current_timings.reset(token)
+
+
+def current_timings() -> RequestTimings | None:
+    return _current_timings.get()
+
+
+def set_request_label(name: str, value) -> None:
+    """Attach a label (e.g. auth_method) to every later span of the current request."""
+    timings = _current_timings.get()
+    if timings is not None and value is not None:
+        timings.labels[name] = value
+
+
+def register_models(models) -> None:
+    """Allow these model names as `model` label values (see OTHER_MODEL)."""
+    global _known_models
+    _known_models = _known_models | frozenset(models)
+
+
+def record(stage: str, seconds: float, model: str | None = None) -> None:
+    timings = _current_timings.get()
+    labels = dict(timings.labels) if timings is not None else {}
+    if model:
+        labels["model"] = model if model in _known_models else OTHER_MODEL
+    REGISTRY.observe(seconds, stage=stage, **labels)
+    if timings is not None:
+        timings.add(f"{stage}:{model}" if model else stage, seconds)
+
+
+@contextmanager
+def span(stage: str, model: str | None = None):
+    """Time the enclosed block as one stage; recorded even if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started, model=model)
+
+
+def timed_stage(stage: str):
+    """Decorator form of span() for functions that are a stage in themselves."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """executor.submit that carries the current request timings into the worker thread."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
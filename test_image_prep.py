@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+import io
+import math
+import multiprocessing
+import os
+import time
+import unittest
+
+from PIL import Image
+
+import image_prep
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+
+def _image_bytes(size, fmt="JPEG", mode="RGB"):
+    buf = io.BytesIO()
+    Image.effect_noise(size, 64).convert(mode).save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def _crash_process(data):
+    os._exit(1)
+
+
+def _hang(data):
+    time.sleep(60)
+
+
+def _echo(data):
+    return data, None
+
+
+class ResizeForUploadTest(unittest.TestCase):
+    def test_only_oversized_or_heic_images_need_work(self):
+        data = _image_bytes((400, 300))
+        self.assertFalse(image_prep.needs_resize(data, "sheet.jpg", 400 * 300))
+        self.assertTrue(image_prep.needs_resize(data, "sheet.jpg", 400 * 300 - 1))
+        self.assertTrue(image_prep.needs_resize(data, "sheet.heic", 10 ** 9))
+
+    def test_png_stays_png_and_other_formats_become_jpeg(self):
+        payload, (filename, content_type) = image_prep.resize_for_upload(
+            _image_bytes((400, 300), "PNG", "RGBA"), "sheet.png", 10_000)
+        with Image.open(io.BytesIO(payload)) as image:
+            self.assertEqual((image.format, filename, content_type), ("PNG", "sheet.png", "image/png"))
+            self.assertLessEqual(image.width * image.height, 10_000)
+
+        payload, (filename, content_type) = image_prep.resize_for_upload(
+            _image_bytes((400, 300), "TIFF", "CMYK"), "sheet.tif", 10_000)
+        with Image.open(io.BytesIO(payload)) as image:
+            self.assertEqual((image.format, image.mode, filename), ("JPEG", "RGB", "sheet.jpg"))
+
+    def test_large_jpegs_are_reduced_by_the_decoder_but_never_below_the_target(self):
+        data = _image_bytes((2400, 1800))
+        image, target = image_prep.open_for_max_pixels(data, 200_000)
+        self.assertLess(image.width, 2400)
+        self.assertGreaterEqual(image.width, target[0])
+        self.assertGreaterEqual(image.height, target[1])
+
+        image, target = image_prep.open_for_max_pixels(_image_bytes((2400, 1800), "PNG"), 200_000)
+        self.assertEqual(image.size, (2400, 1800))
+
+
+class _Rect:
+    def __init__(self, x0, y0, x1, y1):
+        self.x0, self.y0, self.x1, self.y1 = x0, y0, x1, y1
+        self.width, self.height = x1 - x0, y1 - y0
+
+
+class _ScannedPage:
+    """Just enough of a PyMuPDF page / document for embedded_page_jpeg."""
+
+    first_annot = first_widget = None
+
+    def __init__(self, jpeg, image_rect, image_filter="DCTDecode", drawings=()):
+        self.rect = _Rect(0, 0, 612, 792)
+        self.rotation = 0
+        self.jpeg, self.image_rect, self.image_filter, self.drawings = jpeg, image_rect, image_filter, drawings
+
+    def get_images(self, full=False):
+        return [(7, 0, 0, 0, 8, "DeviceRGB", "", "Im0", self.image_filter, 0)]
+
+    def get_image_info(self):
+        rect = self.image_rect
+        return [{"bbox": (rect.x0, rect.y0, rect.x1, rect.y1),
+                 "transform": (rect.width, 0.0, 0.0, rect.height, rect.x0, rect.y0)}]
+
+    def get_drawings(self):
+        return list(self.drawings)
+
+    def get_texttrace(self):
+        return []
+
+    def extract_image(self, xref):
+        with Image.open(io.BytesIO(self.jpeg)) as image:
+            return {"ext": "jpeg", "colorspace": 3, "width": image.width, "height": image.height, "image": self.jpeg}
+
+
+class EmbeddedPageJpegTest(unittest.TestCase):
+    def test_full_page_scans_are_passed_through_or_reduced_to_the_budget(self):
+        jpeg = _image_bytes((1200, 1600))
+        page = _ScannedPage(jpeg, _Rect(0, 0, 612, 792))
+        self.assertEqual(image_prep.embedded_page_jpeg(page, page, 1200 * 1600), jpeg)
+
+        reduced = image_prep.embedded_page_jpeg(page, page, 300_000)
+        with Image.open(io.BytesIO(reduced)) as image:
+            self.assertLessEqual(image.width * image.height, 300_000)
+
+    def test_other_pages_are_left_to_the_rasterizer(self):
+        jpeg = _image_bytes((120, 160))
+        for page in (_ScannedPage(jpeg, _Rect(0, 0, 300, 400)),
+                     _ScannedPage(jpeg, _Rect(0, 0, 612, 792), image_filter="FlateDecode"),
+                     _ScannedPage(jpeg, _Rect(0, 0, 612, 792), drawings=[{"items": []}])):
+            self.assertIsNone(image_prep.embedded_page_jpeg(page, page, 10 ** 7))
+
+
+@unittest.skipUnless(fitz, "PyMuPDF is not installed")
+class PyMuPDFPageTest(unittest.TestCase):
+    """The PyMuPDF page API as embedded_page_jpeg and render_pdf_pages read it."""
+
+    def _scan(self, jpeg, **insert_options):
+        doc = fitz.open()
+        self.addCleanup(doc.close)
+        page = doc.new_page(width=612, height=792)
+        page.insert_image(page.rect, stream=jpeg, **insert_options)
+        return doc, page
+
+    def test_image_tuple_and_placement_transform_layout(self):
+        doc, page = self._scan(_image_bytes((612, 792)))
+        (image,) = page.get_images(full=True)
+        self.assertEqual(image[8], "DCTDecode")
+        self.assertEqual(image[1], 0)
+        (placement,) = page.get_image_info()
+        self.assertEqual(tuple(placement["bbox"]), (0, 0, 612, 792))
+        self.assertEqual(tuple(placement["transform"][:4]), (612, 0, 0, 792))
+
+        _, flipped = self._scan(_image_bytes((612, 792)), rotate=180)
+        a, _, _, d = flipped.get_image_info()[0]["transform"][:4]
+        self.assertLess(a, 0)
+        self.assertLess(d, 0)
+
+    def test_only_bare_scans_with_an_invisible_text_layer_skip_rendering(self):
+        jpeg = _image_bytes((612, 792))
+        doc, page = self._scan(jpeg)
+        page.insert_text((72, 72), "Quercus alba", render_mode=3)
+        self.assertEqual(image_prep.embedded_page_jpeg(doc, page, 10 ** 7), jpeg)
+
+        doc, page = self._scan(jpeg)
+        page.insert_text((72, 72), "Quercus alba")
+        self.assertIsNone(image_prep.embedded_page_jpeg(doc, page, 10 ** 7))
+
+        doc, page = self._scan(jpeg)
+        page.add_text_annot((72, 72), "det. J. Smith")
+        self.assertIsNone(image_prep.embedded_page_jpeg(doc, page, 10 ** 7))
+
+        doc, page = self._scan(jpeg, rotate=180)
+        self.assertIsNone(image_prep.embedded_page_jpeg(doc, page, 10 ** 7))
+
+    def test_budgeted_renders_never_exceed_max_pixels(self):
+        doc = fitz.open()
+        ledger = doc.new_page(width=1684, height=2384)  # A1
+        ledger.insert_text((72, 72), "No. 1893  Quercus alba L.", fontsize=24)
+        ledger.draw_line((72, 100), (1600, 100))
+        scan = doc.new_page(width=612, height=792)
+        scan.insert_image(scan.rect, stream=_image_bytes((1700, 2200)))
+        letter = doc.new_page(width=612, height=792)
+        letter.insert_text((72, 72), "det. J. Smith")
+        pdf_bytes = doc.tobytes()
+        doc.close()
+
+        payload, sizes = image_prep.render_pdf_pages(pdf_bytes, 150, max_pixels=1_000_000)
+        pages = image_prep.split_payload(payload, sizes)
+        self.assertEqual(len(pages), 3)
+        for page in pages:
+            with Image.open(io.BytesIO(page)) as image:
+                self.assertLessEqual(image.width * image.height, 1_000_000)
+
+
+class _TextPage:
+    def __init__(self, text):
+        self.text = text
+
+    def get_text(self, option="text", sort=False):
+        return self.text
+
+
+class TextLayerTest(unittest.TestCase):
+    def test_typed_pages_pass_and_short_or_garbled_ones_do_not(self):
+        typed = "No. 1893  Quercus alba L.  coll. J. Smith, 12 May 1893\n" * 3
+        self.assertEqual(image_prep.usable_text_layer(_TextPage(typed), 80, 0.02), typed)
+        self.assertIsNone(image_prep.usable_text_layer(_TextPage("Page 12\n"), 80, 0.02))
+        garbled = "\ufffd\ue001\x07" * 10 + "Quercus alba" * 5
+        chars, garbage_ratio = image_prep.text_layer_quality(garbled)
+        self.assertEqual(chars, 85)
+        self.assertAlmostEqual(garbage_ratio, 30 / 85)
+        self.assertIsNone(image_prep.usable_text_layer(_TextPage(garbled), 80, 0.02))
+        self.assertEqual(image_prep.text_layer_quality(" \n"), (0, 1.0))
+
+
+class ImagePrepPoolTest(unittest.TestCase):
+    def test_large_inputs_run_in_a_process_and_small_ones_in_thread(self):
+        pool = image_prep.ImagePrepPool(1, inline_max_bytes=10_000)
+        self.addCleanup(pool.shutdown)
+        big = _image_bytes((800, 600))
+        payload, (filename, _) = pool.run(image_prep.resize_for_upload, big, "big.jpg", 50_000)
+        # Tiny output capacity: the result comes back through the pipe instead
+        overflow, _ = pool.run(image_prep.resize_for_upload, big, "big.jpg", 50_000, output_capacity=16)
+        small, _ = pool.run(image_prep.resize_for_upload, _image_bytes((20, 20)), "small.jpg", 100)
+
+        with Image.open(io.BytesIO(payload)) as image:
+            self.assertLessEqual(image.width * image.height, 50_000)
+        self.assertEqual(overflow, payload)
+        self.assertEqual(filename, "big.jpg")
+        self.assertTrue(small)
+        stats = pool.get_stats()
+        self.assertEqual((stats["offloaded"], stats["inline_small"], stats["pending"]), (2, 1, 0))
+
+    def test_jobs_that_crash_or_hang_their_process_fail_instead_of_running_in_thread(self):
+        pool = image_prep.ImagePrepPool(1, inline_max_bytes=1, job_timeout_seconds=2)
+        self.addCleanup(pool.shutdown)
+        with self.assertRaises(image_prep.ImagePrepError):
+            pool.run(_crash_process, b"data")
+        with self.assertRaises(image_prep.ImagePrepError):
+            pool.run(_hang, b"data")
+        self.assertEqual(pool.run(_echo, b"data"), (b"data", None))
+        stats = pool.get_stats()
+        self.assertEqual((stats["pool_errors"], stats["timeouts"]), (2, 1))
+
+    def test_a_full_queue_rejects_large_jobs_instead_of_running_them_in_thread(self):
+        pool = image_prep.ImagePrepPool(1, max_pending=1, inline_max_bytes=1, max_wait_seconds=0.1)
+        self.addCleanup(pool.shutdown)
+        calls = []
+        self.assertTrue(pool._slots.acquire(timeout=1))
+        try:
+            with self.assertRaises(image_prep.ImagePrepBusyError):
+                pool.run(calls.append, b"data")
+        finally:
+            pool._slots.release()
+        self.assertEqual(calls, [])
+        self.assertEqual(pool.run(_echo, b"data"), (b"data", None))
+        stats = pool.get_stats()
+        self.assertEqual((stats["rejected_busy"], stats["offloaded"], stats["pending"]), (1, 1, 0))
+
+    def test_pdf_pages_render_at_dpi_or_straight_at_the_pixel_budget(self):
+        letter = image_prep.pdf_page_zoom(612, 792, 150, 5_200_000)
+        self.assertAlmostEqual(letter, 150 / 72)
+        a1 = image_prep.pdf_page_zoom(1684, 2384, 150, 5_200_000)
+        self.assertLess(a1, 150 / 72)
+        self.assertLessEqual(math.ceil(1684 * a1) * math.ceil(2384 * a1), 5_200_000)
+        self.assertGreater(math.ceil(1684 * a1) * math.ceil(2384 * a1), 5_150_000)
+
+    @unittest.skipUnless(fitz, "PyMuPDF is not installed")
+    def test_pdf_pages_come_from_one_helper_process_per_document(self):
+        doc = fitz.open()
+        for number in range(5):
+            page = doc.new_page(width=612, height=792)
+            page.insert_text((72, 72), f"No. {number}  Quercus alba L.")
+        pdf_bytes = doc.tobytes()
+        doc.close()
+        expected = image_prep.split_payload(*image_prep.render_pdf_pages(pdf_bytes, 72))
+
+        pool = image_prep.ImagePrepPool(1, inline_max_bytes=1)
+        self.addCleanup(pool.shutdown)
+        pages = list(pool.iter_pdf_pages(pdf_bytes, 72, batch_pages=2))
+        self.assertEqual([jpeg for jpeg, _ in pages], expected)
+        self.assertEqual([text for _, text in pages], [None] * 5)
+
+        # Abandoning the iterator stops its helper
+        partial = pool.iter_pdf_pages(pdf_bytes, 72, batch_pages=2)
+        next(partial)
+        partial.close()
+        self.assertEqual(multiprocessing.active_children(), [])
+        stats = pool.get_stats()
+        self.assertEqual((stats["pdf_helpers"], stats["offloaded"], stats["pool_errors"]), (2, 0, 0))
+
+    @unittest.skipUnless(fitz, "PyMuPDF is not installed")
+    def test_pdf_helpers_are_bounded_and_report_corrupt_pdfs_without_a_retry(self):
+        pool = image_prep.ImagePrepPool(1, inline_max_bytes=1, max_wait_seconds=0.1)
+        self.addCleanup(pool.shutdown)
+        with self.assertRaisesRegex(image_prep.ImagePrepError, "render_pdf_pages failed: .+"):
+            list(pool.iter_pdf_pages(b"%PDF-1.4 this is not a PDF", 72))
+
+        self.assertTrue(pool._pdf_slots.acquire(timeout=1))
+        try:
+            with self.assertRaises(image_prep.ImagePrepBusyError):
+                list(pool.iter_pdf_pages(b"%PDF-1.4", 72))
+        finally:
+            pool._pdf_slots.release()
+        stats = pool.get_stats()
+        self.assertEqual(
+            (stats["pdf_helpers"], stats["pdf_errors"], stats["pool_errors"], stats["rejected_busy"],
+             stats["pdf_helpers_running"]),
+            (1, 1, 0, 1, 0),
+        )
+
+    def test_split_payload_inverts_concatenation(self):
+        parts = [b"abc", b"", b"defgh"]
+        self.assertEqual(image_prep.split_payload(b"".join(parts), [len(p) for p in parts]), parts)
+
+
+if __name__ == "__main__":
+    unittest.main()
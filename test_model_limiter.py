@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+import unittest
+
+import model_limiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def test_grows_when_saturated_and_halves_once_per_burst_of_429s(self):
+        clock = FakeClock()
+        limiter = model_limiter.AdaptiveLimiter(initial_limit=2, max_limit=4, clock=clock)
+        for _ in range(6):
+            self.assertTrue(limiter.acquire(0))
+            self.assertTrue(limiter.acquire(0))
+            limiter.release(latency=1.0)
+            limiter.release(latency=1.0)
+        grown = limiter.limit
+        self.assertGreater(grown, 3)
+
+        held = int(grown)
+        for _ in range(held):
+            self.assertTrue(limiter.acquire(0))
+        self.assertFalse(limiter.acquire(0))
+        for _ in range(held):
+            limiter.release(rate_limited=True)
+
+        stats = limiter.get_stats()
+        self.assertAlmostEqual(stats["limit"], round(grown / 2, 2))
+        self.assertEqual((stats["rate_limited"], stats["in_flight"], stats["wait_timeouts"]), (held, 0, 1))
+
+    def test_rising_latency_trims_the_limit(self):
+        clock = FakeClock()
+        limiter = model_limiter.AdaptiveLimiter(initial_limit=10, latency_tolerance=2.0, clock=clock)
+        for latency in (1.0, 1.0, 8.0, 8.0, 8.0):
+            clock.now += 10
+            limiter.acquire(0)
+            limiter.release(latency=latency)
+        self.assertLess(limiter.limit, 10)
+        self.assertGreater(limiter.get_stats()["latency_backoffs"], 0)
+
+
+class ModelLimiterRegistryTest(unittest.TestCase):
+    def test_limits_are_per_model_and_identity(self):
+        registry = model_limiter.ModelLimiterRegistry(max_wait_seconds=0, initial_limit=1)
+        server = model_limiter.billing_identity()
+        user = model_limiter.billing_identity(user_api_key="secret-key")
+
+        with registry.slot("gemini-2.5-pro", server):
+            with registry.slot("gemini-2.5-flash", server), registry.slot("gemini-2.5-pro", user):
+                pass
+            with self.assertRaises(model_limiter.ModelCapacityError):
+                with registry.slot("gemini-2.5-pro", server):
+                    pass
+
+        with self.assertRaises(RuntimeError):
+            with registry.slot("gemini-2.5-pro", server):
+                raise RuntimeError("429 RESOURCE_EXHAUSTED")
+
+        stats = {(row["model"], row["identity"]): row for row in registry.get_stats()}
+        self.assertNotIn("secret-key", user)
+        self.assertEqual(stats[("gemini-2.5-pro", server)]["rate_limited"], 1)
+        self.assertEqual(stats[("gemini-2.5-flash", server)]["successes"], 1)
+        self.assertEqual(stats[("gemini-2.5-pro", user)]["in_flight"], 0)
+
+    def test_least_recently_used_idle_identities_are_evicted(self):
+        registry = model_limiter.ModelLimiterRegistry(max_wait_seconds=0, max_entries=2)
+        with registry.slot("gemini-2.5-flash", "busy"):
+            registry.get("gemini-2.5-flash", "server")
+            for index in range(5):
+                registry.get("gemini-2.5-flash", f"key:{index}")
+                registry.get("gemini-2.5-flash", "server")
+            identities = {row["identity"] for row in registry.get_stats()}
+        self.assertEqual(identities, {"busy", "server"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,669 @@
+#!/usr/bin/env python3
+import contextlib
+import email
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+
+
+def _bare_processor():
+    """A VoucherVisionProcessor with no models loaded, for exercising helpers."""
+    processor = object.__new__(app.VoucherVisionProcessor)
+    processor.logger = app.logger
+    processor.use_console_fallback = False
+    processor.ocr_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="test-ocr")
+    processor.model_limiter = app.ModelLimiterRegistry(max_wait_seconds=1)
+    return processor
+
+
+def _ocr_packet(text, tokens_in=10, tokens_out=5):
+    return {
+        "ocr_text": text,
+        "cost_in": 0.01,
+        "cost_out": 0.02,
+        "total_cost": 0.03,
+        "rates_in": 0.1,
+        "rates_out": 0.2,
+        "tokens_in": tokens_in,
+        "tokens_out": tokens_out,
+    }
+
+
+class PerformOcrTest(unittest.TestCase):
+    def test_multiple_engines_run_concurrently_and_keep_request_order(self):
+        processor = _bare_processor()
+        started = []
+        lock = threading.Lock()
+
+        def fake_run(file_path, ocr_opt, ocr_prompt_option, **kwargs):
+            with lock:
+                started.append(ocr_opt)
+            # The slower engine is requested first; merge order must not change.
+            time.sleep(0.3 if ocr_opt == "gemini-2.5-pro" else 0.1)
+            return _ocr_packet(f"text from {ocr_opt}")
+
+        processor._run_ocr_engine = fake_run
+
+        t0 = time.monotonic()
+        ocr_packet, ocr_all, tokens = processor.perform_ocr(
+            "collage.jpg", ["gemini-2.5-pro", "gemini-2.5-flash"], None
+        )
+        elapsed = time.monotonic() - t0
+
+        self.assertLess(elapsed, 0.39)
+        self.assertEqual(list(ocr_packet), ["gemini-2.5-pro", "gemini-2.5-flash"])
+        self.assertEqual(ocr_all, "text from gemini-2.5-pro text from gemini-2.5-flash ")
+        self.assertEqual(tokens, 30)
+
+    def test_partial_failure_is_reported_per_engine(self):
+        processor = _bare_processor()
+
+        def fake_run(file_path, ocr_opt, ocr_prompt_option, **kwargs):
+            if ocr_opt == "gemini-2.5-pro":
+                raise RuntimeError("429 RESOURCE_EXHAUSTED")
+            return _ocr_packet("flash text")
+
+        processor._run_ocr_engine = fake_run
+
+        ocr_packet, ocr_all, tokens = processor.perform_ocr(
+            "collage.jpg", ["gemini-2.5-pro", "gemini-2.5-flash"], None
+        )
+
+        self.assertIn("RESOURCE_EXHAUSTED", ocr_packet["gemini-2.5-pro"]["error"])
+        self.assertEqual(ocr_packet["gemini-2.5-pro"]["tokens_in"], 0)
+        self.assertEqual(ocr_all, "flash text ")
+        self.assertEqual(tokens, 15)
+
+    def test_all_engines_failing_raises(self):
+        processor = _bare_processor()
+
+        def fake_run(file_path, ocr_opt, ocr_prompt_option, **kwargs):
+            raise RuntimeError(f"{ocr_opt} down")
+
+        processor._run_ocr_engine = fake_run
+
+        with self.assertRaises(RuntimeError):
+            processor.perform_ocr("collage.jpg", ["gemini-2.5-pro", "gemini-2.5-flash"], None)
+
+
+class CallImageEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.processor = _bare_processor()
+        self.processor._in_memory_engines = set()
+        self.processor._path_only_engines = set()
+        self.processor._engine_mode_lock = threading.Lock()
+        patcher = mock.patch.object(app, "IMAGE_PIPELINE_IN_MEMORY", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_engine_rejecting_streams_falls_back_to_a_temp_file_once(self):
+        calls = []
+
+        def path_only_engine(image):
+            calls.append(image)
+            with open(image, "rb") as f:  # TypeError for a stream, before reading it
+                return f.read()
+
+        self.assertEqual(self.processor._call_image_engine("ocr_gemini", path_only_engine, b"jpeg", "a.jpg"), b"jpeg")
+        self.assertEqual(self.processor._call_image_engine("ocr_gemini", path_only_engine, b"jpeg", "a.jpg"), b"jpeg")
+        self.assertEqual(len(calls), 3)
+        self.assertIsInstance(calls[1], str)
+        self.assertIn("ocr_gemini", self.processor._path_only_engines)
+
+    def test_errors_after_the_stream_was_read_are_not_retried(self):
+        calls = []
+
+        def failing_after_api_call(image):
+            calls.append(image.read())
+            raise TypeError("'NoneType' object is not subscriptable")
+
+        with self.assertRaises(TypeError):
+            self.processor._call_image_engine("ocr_gemini", failing_after_api_call, b"jpeg", "a.jpg")
+        self.assertEqual(calls, [b"jpeg"])
+        self.assertEqual(self.processor._path_only_engines, set())
+
+
+class PdfRequestTest(unittest.TestCase):
+    def test_pages_run_concurrently_with_bounded_lookahead_and_keep_order(self):
+        processor = _bare_processor()
+        lock = threading.Lock()
+        state = {"rendered": 0, "active": 0, "max_active": 0, "max_ahead": 0}
+
+        def fake_pages(pdf_bytes, pdf_filename, dpi=150, batch_pages=1, max_pixels=None, text_layer=False):
+            for i in range(9):
+                with lock:
+                    state["rendered"] += 1
+                yield mock.Mock(filename=app.pdf_page_filename(pdf_filename, i)), None
+
+        def fake_process(file, **kwargs):
+            with lock:
+                state["active"] += 1
+                state["max_active"] = max(state["max_active"], state["active"])
+                state["max_ahead"] = max(state["max_ahead"], state["rendered"] - state.get("done", 0))
+            time.sleep(0.01 * (int(file.filename[-6:-4]) % 3))
+            with lock:
+                state["active"] -= 1
+                state["done"] = state.get("done", 0) + 1
+            if file.filename.endswith("0005.jpg"):
+                return {"error": "no label found"}, 422
+            return {"total_request_cost_usd": 0.5}, 200
+
+        processor.process_image_request = fake_process
+        upload = mock.Mock(filename="sheets.pdf")
+        upload.read.return_value = b"%PDF"
+        with mock.patch.object(app.image_prep, "pdf_page_count", return_value=9), \
+                mock.patch.object(app, "iter_pdf_page_images", fake_pages), \
+                mock.patch.multiple(app, PDF_PAGE_WORKERS=3, PDF_PAGE_PREFETCH=1):
+            result, status = processor.process_pdf_request(upload, caller_email="a@example.org")
+
+        self.assertEqual(status, 200)
+        self.assertEqual([page["filename"] for page in result["pages"]],
+                         [f"sheets__page_{i:04d}.jpg" for i in range(1, 10)])
+        self.assertEqual(result["pages"][4]["status_code"], 422)
+        self.assertAlmostEqual(result["total_request_cost_usd"], 4.0)
+        self.assertLessEqual(state["max_active"], 3)
+        self.assertLessEqual(state["max_ahead"], 3 + 1 + 1)
+
+    def test_text_layer_pages_skip_vision_ocr_and_record_their_path(self):
+        processor = _bare_processor()
+
+        def fake_pages(pdf_bytes, pdf_filename, dpi=150, batch_pages=1, max_pixels=None, text_layer=False):
+            self.assertTrue(text_layer)
+            yield None, "Herbarium of the University\nQuercus alba L."
+            yield mock.Mock(filename=app.pdf_page_filename(pdf_filename, 1)), None
+
+        processor.process_image_request = mock.Mock(return_value=({"ocr": "vision text"}, 200))
+        processor.process_ocr_text_request = mock.Mock(return_value=({"ocr": "typed"}, 200))
+        upload = mock.Mock(filename="ledger.pdf")
+        upload.read.return_value = b"%PDF"
+        with mock.patch.object(app.image_prep, "pdf_page_count", return_value=2), \
+                mock.patch.object(app, "iter_pdf_page_images", fake_pages):
+            result, status = processor.process_pdf_request(
+                upload, pdf_text_layer=True, prompt="SLTPvM_default.yaml", engine_options=["gemini-2.5-flash"])
+
+        self.assertEqual(status, 200)
+        self.assertEqual([page["ocr_source"] for page in result["pages"]], ["text_layer", "vision"])
+        self.assertEqual(result["pages"][0]["filename"], "ledger__page_0001.jpg")
+        self.assertEqual(list(result["pages"][0]["ocr_info"]), [app.PDF_TEXT_LAYER_ENGINE])
+        text, = processor.process_ocr_text_request.call_args.args
+        self.assertTrue(text.startswith("Herbarium"))
+        self.assertEqual(processor.process_ocr_text_request.call_args.kwargs["prompt"], "SLTPvM_default.yaml")
+        self.assertNotIn("pdf_text_layer", processor.process_image_request.call_args.kwargs)
+
+
+class _Increment:
+    def __init__(self, value):
+        self.value = value
+
+
+class _FakeDocRef:
+    """In-memory Firestore document: enough of the API for _record_pdf_page_result."""
+
+    def __init__(self, store, path):
+        self.store, self.path = store, path
+
+    def collection(self, name):
+        return mock.Mock(document=lambda doc_id: _FakeDocRef(self.store, f"{self.path}/{name}/{doc_id}"))
+
+    def get(self, transaction=None):
+        data = self.store.get(self.path)
+        return mock.Mock(exists=data is not None, to_dict=lambda: dict(data or {}))
+
+    def write(self, update):
+        doc = self.store.setdefault(self.path, {})
+        for field, value in update.items():
+            doc[field] = doc.get(field, 0) + value.value if isinstance(value, _Increment) else value
+
+
+class _FakeTransaction:
+    def set(self, ref, update, merge=False):
+        ref.write(update)
+
+    def update(self, ref, update):
+        ref.write(update)
+
+
+class PdfJobCountersTest(unittest.TestCase):
+    def setUp(self):
+        self.store = {"pdf_jobs/job-1": {"status": "running", "page_count": 3, "completed_pages": 0,
+                                         "successful_pages": 0, "failed_pages": 0}}
+        fake_db = mock.Mock()
+        fake_db.collection.return_value.document = lambda doc_id: _FakeDocRef(self.store, f"pdf_jobs/{doc_id}")
+        fake_db.transaction.return_value = _FakeTransaction()
+        self.enqueue = mock.Mock()
+        for patcher in (mock.patch.object(app, "db", fake_db),
+                        mock.patch.object(app._gc_firestore, "transactional", lambda fn: fn),
+                        mock.patch.object(app.firestore, "Increment", _Increment),
+                        mock.patch.object(app, "_enqueue_pdf_finalize_task", self.enqueue),
+                        mock.patch.object(app, "_get_pdf_job_or_404", lambda job_id: {"job_id": job_id})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_counters_move_incrementally_and_finalize_is_enqueued_once(self):
+        record = app._record_pdf_page_result
+        self.assertFalse(record("job-1", 1, {"status": "completed"}))
+        self.assertFalse(record("job-1", 2, {"status": "failed"}))
+        # A redelivered task for page 2 that now succeeds moves it between counters
+        self.assertFalse(record("job-1", 2, {"status": "completed"}))
+        self.assertTrue(record("job-1", 3, {"status": "completed"}))
+        self.assertFalse(record("job-1", 3, {"status": "completed"}))
+
+        job = self.store["pdf_jobs/job-1"]
+        self.assertEqual((job["completed_pages"], job["successful_pages"], job["failed_pages"]), (3, 3, 0))
+        self.assertEqual(job["status"], "finalizing")
+        self.assertEqual(self.store["pdf_jobs/job-1/pages/0002"]["counted_status"], "completed")
+        self.enqueue.assert_called_once()
+
+    def test_a_redelivered_split_restarts_the_counters_with_its_pages(self):
+        job = self.store["pdf_jobs/job-1"]
+        app._record_pdf_page_result("job-1", 1, {"status": "completed"})
+        app._record_pdf_page_result("job-1", 2, {"status": "failed"})
+        batch = mock.Mock(set=lambda ref, update, merge=False: ref.write(update))
+        app.db.batch.return_value = batch
+        pages = [(None, "Quercus alba L."), (None, "Acer rubrum L."), (None, "Pinus strobus L.")]
+        with mock.patch.object(app, "iter_pdf_page_images", return_value=iter(pages)):
+            app._store_split_pdf_pages("job-1", {"source_pdf_filename": "sheet.pdf"}, b"%PDF", 3)
+
+        batch.commit.assert_called_once()
+        self.assertEqual((job["completed_pages"], job["successful_pages"], job["failed_pages"]), (0, 0, 0))
+        self.assertIsNone(self.store["pdf_jobs/job-1/pages/0002"]["counted_status"])
+        # Every page now counts once, exactly as on a first delivery
+        for page_index in (1, 2):
+            self.assertFalse(app._record_pdf_page_result("job-1", page_index, {"status": "completed"}))
+        self.assertTrue(app._record_pdf_page_result("job-1", 3, {"status": "completed"}))
+        self.assertEqual((job["completed_pages"], job["successful_pages"], job["failed_pages"]), (3, 3, 0))
+
+
+class CollageEnginePoolTest(unittest.TestCase):
+    def test_checkout_hands_out_distinct_engines_and_records_waits(self):
+        pool = app.CollageEnginePool(["engine-a", "engine-b"])
+        held = []
+
+        with pool.checkout() as first, pool.checkout() as second:
+            held.extend([first, second])
+            self.assertEqual(pool.get_stats()["in_use"], 2)
+
+            def borrow_third():
+                with pool.checkout() as third:
+                    held.append(third)
+
+            waiter = threading.Thread(target=borrow_third)
+            waiter.start()
+            time.sleep(0.05)
+            self.assertEqual(len(held), 2)
+        waiter.join(timeout=1)
+
+        stats = pool.get_stats()
+        self.assertEqual(sorted(held[:2]), ["engine-a", "engine-b"])
+        self.assertEqual(len(held), 3)
+        self.assertEqual(stats["in_use"], 0)
+        self.assertEqual(stats["checkouts"], 3)
+        self.assertEqual(stats["waited_checkouts"], 1)
+        self.assertGreaterEqual(stats["max_wait_ms"], 40)
+
+
+class LLMHandlerPoolTest(unittest.TestCase):
+    def test_reuses_idle_handlers_across_threads_and_evicts_lru(self):
+        built = []
+
+        def factory(key):
+            built.append(key)
+            return (f"vv-{key}-{len(built)}", f"llm-{key}")
+
+        pool = app.LLMHandlerPool(factory, max_idle=2)
+        with pool.checkout("a") as first, pool.checkout("a") as second:
+            self.assertNotEqual(first, second)
+
+        reused = []
+
+        def borrow():
+            with pool.checkout("a") as handlers:
+                reused.append(handlers)
+
+        thread = threading.Thread(target=borrow)
+        thread.start()
+        thread.join(timeout=1)
+        self.assertIn(reused[0], (first, second))
+
+        # Idle: two for "a"; a third pair pushes out the least recently returned
+        with pool.checkout("b"):
+            pass
+        with pool.checkout("b"):
+            pass
+
+        stats = pool.get_stats()
+        self.assertEqual(built, ["a", "a", "b"])
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 3))
+        self.assertEqual((stats["idle"], stats["keys"], stats["evictions"]), (2, 2, 1))
+        self.assertEqual(stats["in_use"], 0)
+
+
+class WarmupTest(unittest.TestCase):
+    def test_failed_steps_are_recorded_and_the_instance_still_becomes_ready(self):
+        built = []
+        engine = mock.Mock()
+
+        class FakeProcessor:
+            default_prompt = "SLTPvM_default.yaml"
+            collage_engine_pool = app.CollageEnginePool([engine])
+
+            def _get_ocr_engine(self, model):
+                if model == "gemini-2.5-pro":
+                    raise RuntimeError("no quota")
+                built.append(("ocr", model))
+
+            def checkout_vv(self, prompt, model):
+                built.append(("llm", model))
+                return contextlib.nullcontext()
+
+            def _call_image_engine(self, *args):
+                raise AssertionError("warm-up must not go through _call_image_engine")
+
+        state = app.WarmupState(enabled=True)
+        self.assertFalse(state.is_ready)
+        with mock.patch.multiple(app, _warmup_state=state, _wfo_lookup=None,
+                                 WARMUP_MODELS=["gemini-2.5-flash", "gemini-2.5-pro"]):
+            app.run_warmup(FakeProcessor())
+
+        stats = state.get_stats()
+        self.assertTrue(state.is_ready)
+        self.assertEqual(stats["failed_steps"], ["ocr_engine:gemini-2.5-pro"])
+        self.assertIn("no quota", stats["steps"]["ocr_engine:gemini-2.5-pro"]["error"])
+        engine.run.assert_called_once()
+        warmup_path = engine.run.call_args[0][0]
+        self.assertTrue(warmup_path.endswith(".jpg"))
+        self.assertFalse(os.path.exists(warmup_path))
+        self.assertEqual([m for kind, m in built if kind == "llm"], ["gemini-2.5-flash", "gemini-2.5-pro"])
+
+
+    def test_workers_rebuild_threads_and_clients_but_keep_the_shared_models(self):
+        processor = _bare_processor()
+        engine_pool = app.CollageEnginePool([mock.Mock()])
+        processor.collage_engine_pool = engine_pool
+        processor.ocr_engines = {"gemini-2.5-flash": object()}
+        processor.ocr_engines_lock = threading.Lock()
+        parent_executor = processor.ocr_executor
+
+        processor.reinitialize_after_fork()
+
+        self.assertIs(processor.collage_engine_pool, engine_pool)
+        self.assertIsNot(processor.ocr_executor, parent_executor)
+        self.assertEqual(processor.ocr_engines, {})
+        self.assertEqual(processor.llm_handler_pool.get_stats()["idle"], 0)
+
+    def test_preloaded_workers_build_their_own_collage_engines(self):
+        processor = _bare_processor()
+        processor.collage_engine_pool = None
+        worker_pool = app.CollageEnginePool([mock.Mock()])
+
+        with mock.patch.object(app.VoucherVisionProcessor, "_build_collage_engine_pool",
+                               return_value=worker_pool) as build:
+            processor.reinitialize_after_fork()
+
+        build.assert_called_once_with()
+        self.assertIs(processor.collage_engine_pool, worker_pool)
+
+
+class RequestThrottlerTest(unittest.TestCase):
+    def _queue_in_order(self, throttler, users, admitted):
+        threads = []
+        for i, user in enumerate(users):
+            def wait_for_slot(user=user, i=i):
+                if throttler.acquire(user=user):
+                    admitted.append((user, i))
+            thread = threading.Thread(target=wait_for_slot)
+            thread.start()
+            threads.append(thread)
+            while throttler.get_queue_depth() < i + 1:
+                time.sleep(0.001)
+        return threads
+
+    def test_freed_slots_alternate_between_users(self):
+        throttler = app.RequestThrottler(max_concurrent=1, max_queue=8, max_wait_seconds=5, user_weights={})
+        self.assertTrue(throttler.acquire(user="batch@example.org"))
+        admitted = []
+        threads = self._queue_in_order(
+            throttler, ["batch@example.org"] * 3 + ["interactive@example.org"], admitted
+        )
+
+        for expected in range(1, 5):
+            throttler.release()
+            while len(admitted) < expected:
+                time.sleep(0.001)
+        throttler.release()
+        for thread in threads:
+            thread.join(timeout=1)
+
+        # The interactive request overtakes the rest of the batch
+        self.assertEqual([user for user, _ in admitted][:2], ["batch@example.org", "interactive@example.org"])
+        stats = throttler.get_stats()
+        self.assertEqual((stats["active"], stats["queued"], stats["admitted_after_wait"]), (0, 0, 4))
+
+    def test_full_queue_and_wait_timeout_are_rejected(self):
+        throttler = app.RequestThrottler(max_concurrent=1, max_queue=1, max_wait_seconds=0.05)
+        self.assertTrue(throttler.acquire())
+        admitted = []
+        threads = self._queue_in_order(throttler, ["a@example.org"], admitted)
+
+        self.assertFalse(throttler.acquire(user="b@example.org"))
+        for thread in threads:
+            thread.join(timeout=1)
+
+        self.assertEqual(admitted, [])
+        stats = throttler.get_stats()
+        self.assertEqual((stats["rejected_queue_full"], stats["timed_out"], stats["queued"]), (1, 1, 0))
+        throttler.release()
+        self.assertEqual(throttler.get_active_count(), 0)
+
+
+class ResultCacheIntegrationTest(unittest.TestCase):
+    def test_cache_hit_rebuilds_request_fields_and_bills_nothing(self):
+        processor = _bare_processor()
+        processor.result_cache = app.build_result_cache("memory", ttl_seconds=60, max_bytes=1 << 20)
+        key = processor._result_cache_key(
+            b"jpeg-bytes",
+            engine_options=["gemini-2.5-flash"],
+            ocr_prompt_option="verbatim_with_annotations",
+            prompt="SLTPvM_default.yaml",
+            ocr_only=True,
+            include_wfo=False,
+            include_cop90=False,
+            llm_model_name="gemini-2.5-flash",
+            notebook_mode=False,
+            skip_label_collage=False,
+        )
+        results = app.OrderedDict([
+            ("filename", "first.jpg"),
+            ("url_source", ""),
+            ("ocr", "label text"),
+            ("collage_info", {"base64image_input_resized": "AAAA", "base64image_text_collage": "BBBB"}),
+            ("success", {"ocr": "True"}),
+            ("total_request_cost_usd", 0.05),
+        ])
+        processor._store_cached_result(key, results)
+
+        cached = processor.result_cache.get(key)
+        self.assertNotIn("base64image_input_resized", cached["collage_info"])
+
+        response = processor._cached_result_response(
+            cached, key, b"jpeg-bytes", "resubmitted.jpg", "https://example.org/a.jpg"
+        )
+        self.assertEqual(response["filename"], "resubmitted.jpg")
+        self.assertEqual(response["url_source"], "https://example.org/a.jpg")
+        self.assertEqual(response["total_request_cost_usd"], 0.0)
+        self.assertEqual(response["cache"], {"hit": True, "key": key, "avoided_cost_usd": 0.05})
+        self.assertIn("base64image_input_resized", response["collage_info"])
+
+
+class OcrCacheTest(unittest.TestCase):
+    def test_engine_results_are_reused_at_zero_cost(self):
+        processor = _bare_processor()
+        processor.ocr_cache = app.build_result_cache("memory", ttl_seconds=60, max_bytes=1 << 20)
+        reused = processor._reused_ocr_packet(_ocr_packet("label text"))
+
+        self.assertEqual(reused["ocr_text"], "label text")
+        self.assertEqual((reused["total_cost"], reused["tokens_in"], reused["tokens_out"]), (0, 0, 0))
+        self.assertTrue(reused["cache_hit"])
+
+    def test_ocr_text_round_trips_through_ocr_id(self):
+        processor = _bare_processor()
+        processor.ocr_cache = app.build_result_cache("memory", ttl_seconds=60, max_bytes=1 << 20)
+        ocr_id = processor._remember_ocr_text(
+            b"collage-bytes", ["gemini-2.5-flash"], "verbatim_with_annotations", "label text", {"gemini-2.5-flash": {}}
+        )
+
+        stored = processor.load_ocr_text(ocr_id)
+        self.assertEqual(stored["ocr"], "label text")
+        self.assertEqual(stored["engines"], ["gemini-2.5-flash"])
+        self.assertIsNone(processor.load_ocr_text("../../etc/passwd"))
+        self.assertIsNone(processor.load_ocr_text("0" * 64))
+
+
+class LlmParseMemoTest(unittest.TestCase):
+    def test_repeated_parse_skips_the_llm_and_reports_avoided_cost(self):
+        processor = _bare_processor()
+        processor.dir_home = "."
+        processor.llm_cache = app.build_result_cache("memory", ttl_seconds=60, max_bytes=1 << 20)
+        calls = []
+
+        class FakeVV:
+            def setup_prompt(self, ocr_text):
+                return f"PROMPT::{ocr_text}"
+
+        class FakeLLM:
+            temperature = 1.0
+
+            def call_llm_api_GoogleGemini(self, prompt_text, json_report=None, paths=None):
+                calls.append(prompt_text)
+                return {"catalogNumber": "123"}, 100, 20, None, None, None
+
+        processor.checkout_vv = lambda *args, **kwargs: contextlib.nullcontext((FakeVV(), FakeLLM()))
+
+        with mock.patch.object(app, "calculate_cost", return_value=(0.01, 0.02, 0.03, 0.1, 0.2)):
+            first = processor.process_voucher_vision("label text", "p.yaml", "gemini-2.5-flash", "GEMINI_2_5_FLASH")
+            second = processor.process_voucher_vision("label text", "p.yaml", "gemini-2.5-flash", "GEMINI_2_5_FLASH")
+            processor.process_voucher_vision("other text", "p.yaml", "gemini-2.5-flash", "GEMINI_2_5_FLASH")
+
+        self.assertEqual(len(calls), 2)
+        self.assertIsNone(first[5])
+        self.assertEqual(second[0], {"catalogNumber": "123"})
+        self.assertEqual(second[1:5], (0, 0, 0.0, 0.0))
+        self.assertEqual(dict(second[5]), {"hit": True, "input": 100, "output": 20, "avoided_cost_usd": 0.03})
+
+
+
+class StreamingResponseTest(unittest.TestCase):
+    def test_stages_are_streamed_before_the_final_result(self):
+        completed = []
+
+        def pipeline(on_stage):
+            on_stage("collage_info", {"base64image_text_collage": "AAAA"})
+            on_stage("ocr", {"ocr": "label text"})
+            return app.OrderedDict([("filename", "a.jpg"), ("ocr", "label text")]), 200
+
+        chunks = app.stream_pipeline_events(
+            pipeline, "ndjson", on_complete=lambda results, status: completed.append(status)
+        )
+        events = [app.json.loads(chunk) for chunk in chunks]
+
+        self.assertEqual([e["event"] for e in events], ["collage_info", "ocr", "result"])
+        self.assertEqual(events[-1]["data"], {"status_code": 200, "filename": "a.jpg", "ocr": "label text"})
+        self.assertEqual(completed, [200])
+
+    def test_sse_framing_and_error_event(self):
+        def pipeline(on_stage):
+            return {"error": "Server is at maximum capacity. Please try again later."}, 429
+
+        body = "".join(app.stream_pipeline_events(pipeline, "sse"))
+
+        self.assertTrue(body.startswith("event: error\ndata: {\"status_code\": 429"))
+        self.assertTrue(body.endswith("\n\n"))
+
+    def test_streams_beyond_the_backlog_are_rejected_until_a_slot_frees(self):
+        release = threading.Event()
+
+        def pipeline(on_stage):
+            release.wait(timeout=5)
+            return {"ocr": "label text"}, 200
+
+        with mock.patch.object(app, "_stream_slots", threading.BoundedSemaphore(1)):
+            chunks = app.stream_pipeline_events(pipeline, "ndjson")
+            with self.assertRaises(app.StreamCapacityError):
+                app.stream_pipeline_events(pipeline, "ndjson")
+            release.set()
+            self.assertEqual(app.json.loads(list(chunks)[-1])["event"], "result")
+            app.stream_pipeline_events(lambda on_stage: ({}, 200), "ndjson")
+
+
+
+class ResponseProjectionTest(unittest.TestCase):
+    RESULTS = app.OrderedDict([
+        ("filename", "a.jpg"),
+        ("ocr", "label text"),
+        ("formatted_json", {"catalogNumber": "123"}),
+        ("collage_info", app.OrderedDict([
+            ("base64image_text_collage", "AAAA"),
+            ("base64image_input_resized", "BBBB"),
+        ])),
+    ])
+
+    def test_exclude_drops_nested_base64_payloads(self):
+        projection = {"fields": None, "exclude": ["collage_info.base64image_input_resized", "ocr"]}
+        projected = app.project_response(self.RESULTS, projection)
+
+        self.assertEqual(list(projected), ["filename", "formatted_json", "collage_info"])
+        self.assertEqual(dict(projected["collage_info"]), {"base64image_text_collage": "AAAA"})
+        self.assertIn("base64image_input_resized", self.RESULTS["collage_info"])
+        self.assertFalse(app.projection_includes(projection, app.RESPONSE_INPUT_IMAGE_FIELD))
+
+    def test_fields_keep_only_requested_paths_and_filename(self):
+        projection = {"fields": ["formatted_json", "collage_info.base64image_text_collage"], "exclude": None}
+        projected = app.project_response(self.RESULTS, projection)
+
+        self.assertEqual(list(projected), ["filename", "formatted_json", "collage_info"])
+        self.assertEqual(dict(projected["collage_info"]), {"base64image_text_collage": "AAAA"})
+        self.assertFalse(app.projection_includes(projection, app.RESPONSE_INPUT_IMAGE_FIELD))
+        self.assertTrue(app.projection_includes({"fields": ["collage_info"]}, app.RESPONSE_INPUT_IMAGE_FIELD))
+
+    def test_error_bodies_and_empty_projection_pass_through(self):
+        self.assertIs(app.project_response(self.RESULTS, {"fields": None, "exclude": None}), self.RESULTS)
+        error = {"error": "boom"}
+        self.assertIs(app.project_response(error, {"fields": ["ocr"]}), error)
+        self.assertEqual(app._parse_field_list(["ocr, formatted_json", "ocr"]), ["ocr", "formatted_json"])
+
+
+
+class MultipartResponseTest(unittest.TestCase):
+    def test_images_travel_as_raw_parts_with_json(self):
+        collage = b"\xff\xd8collage\xff\xd9"
+        results = app.OrderedDict([
+            ("filename", "a.jpg"),
+            ("collage_info", app.OrderedDict([
+                ("base64image_text_collage", app.base64.b64encode(collage).decode()),
+            ])),
+        ])
+
+        stripped, collage_bytes, extra = app.split_image_parts(results, input_image_bytes=b"input-jpeg")
+        body, boundary = app.build_multipart_body(stripped, collage_bytes, extra_images=extra)
+
+        message = email.message_from_bytes(
+            f"Content-Type: multipart/form-data; boundary={boundary}\r\n\r\n".encode() + body
+        )
+        parts = {part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+                 for part in message.get_payload()}
+        self.assertEqual(list(parts), ["json_data", "image", "input_image"])
+        self.assertEqual(parts["image"], collage)
+        self.assertEqual(parts["input_image"], b"input-jpeg")
+        json_part = app.json.loads(parts["json_data"])
+        self.assertEqual(json_part["collage_info"], {
+            "image_parts": {"base64image_text_collage": "image", "base64image_input_resized": "input_image"},
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+import os
+import tempfile
+import time
+import unittest
+
+import prompt_registry
+
+PROMPT_YAML = b"""prompt_name: Test prompt
+prompt_version: "1.0"
+prompt_author: Someone
+instructions: Parse the label.
+json_formatting_instructions: Return JSON only.
+rules:
+  catalogNumber: The barcode number.
+  scientificName: The taxon name.
+mapping: {}
+"""
+
+
+class PromptRegistryTest(unittest.TestCase):
+    def test_file_prompts_compile_once_per_content_version(self):
+        registry = prompt_registry.PromptRegistry()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "test.yaml")
+            with open(path, "wb") as fh:
+                fh.write(PROMPT_YAML)
+
+            first = registry.get_file(path)
+            self.assertIs(registry.get_file(path), first)
+            self.assertEqual(first.metadata["name"], "Test prompt")
+            with self.assertRaises(AttributeError):
+                first.digest = "changed"
+            first.data["rules"].clear()
+            self.assertEqual(len(first.data["rules"]), 2)
+
+            time.sleep(0.01)
+            with open(path, "wb") as fh:
+                fh.write(PROMPT_YAML.replace(b"1.0", b"1.1"))
+            second = registry.get_file(path)
+
+        self.assertIsNot(second, first)
+        self.assertEqual(second.metadata["version"], "1.1")
+        stats = registry.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_versioned_prompts_load_once_and_invalidate_by_name(self):
+        registry = prompt_registry.PromptRegistry()
+        loads = []
+
+        def load():
+            loads.append(1)
+            return b"prompt_name: [unclosed"
+
+        compiled = registry.get_version("user.yaml", "1700000000000", load)
+        registry.get_version("user.yaml", "1700000000000", load)
+        self.assertEqual(len(loads), 1)
+        self.assertIsNotNone(compiled.parse_error)
+        self.assertIsNone(compiled.data)
+
+        self.assertEqual(registry.invalidate("user.yaml"), 1)
+        registry.get_version("user.yaml", "1700000000000", load)
+        self.assertEqual(len(loads), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
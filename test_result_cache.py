@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+import os
+import tempfile
+import time
+import unittest
+from collections import OrderedDict
+
+import result_cache
+
+
+class CacheKeyTest(unittest.TestCase):
+    def test_key_depends_on_image_and_every_parameter(self):
+        params = {"engines": ["gemini-2.5-flash"], "llm_model": "gemini-2.5-flash", "include_wfo": True}
+        base = result_cache.build_cache_key(b"image", params)
+
+        self.assertEqual(base, result_cache.build_cache_key(b"image", dict(reversed(list(params.items())))))
+        self.assertNotEqual(base, result_cache.build_cache_key(b"other image", params))
+        self.assertNotEqual(base, result_cache.build_cache_key(b"image", {**params, "include_wfo": False}))
+        self.assertNotEqual(
+            base,
+            result_cache.build_cache_key(b"image", {**params, "engines": ["gemini-2.5-flash", "gemini-2.5-pro"]}),
+        )
+
+
+class MemoryBackendTest(unittest.TestCase):
+    def test_lru_eviction_respects_byte_budget(self):
+        backend = result_cache.MemoryLRUBackend(max_bytes=10)
+        expires = time.time() + 60
+        backend.set("a", b"1234", expires)
+        backend.set("b", b"1234", expires)
+        backend.get("a")  # "b" is now least recently used
+        backend.set("c", b"1234", expires)
+
+        self.assertEqual(backend.get("a"), b"1234")
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual(backend.get("c"), b"1234")
+        self.assertLessEqual(backend.get_stats()["bytes"], 10)
+
+    def test_expired_entries_are_misses(self):
+        backend = result_cache.MemoryLRUBackend(max_bytes=100)
+        backend.set("a", b"payload", time.time() - 1)
+        self.assertIsNone(backend.get("a"))
+        self.assertEqual(backend.get_stats()["entries"], 0)
+
+
+class DiskBackendTest(unittest.TestCase):
+    def test_round_trip_expiry_and_eviction(self):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = result_cache.DiskBackend(directory, max_bytes=64)
+            expires = time.time() + 60
+            backend.set("a", b"x" * 20, expires)
+            self.assertEqual(backend.get("a"), b"x" * 20)
+
+            backend.set("expired", b"y", time.time() - 1)
+            self.assertIsNone(backend.get("expired"))
+
+            time.sleep(0.01)
+            backend.set("b", b"z" * 20, expires)
+            time.sleep(0.01)
+            backend.set("c", b"w" * 20, expires)
+            self.assertIsNone(backend.get("a"))
+            self.assertEqual(backend.get("c"), b"w" * 20)
+
+    def test_budget_holds_across_processes_sharing_the_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "partial.bin.123.1.tmp"), "wb") as fh:
+                fh.write(b"t" * 1000)
+            first = result_cache.DiskBackend(directory, max_bytes=100)
+            second = result_cache.DiskBackend(directory, max_bytes=100)
+            self.assertEqual(first.get_stats()["bytes"], 0)
+            expires = time.time() + 60
+            for index in range(4):
+                first.set(f"first{index}", b"x" * 12, expires)
+                time.sleep(0.01)
+                second.set(f"second{index}", b"y" * 12, expires)
+                time.sleep(0.01)
+            on_disk = sum(os.path.getsize(os.path.join(directory, name))
+                          for name in os.listdir(directory) if name.endswith(".bin"))
+            self.assertLessEqual(on_disk, 100)
+
+
+class ResultCacheTest(unittest.TestCase):
+    def test_round_trip_preserves_order_and_counts_hits(self):
+        cache = result_cache.build_result_cache("memory", ttl_seconds=60, max_bytes=1024)
+        value = OrderedDict([("filename", "a.jpg"), ("ocr", "text"), ("formatted_json", {"b": 1, "a": 2})])
+
+        self.assertIsNone(cache.get("key"))
+        cache.put("key", value)
+        cached = cache.get("key")
+
+        self.assertEqual(list(cached), ["filename", "ocr", "formatted_json"])
+        self.assertEqual(list(cached["formatted_json"]), ["b", "a"])
+        stats = cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_disabled_backend_returns_none(self):
+        self.assertIsNone(result_cache.build_result_cache("none", ttl_seconds=60, max_bytes=1024))
+
+
+if __name__ == "__main__":
+    unittest.main()
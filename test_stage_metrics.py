@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import stage_metrics
+
+
+class StageMetricsTest(unittest.TestCase):
+    def test_histogram_and_quantiles_per_label_set(self):
+        registry = stage_metrics.StageMetrics(buckets=(0.1, 1.0), window=10)
+        for seconds in (0.05, 0.5, 2.0):
+            registry.observe(seconds, stage="ocr", route="/process", model="gemini-2.5-flash")
+        registry.observe(0.2, stage="llm", route="/process", model="gemini-2.5-pro")
+
+        text = registry.render_prometheus()
+        labels = 'stage="ocr",route="/process",model="gemini-2.5-flash",auth_method=""'
+        self.assertIn(f'vvgo_stage_duration_seconds_bucket{{{labels},le="0.1"}} 1', text)
+        self.assertIn(f'vvgo_stage_duration_seconds_bucket{{{labels},le="1"}} 2', text)
+        self.assertIn(f'vvgo_stage_duration_seconds_bucket{{{labels},le="+Inf"}} 3', text)
+        self.assertIn(f'vvgo_stage_duration_seconds_count{{{labels}}} 3', text)
+        self.assertIn(f'vvgo_stage_duration_recent_seconds{{{labels},quantile="0.5"}} 0.500000', text)
+
+        ocr = next(row for row in registry.get_stats() if row["stage"] == "ocr")
+        self.assertEqual((ocr["count"], ocr["p50_ms"], ocr["p99_ms"]), (3, 500.0, 2000.0))
+
+    def test_request_timings_follow_work_onto_executor_threads(self):
+        stage_metrics.register_models(["flash"])
+        timings, token = stage_metrics.start_request("/test-route", include_in_response=True)
+        try:
+            stage_metrics.set_request_label("auth_method", "server")
+
+            def engine(model):
+                with stage_metrics.span("ocr", model=model):
+                    time.sleep(0.01)
+
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                futures = [stage_metrics.submit_in_context(executor, engine, m) for m in ("flash", "pro")]
+                for future in futures:
+                    future.result()
+        finally:
+            stage_metrics.end_request(token)
+
+        self.assertIsNone(stage_metrics.current_timings())
+        result = timings.as_dict()
+        self.assertEqual(sorted(result), ["ocr:flash", "ocr:pro", "total"])
+        self.assertGreaterEqual(result["ocr:flash"], 10)
+        recorded = [row for row in stage_metrics.REGISTRY.get_stats() if row["route"] == "/test-route"]
+        self.assertEqual({(row["model"], row["auth_method"]) for row in recorded}, {("flash", "server"), ("other", "server")})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -33,10 +33,8 @@ class WFOLocalLookup:
         if not os.path.exists(db_path):
             raise FileNotFoundError(f"WFO database not found: {db_path}")
 
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
-        self.conn.execute("PRAGMA query_only=ON")
-        self.conn.execute("PRAGMA cache_size=-64000")  # 64MB read cache
+        self.db_path = db_path
+        self.conn = self._connect()
 
         # Load hierarchy cache from metadata table
         row = self.conn.execute(
@@ -44,6 +42,23 @@ class WFOLocalLookup:
         ).fetchone()
         self.hierarchy_cache = json.loads(row["value"]) if row else {}
 
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only=ON")
+        conn.execute("PRAGMA cache_size=-64000")  # 64MB read cache
+        return conn
+
+    def reopen(self):
+        """
+        Open a fresh connection in a forked child process.
+
+        SQLite connections must not be used across fork(); the inherited one is
+        abandoned (not closed, which could touch the parent's file locks) and the
+        hierarchy cache is kept as-is.
+        """
+        self.conn = self._connect()
+
     # ------------------------------------------------------------------
     # Public interface
     # ------------------------------------------------------------------